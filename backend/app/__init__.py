@@ -8,6 +8,9 @@ from flask_migrate import Migrate
 from app.config.config import config
 from app.models import db, bcrypt
 from app.services.email_service import mail
+from app.services.task_queue import task_queue
+from app.services.event_bus import event_bus
+from app.services.audit_sink import audit_sink
 
 
 migrate = Migrate()
@@ -27,12 +30,15 @@ def create_app(config_name='development'):
     migrate.init_app(app, db)
     jwt.init_app(app)
     mail.init_app(app)
+    task_queue.init_app(app)
+    event_bus.init_app(app)
+    audit_sink.init_app(app)
 
     # Enable CORS
     CORS(app, origins=app.config['CORS_ORIGINS'], supports_credentials=True)
 
     # Register blueprints
-    from app.routes import auth, student, admin, document, payment, choice, allotment
+    from app.routes import auth, student, admin, document, payment, choice, allotment, events
 
     app.register_blueprint(auth.bp, url_prefix='/api/auth')
     app.register_blueprint(student.bp, url_prefix='/api/student')
@@ -41,6 +47,7 @@ def create_app(config_name='development'):
     app.register_blueprint(payment.bp, url_prefix='/api/payment')
     app.register_blueprint(choice.bp, url_prefix='/api/choices')
     app.register_blueprint(allotment.bp, url_prefix='/api/allotment')
+    app.register_blueprint(events.bp, url_prefix='/api/events')
 
     # Create tables if they don't exist
     with app.app_context():
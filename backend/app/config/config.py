@@ -54,14 +54,65 @@ class Config:
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
     MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', 5242880))  # 5MB
     ALLOWED_EXTENSIONS = os.getenv('ALLOWED_EXTENSIONS', 'pdf,jpg,jpeg,png').split(',')
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8192))
+    BLOB_GC_GRACE_SECONDS = int(os.getenv('BLOB_GC_GRACE_SECONDS', 3600))
+
+    # File Delivery Configuration
+    FILE_DELIVERY_MODE = os.getenv('FILE_DELIVERY_MODE', 'direct')  # direct, x-accel-redirect or x-sendfile
+    X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', '/protected-uploads')
+
+    # Document Preview Configuration
+    DOCUMENT_THUMBNAIL_SIZE = int(os.getenv('DOCUMENT_THUMBNAIL_SIZE', 240))
+    DOCUMENT_PREVIEW_SIZE = int(os.getenv('DOCUMENT_PREVIEW_SIZE', 1024))
+    DOCUMENT_PREVIEW_QUALITY = int(os.getenv('DOCUMENT_PREVIEW_QUALITY', 70))
+
+    # Document Review Configuration
+    DOCUMENT_REVIEW_BATCH_MAX = int(os.getenv('DOCUMENT_REVIEW_BATCH_MAX', 1000))
+    DOCUMENT_CLAIM_MAX = int(os.getenv('DOCUMENT_CLAIM_MAX', 100))
+    DOCUMENT_CLAIM_LEASE_SECONDS = int(os.getenv('DOCUMENT_CLAIM_LEASE_SECONDS', 900))
+    FILE_INSPECTION_WORKERS = int(os.getenv('FILE_INSPECTION_WORKERS', os.cpu_count() or 1))
+
+    # Audit Log Configuration
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 500))
+    AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 1.0))  # seconds
+    AUDIT_ARCHIVE_FOLDER = os.getenv('AUDIT_ARCHIVE_FOLDER', 'archives/audit')
+    AUDIT_ARCHIVE_AFTER_MONTHS = int(os.getenv('AUDIT_ARCHIVE_AFTER_MONTHS', 6))
+    AUDIT_PARTITION_MONTHS_AHEAD = int(os.getenv('AUDIT_PARTITION_MONTHS_AHEAD', 3))
+
+    # Bulk Student Import Configuration
+    STUDENT_IMPORT_CHUNK_SIZE = int(os.getenv('STUDENT_IMPORT_CHUNK_SIZE', 2000))
+    STUDENT_IMPORT_WORKERS = int(os.getenv('STUDENT_IMPORT_WORKERS', os.cpu_count() or 1))
+    STUDENT_IMPORT_JOB_TTL = int(os.getenv('STUDENT_IMPORT_JOB_TTL', 86400))  # how long job status is kept
+
+    # Allotment Letter Configuration
+    ALLOTMENT_LETTER_FORMAT = os.getenv('ALLOTMENT_LETTER_FORMAT', 'pdf')  # pdf or png
+    ALLOTMENT_LETTER_CHUNK_SIZE = int(os.getenv('ALLOTMENT_LETTER_CHUNK_SIZE', 1000))
+    ALLOTMENT_LETTER_WORKERS = int(os.getenv('ALLOTMENT_LETTER_WORKERS', os.cpu_count() or 1))
+    ALLOTMENT_LETTER_LOCK_SECONDS = int(os.getenv('ALLOTMENT_LETTER_LOCK_SECONDS', 6 * 3600))  # upper bound of a run
 
     # Redis Configuration
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 
+    # Cache Configuration
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'redis')  # redis, or memory for a single process
+    DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', 3600))
+    ROUND_CUTOFF_CACHE_TTL = int(os.getenv('ROUND_CUTOFF_CACHE_TTL', 86400))
+
+    # Event Stream Configuration
+    EVENT_BUS_BACKEND = os.getenv('EVENT_BUS_BACKEND', 'memory')  # memory or redis
+    EVENT_STREAM_HEARTBEAT_SECONDS = int(os.getenv('EVENT_STREAM_HEARTBEAT_SECONDS', 15))
+    EVENT_STREAM_QUEUE_SIZE = int(os.getenv('EVENT_STREAM_QUEUE_SIZE', 100))
+    EVENT_BUS_RECONNECT_MAX_SECONDS = int(os.getenv('EVENT_BUS_RECONNECT_MAX_SECONDS', 30))
+
     # Celery Configuration
     CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/1')
     CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/2')
 
+    # Background Task Queue Configuration
+    TASK_QUEUE_WORKERS = int(os.getenv('TASK_QUEUE_WORKERS', 4))
+    TASK_QUEUE_EAGER = os.getenv('TASK_QUEUE_EAGER', 'False') == 'True'
+    TASK_DEDUP_BACKEND = os.getenv('TASK_DEDUP_BACKEND', 'redis')  # redis, or memory for a single process
+
     # Application Configuration
     APP_NAME = os.getenv('APP_NAME', 'Admission Automation System')
     APP_VERSION = os.getenv('APP_VERSION', '1.0.0')
@@ -71,11 +122,19 @@ class Config:
     # OTP Configuration
     OTP_VALIDITY_MINUTES = int(os.getenv('OTP_VALIDITY_MINUTES', 5))
     OTP_LENGTH = int(os.getenv('OTP_LENGTH', 6))
+    OTP_STORE_BACKEND = os.getenv('OTP_STORE_BACKEND', 'sql')  # sql or redis
+    OTP_PURGE_BATCH_SIZE = int(os.getenv('OTP_PURGE_BATCH_SIZE', 1000))
+    OTP_RESEND_DEDUP_SECONDS = int(os.getenv('OTP_RESEND_DEDUP_SECONDS', 30))
 
     # Choice Filling Configuration
+    # ISO 8601; read as UTC unless it carries an offset, e.g. 2027-06-30T23:59:59+05:30
     CHOICE_FILLING_DEADLINE = os.getenv('CHOICE_FILLING_DEADLINE')
+    CHOICE_ORDER_GAP = int(os.getenv('CHOICE_ORDER_GAP', 1024))
+    CHOICE_DRAFT_BACKEND = os.getenv('CHOICE_DRAFT_BACKEND', 'redis')  # redis, or memory for a single process
+    CHOICE_DRAFT_TTL = int(os.getenv('CHOICE_DRAFT_TTL', 7 * 24 * 3600))
     MAX_CHOICES = int(os.getenv('MAX_CHOICES', 10))
     MIN_CHOICES = int(os.getenv('MIN_CHOICES', 1))
+    ADMISSION_HINT_MARGIN = float(os.getenv('ADMISSION_HINT_MARGIN', 0.1))  # fraction of closing rank
 
     # Seat Allotment Configuration
     ALLOTMENT_ROUNDS = int(os.getenv('ALLOTMENT_ROUNDS', 3))
@@ -107,7 +166,11 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///test_admission_system.db'
+    TASK_QUEUE_EAGER = True
     WTF_CSRF_ENABLED = False
+    CHOICE_DRAFT_BACKEND = 'memory'
+    CACHE_BACKEND = 'memory'
+    TASK_DEDUP_BACKEND = 'memory'
 
 
 # Configuration dictionary
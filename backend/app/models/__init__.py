@@ -11,9 +11,11 @@ bcrypt = Bcrypt()
 from .user import User, UserRole
 from .student import Student
 from .document import Document, DocumentType, DocumentStatus
+from .document_blob import DocumentBlob
 from .college import College, Course
 from .choice import Choice
-from .allotment import Allotment, AllotmentStatus, AllotmentRound
+from .allotment import Allotment, AllotmentStatus, AllotmentRound, RoundCutoff
+from .seat_ledger import SeatLedgerEntry
 from .payment import Payment, PaymentStatus, PaymentType
 from .notification import Notification, NotificationType
 from .otp import OTP, OTPPurpose
@@ -28,12 +30,15 @@ __all__ = [
     'Document',
     'DocumentType',
     'DocumentStatus',
+    'DocumentBlob',
     'College',
     'Course',
     'Choice',
     'Allotment',
     'AllotmentStatus',
     'AllotmentRound',
+    'RoundCutoff',
+    'SeatLedgerEntry',
     'Payment',
     'PaymentStatus',
     'PaymentType',
@@ -14,6 +14,7 @@ class AllotmentStatus(str, Enum):
     REJECTED = 'rejected'  # Student rejects the seat
     CANCELLED = 'cancelled'  # Admin cancelled
     UPGRADED = 'upgraded'  # Student got upgraded in next round
+    LAPSED = 'lapsed'  # No answer before the acceptance deadline
 
 
 class AllotmentRound(db.Model):
@@ -32,6 +33,7 @@ class AllotmentRound(db.Model):
     total_allotments = db.Column(db.Integer, default=0)
     accepted_count = db.Column(db.Integer, default=0)
     rejected_count = db.Column(db.Integer, default=0)
+    lapsed_count = db.Column(db.Integer, default=0)
 
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -53,6 +55,7 @@ class AllotmentRound(db.Model):
             'total_allotments': self.total_allotments,
             'accepted_count': self.accepted_count,
             'rejected_count': self.rejected_count,
+            'lapsed_count': self.lapsed_count,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
@@ -78,6 +81,7 @@ class Allotment(db.Model):
     # Acceptance Details
     acceptance_date = db.Column(db.DateTime, nullable=True)
     rejection_reason = db.Column(db.Text, nullable=True)
+    idempotency_key = db.Column(db.String(64), nullable=True)  # Key of the request that answered the allotment
 
     # Letter Generation
     allotment_letter_generated = db.Column(db.Boolean, default=False)
@@ -126,3 +130,36 @@ class Allotment(db.Model):
 
     def __repr__(self):
         return f'<Allotment Student:{self.student_id} Course:{self.course_id} Round:{self.round_id}>'
+
+
+class RoundCutoff(db.Model):
+    """Opening and closing rank of a course and category in a completed round"""
+    __tablename__ = 'round_cutoffs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    round_id = db.Column(db.Integer, db.ForeignKey('allotment_rounds.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    category = db.Column(db.Enum('General', 'OBC', 'SC', 'ST', 'EWS'), nullable=False)
+
+    opening_rank = db.Column(db.Integer, nullable=False)
+    closing_rank = db.Column(db.Integer, nullable=False)
+    seats_filled = db.Column(db.Integer, nullable=False)
+
+    # One row per round, course and category; also serves lookups by round
+    __table_args__ = (
+        db.UniqueConstraint('round_id', 'course_id', 'category', name='uq_round_course_category_cutoff'),
+    )
+
+    def to_dict(self):
+        """Convert cutoff to dictionary"""
+        return {
+            'round_id': self.round_id,
+            'course_id': self.course_id,
+            'category': self.category,
+            'opening_rank': self.opening_rank,
+            'closing_rank': self.closing_rank,
+            'seats_filled': self.seats_filled
+        }
+
+    def __repr__(self):
+        return f'<RoundCutoff Round:{self.round_id} Course:{self.course_id} {self.category}>'
@@ -2,6 +2,7 @@
 Audit log model for tracking system activities
 """
 from datetime import datetime
+from flask import current_app, has_app_context
 from . import db
 
 
@@ -10,11 +11,11 @@ class AuditLog(db.Model):
     __tablename__ = 'audit_logs'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
 
     # Action Details
     action = db.Column(db.String(100), nullable=False, index=True)
-    entity_type = db.Column(db.String(50), nullable=True, index=True)  # User, Student, Document, etc.
+    entity_type = db.Column(db.String(50), nullable=True)  # User, Student, Document, etc.
     entity_id = db.Column(db.Integer, nullable=True, index=True)
 
     # Request Details
@@ -35,6 +36,14 @@ class AuditLog(db.Model):
     # Timestamp
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
 
+    # Composite indexes lead with the searched column and end with created_at
+    # so filtered searches read in keyset order without sorting
+    __table_args__ = (
+        db.Index('ix_audit_logs_entity_created', 'entity_type', 'entity_id', 'created_at'),
+        db.Index('ix_audit_logs_user_created', 'user_id', 'created_at'),
+        db.Index('ix_audit_logs_ip_created', 'ip_address', 'created_at'),
+    )
+
     def to_dict(self):
         """Convert audit log to dictionary"""
         return {
@@ -60,8 +69,14 @@ class AuditLog(db.Model):
                    description=None, old_values=None, new_values=None,
                    ip_address=None, user_agent=None, request_method=None,
                    request_path=None, status='success', error_message=None):
-        """Create an audit log entry"""
-        log = cls(
+        """
+        Create an audit log entry
+
+        With the audit sink installed the entry is queued and written in a
+        batch outside the caller's transaction; otherwise it is added to
+        the session.
+        """
+        entry = dict(
             user_id=user_id,
             action=action,
             entity_type=entity_type,
@@ -74,8 +89,16 @@ class AuditLog(db.Model):
             request_method=request_method,
             request_path=request_path,
             status=status,
-            error_message=error_message
+            error_message=error_message,
+            created_at=datetime.utcnow()
         )
+
+        sink = current_app.extensions.get('audit_sink') if has_app_context() else None
+        if sink is not None:
+            sink.record(entry)
+            return None
+
+        log = cls(**entry)
         db.session.add(log)
         return log
 
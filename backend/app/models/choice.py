@@ -13,7 +13,8 @@ class Choice(db.Model):
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False, index=True)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False, index=True)
 
-    # Preference order (1 = highest preference)
+    # Sparse preference order key (lower = higher preference); gaps let a
+    # choice be inserted or moved without renumbering the others
     preference_order = db.Column(db.Integer, nullable=False)
 
     # Status
@@ -90,6 +90,15 @@ class Course(db.Model):
     st_seats = db.Column(db.Integer, nullable=False, default=0)
     ews_seats = db.Column(db.Integer, nullable=False, default=0)
 
+    # Seat counter column for each reservation category
+    CATEGORY_SEAT_COLUMNS = {
+        'General': 'general_seats',
+        'OBC': 'obc_seats',
+        'SC': 'sc_seats',
+        'ST': 'st_seats',
+        'EWS': 'ews_seats'
+    }
+
     # Fee Information
     tuition_fee = db.Column(db.Numeric(10, 2), nullable=False)
     other_fees = db.Column(db.Numeric(10, 2), nullable=False, default=0)
@@ -22,9 +22,11 @@ class DocumentType(str, Enum):
 
 class DocumentStatus(str, Enum):
     """Document verification status"""
-    PENDING = 'pending'
+    PENDING = 'pending'  # Uploaded, awaiting file inspection
+    READY = 'ready'  # Passed inspection, awaiting review
     VERIFIED = 'verified'
     REJECTED = 'rejected'
+    INVALID = 'invalid'  # Mislabelled or corrupt file
 
 
 class Document(db.Model):
@@ -41,6 +43,7 @@ class Document(db.Model):
     file_size = db.Column(db.Integer, nullable=False)  # in bytes
     file_extension = db.Column(db.String(10), nullable=False)
     mime_type = db.Column(db.String(100), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=True, index=True)  # SHA-256 hex digest
 
     # Verification Information
     status = db.Column(db.Enum(DocumentStatus), default=DocumentStatus.PENDING, nullable=False)
@@ -48,6 +51,10 @@ class Document(db.Model):
     verified_at = db.Column(db.DateTime, nullable=True)
     rejection_reason = db.Column(db.Text, nullable=True)
 
+    # Review Lease (reviewer currently holding the document)
+    claimed_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    claimed_until = db.Column(db.DateTime, nullable=True)
+
     # Timestamps
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -55,6 +62,10 @@ class Document(db.Model):
     # Relationships
     verifier = db.relationship('User', foreign_keys=[verified_by], backref='verified_documents')
 
+    __table_args__ = (
+        db.Index('ix_documents_status_uploaded', 'status', 'uploaded_at'),
+    )
+
     def to_dict(self):
         """Convert document to dictionary"""
         return {
@@ -68,6 +79,8 @@ class Document(db.Model):
             'verified_by': self.verified_by,
             'verified_at': self.verified_at.isoformat() if self.verified_at else None,
             'rejection_reason': self.rejection_reason,
+            'claimed_by': self.claimed_by,
+            'claimed_until': self.claimed_until.isoformat() if self.claimed_until else None,
             'uploaded_at': self.uploaded_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
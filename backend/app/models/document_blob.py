@@ -0,0 +1,34 @@
+"""
+Document blob model for content-addressed file storage
+"""
+from datetime import datetime
+from . import db
+
+
+class DocumentBlob(db.Model):
+    """Stored file content, shared by every document with the same SHA-256"""
+    __tablename__ = 'document_blobs'
+
+    content_hash = db.Column(db.String(64), primary_key=True)  # SHA-256 hex digest
+    file_path = db.Column(db.String(500), nullable=False)
+    file_size = db.Column(db.Integer, nullable=False)  # in bytes
+
+    # Number of documents referencing this blob
+    ref_count = db.Column(db.Integer, default=0, nullable=False, index=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        """Convert blob to dictionary"""
+        return {
+            'content_hash': self.content_hash,
+            'file_size': self.file_size,
+            'ref_count': self.ref_count,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+    def __repr__(self):
+        return f'<DocumentBlob {self.content_hash[:12]} refs:{self.ref_count}>'
@@ -50,6 +50,11 @@ class OTP(db.Model):
     # Relationships
     user = db.relationship('User', backref='otps', foreign_keys=[user_id])
 
+    # Composite index for the latest-unused-OTP lookup
+    __table_args__ = (
+        db.Index('ix_otps_user_purpose_used_created', 'user_id', 'purpose', 'is_used', 'created_at'),
+    )
+
     @staticmethod
     def generate_code(length=6):
         """Generate a random OTP code"""
@@ -0,0 +1,45 @@
+"""
+Seat ledger model - append-only history of course seat counter changes
+"""
+from datetime import datetime
+from . import db
+
+
+class SeatLedgerEntry(db.Model):
+    """
+    One change to a course's seat counters
+
+    Opening entries hold a course's balance when its ledger starts: the
+    entry without a category is the total available seats, the others the
+    per-category seats. Every later entry moves both the total and its
+    category by delta.
+    """
+    __tablename__ = 'seat_ledger'
+
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    category = db.Column(db.Enum('General', 'OBC', 'SC', 'ST', 'EWS'), nullable=True)
+    delta = db.Column(db.Integer, nullable=False)
+    cause = db.Column(db.String(20), nullable=False)  # opening, allotted, rejected, lapsed
+    allotment_id = db.Column(db.Integer, db.ForeignKey('allotments.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # Reconciliation aggregates by course and category
+    __table_args__ = (
+        db.Index('ix_seat_ledger_course_category', 'course_id', 'category'),
+    )
+
+    def to_dict(self):
+        """Convert ledger entry to dictionary"""
+        return {
+            'id': self.id,
+            'course_id': self.course_id,
+            'category': self.category,
+            'delta': self.delta,
+            'cause': self.cause,
+            'allotment_id': self.allotment_id,
+            'created_at': self.created_at.isoformat()
+        }
+
+    def __repr__(self):
+        return f'<SeatLedgerEntry Course:{self.course_id} {self.category} {self.delta:+d} {self.cause}>'
@@ -1,15 +1,22 @@
 """
 Admin routes
 """
-from flask import Blueprint, request, jsonify
+import os
+import uuid
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy import func, or_
 from datetime import datetime, timedelta
 from app.models import (
     db, User, Student, Document, Payment, Allotment, AllotmentRound,
-    College, Course, UserRole
+    College, Course, UserRole, AuditLog, DocumentStatus
 )
 from app.services.seat_allotment_service import SeatAllotmentService
+from app.services.choice_service import ChoiceService
+from app.services.allotment_letter_service import AllotmentLetterService
+from app.services.task_queue import task_queue, TaskPriority
+from app.services.student_import_service import StudentImportService
+from app.services.audit_partition_service import AuditPartitionService, encode_cursor, decode_cursor
 
 bp = Blueprint('admin', __name__)
 
@@ -46,7 +53,9 @@ def get_admin_dashboard():
             .filter_by(status='success').scalar() or 0
 
         # Document statistics
-        documents_pending = Document.query.filter_by(status='pending').count()
+        documents_pending = Document.query.filter(
+            Document.status.in_([DocumentStatus.PENDING, DocumentStatus.READY])
+        ).count()
 
         # College and course statistics
         total_colleges = College.query.filter_by(is_active=True).count()
@@ -147,6 +156,61 @@ def get_all_students():
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/students/import', methods=['POST'])
+@jwt_required()
+def import_students():
+    """Bulk register students from a CSV rank list in the background"""
+    try:
+        user = require_admin()
+        if not user:
+            return jsonify({'error': 'Unauthorized - Admin access required'}), 403
+
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+
+        mark_verified = request.form.get('mark_verified', 'false').lower() == 'true'
+
+        # The upload is saved so the task queue can read it after the request
+        job_id = uuid.uuid4().hex
+        import_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'imports')
+        os.makedirs(import_dir, exist_ok=True)
+        csv_path = os.path.join(import_dir, f'{job_id}.csv')
+        request.files['file'].save(csv_path)
+
+        StudentImportService.set_job(job_id, 'queued')
+        task_queue.enqueue(
+            StudentImportService.run_job, job_id, csv_path, mark_verified, user.id,
+            priority=TaskPriority.LOW
+        )
+
+        return jsonify({
+            'message': 'Student import started',
+            'job_id': job_id
+        }), 202
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/students/import/<job_id>', methods=['GET'])
+@jwt_required()
+def get_import_job(job_id):
+    """Get the status and result of a background student import"""
+    try:
+        user = require_admin()
+        if not user:
+            return jsonify({'error': 'Unauthorized - Admin access required'}), 403
+
+        job = StudentImportService.get_job(job_id)
+        if not job:
+            return jsonify({'error': 'Import job not found'}), 404
+
+        return jsonify({'job': job}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/reports/applications', methods=['GET'])
 @jwt_required()
 def generate_application_report():
@@ -194,6 +258,82 @@ def generate_application_report():
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/audit-logs', methods=['GET'])
+@jwt_required()
+def search_audit_logs():
+    """Search audit logs across live, partitioned and archived storage (keyset paginated)"""
+    try:
+        user = require_admin()
+        if not user:
+            return jsonify({'error': 'Unauthorized - Admin access required'}), 403
+
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        limit = max(1, min(request.args.get('limit', 100, type=int), 500))
+
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d') if start_date else None
+            end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1) if end_date else None
+        except ValueError:
+            return jsonify({'error': 'start_date and end_date must be YYYY-MM-DD'}), 400
+
+        cursor = request.args.get('cursor')
+        try:
+            before = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Fetch one extra entry to know whether another page exists
+        logs = AuditPartitionService.query(
+            start=start,
+            end=end,
+            limit=limit + 1,
+            before=before,
+            user_id=request.args.get('user_id', type=int),
+            action=request.args.get('action'),
+            entity_type=request.args.get('entity_type'),
+            entity_id=request.args.get('entity_id', type=int),
+            ip_address=request.args.get('ip_address'),
+            status=request.args.get('status')
+        )
+        has_more = len(logs) > limit
+        logs = logs[:limit]
+
+        return jsonify({
+            'logs': logs,
+            'count': len(logs),
+            'next_cursor': encode_cursor(logs[-1]) if has_more else None
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/choices/lock', methods=['POST'])
+@jwt_required()
+def lock_choices():
+    """Lock every unsubmitted choice list once the choice filling deadline has passed"""
+    try:
+        user = require_admin()
+        if not user:
+            return jsonify({'error': 'Unauthorized - Admin access required'}), 403
+
+        data = request.get_json(silent=True) or {}
+        if not data.get('force') and not ChoiceService.deadline_passed():
+            return jsonify({'error': 'Choice filling deadline has not passed'}), 400
+
+        result = ChoiceService.lock_outstanding()
+
+        return jsonify({
+            'message': 'Choice lists locked successfully',
+            'result': result
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/allotment/trigger', methods=['POST'])
 @jwt_required()
 def trigger_allotment():
@@ -247,6 +387,39 @@ def trigger_allotment():
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/allotment/<int:round_id>/letters', methods=['POST'])
+@jwt_required()
+def generate_letters(round_id):
+    """Generate allotment letters for a round in the background"""
+    try:
+        user = require_admin()
+        if not user:
+            return jsonify({'error': 'Unauthorized - Admin access required'}), 403
+
+        if not AllotmentRound.query.get(round_id):
+            return jsonify({'error': 'Round not found'}), 404
+
+        data = request.get_json(silent=True) or {}
+        letter_format = data.get('format')
+        if letter_format and letter_format not in ('pdf', 'png'):
+            return jsonify({'error': 'Letter format must be pdf or png'}), 400
+
+        # Letters already generated are skipped, so a repeated run resumes;
+        # the key is held while the run is queued or rendering
+        queued = task_queue.enqueue_once(
+            f'allotment_letters:{round_id}', current_app.config['ALLOTMENT_LETTER_LOCK_SECONDS'],
+            AllotmentLetterService.generate_round, round_id, letter_format,
+            priority=TaskPriority.LOW, hold_until_done=True
+        )
+
+        return jsonify({
+            'message': 'Letter generation started' if queued else 'Letter generation already started'
+        }), 202
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/colleges', methods=['GET'])
 @jwt_required()
 def get_colleges():
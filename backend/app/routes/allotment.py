@@ -1,13 +1,19 @@
 """
 Seat allotment routes
 """
+import hmac
+import os
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import db, User, Student, Allotment, AllotmentRound, UserRole, AuditLog
 from app.services.seat_allotment_service import SeatAllotmentService
+from app.services.allotment_letter_service import AllotmentLetterService
+from app.services.file_delivery_service import FileDeliveryService
 
 bp = Blueprint('allotment', __name__)
 
+MAX_IDEMPOTENCY_KEY_LENGTH = 64
+
 
 @bp.route('/my-allotment', methods=['GET'])
 @jwt_required()
@@ -61,13 +67,26 @@ def accept_allotment(allotment_id):
         if allotment.student.user_id != user.id:
             return jsonify({'error': 'Unauthorized'}), 403
 
-        data = request.get_json()
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key and len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            return jsonify({'error': 'Idempotency-Key is too long'}), 400
+
+        data = request.get_json() or {}
         freeze = data.get('freeze', True)  # True = freeze, False = upgrade
 
-        # Accept seat
-        success = SeatAllotmentService.accept_seat(allotment_id, freeze)
+        # Accept seat; a retried request with the same key is a no-op
+        success, replayed = SeatAllotmentService.accept_seat(
+            allotment_id, freeze, idempotency_key
+        )
 
         if success:
+            if replayed:
+                return jsonify({
+                    'message': 'Seat accepted successfully',
+                    'frozen': freeze,
+                    'replayed': True
+                }), 200
+
             # Log action
             AuditLog.log_action(
                 user_id=user.id,
@@ -76,7 +95,6 @@ def accept_allotment(allotment_id):
                 entity_id=allotment.id,
                 description=f'Seat {"frozen" if freeze else "accepted with upgrade"}'
             )
-            db.session.commit()
 
             return jsonify({
                 'message': 'Seat accepted successfully',
@@ -108,13 +126,22 @@ def reject_allotment(allotment_id):
         if allotment.student.user_id != user.id:
             return jsonify({'error': 'Unauthorized'}), 403
 
-        data = request.get_json()
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key and len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            return jsonify({'error': 'Idempotency-Key is too long'}), 400
+
+        data = request.get_json() or {}
         reason = data.get('reason', 'No reason provided')
 
-        # Reject seat
-        success = SeatAllotmentService.reject_seat(allotment_id, reason)
+        # Reject seat; a retried request with the same key is a no-op
+        success, replayed = SeatAllotmentService.reject_seat(
+            allotment_id, reason, idempotency_key
+        )
 
         if success:
+            if replayed:
+                return jsonify({'message': 'Seat rejected successfully', 'replayed': True}), 200
+
             # Log action
             AuditLog.log_action(
                 user_id=user.id,
@@ -123,7 +150,6 @@ def reject_allotment(allotment_id):
                 entity_id=allotment.id,
                 description=f'Seat rejected: {reason}'
             )
-            db.session.commit()
 
             return jsonify({'message': 'Seat rejected successfully'}), 200
         else:
@@ -133,6 +159,63 @@ def reject_allotment(allotment_id):
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/<int:allotment_id>/letter', methods=['GET'])
+@jwt_required()
+def download_letter(allotment_id):
+    """Download an allotment letter"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        user = User.query.get(current_user_id)
+
+        allotment = Allotment.query.get(allotment_id)
+        if not allotment:
+            return jsonify({'error': 'Allotment not found'}), 404
+
+        # Check permissions
+        if user.role == UserRole.STUDENT:
+            if not user.student or allotment.student_id != user.student.id:
+                return jsonify({'error': 'Unauthorized'}), 403
+        elif user.role != UserRole.ADMIN:
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        if not allotment.allotment_letter_generated or not os.path.exists(allotment.allotment_letter_path):
+            return jsonify({'error': 'Allotment letter not generated yet'}), 404
+
+        extension = os.path.splitext(allotment.allotment_letter_path)[1]
+        return FileDeliveryService.send(
+            allotment.allotment_letter_path,
+            f'allotment_letter_round_{allotment.round.round_number}{extension}'
+        )
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/<int:allotment_id>/verify', methods=['GET'])
+def verify_letter(allotment_id):
+    """Verify an allotment letter from the token in its QR code"""
+    try:
+        allotment = Allotment.query.get(allotment_id)
+        token = request.args.get('token', '')
+
+        if not allotment or not hmac.compare_digest(token, AllotmentLetterService.verification_token(
+                allotment.id, allotment.student_id, allotment.course_id)):
+            return jsonify({'valid': False}), 404
+
+        return jsonify({
+            'valid': True,
+            'student_name': allotment.student.full_name,
+            'exam_roll_number': allotment.student.exam_roll_number,
+            'college': allotment.course.college.name,
+            'course': allotment.course.name,
+            'round_number': allotment.round.round_number,
+            'status': allotment.status.value
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/rounds', methods=['GET'])
 @jwt_required()
 def get_allotment_rounds():
@@ -165,6 +248,34 @@ def get_round_details(round_id):
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/round/<int:round_id>/cutoffs', methods=['GET'])
+@jwt_required()
+def get_round_cutoffs(round_id):
+    """Get opening and closing ranks per course and category for a round"""
+    try:
+        allotment_round = AllotmentRound.query.get(round_id)
+        if not allotment_round:
+            return jsonify({'error': 'Round not found'}), 404
+
+        cutoffs = SeatAllotmentService.get_round_cutoffs(round_id)
+
+        # Optional filters applied to the cached list
+        course_id = request.args.get('course_id', type=int)
+        category = request.args.get('category')
+        if course_id is not None:
+            cutoffs = [cutoff for cutoff in cutoffs if cutoff['course_id'] == course_id]
+        if category:
+            cutoffs = [cutoff for cutoff in cutoffs if cutoff['category'] == category]
+
+        return jsonify({
+            'round': allotment_round.to_dict(),
+            'cutoffs': cutoffs
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/statistics', methods=['GET'])
 @jwt_required()
 def get_allotment_statistics():
@@ -1,17 +1,42 @@
 """
 Authentication routes
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
-from app.models import db, User, Student, OTP, OTPPurpose, UserRole, AuditLog
+from app.models import db, User, Student, OTPPurpose, UserRole, AuditLog
 from app.utils.validators import validate_email, validate_mobile, validate_password
 from app.services.email_service import EmailService
 from app.services.sms_service import SMSService
+from app.services.otp_store import get_otp_store
+from app.services.task_queue import task_queue, TaskPriority
 
 bp = Blueprint('auth', __name__)
 
 
+def claim_otp_send(user_id, purpose):
+    """Claim the per-user send window for an OTP purpose; False if a send is already pending"""
+    return task_queue.claim(f"otp:{user_id}:{purpose.value}", current_app.config['OTP_RESEND_DEDUP_SECONDS'])
+
+
+def release_otp_send(user_id, purpose):
+    """Free the send window after a failed send so the user can retry"""
+    task_queue.release(f"otp:{user_id}:{purpose.value}")
+
+
+def send_otp(send, purpose, *args, user_id):
+    """Task body for an OTP send; frees the send window if the send fails"""
+    try:
+        sent = send(*args, user_id=user_id)
+    except Exception:
+        release_otp_send(user_id, purpose)
+        raise
+
+    if not sent:
+        release_otp_send(user_id, purpose)
+    return sent
+
+
 @bp.route('/register', methods=['POST'])
 def register():
     """Register a new student user"""
@@ -78,27 +103,33 @@ def register():
 
         db.session.add(student)
 
+        otp_store = get_otp_store()
+
         # Generate OTP for email verification
-        email_otp = OTP.create_otp(
+        email_code = otp_store.issue(
             purpose=OTPPurpose.EMAIL_VERIFICATION,
             email=user.email,
             user_id=user.id
         )
-        db.session.add(email_otp)
 
         # Generate OTP for mobile verification
-        mobile_otp = OTP.create_otp(
+        mobile_code = otp_store.issue(
             purpose=OTPPurpose.MOBILE_VERIFICATION,
             mobile=user.mobile,
             user_id=user.id
         )
-        db.session.add(mobile_otp)
 
         db.session.commit()
 
-        # Send OTPs
-        EmailService.send_otp_email(user.email, email_otp.code, 'email verification', user.id)
-        SMSService.send_otp_sms(user.mobile, mobile_otp.code, user.id)
+        # Send OTPs in the background
+        claim_otp_send(user.id, OTPPurpose.EMAIL_VERIFICATION)
+        claim_otp_send(user.id, OTPPurpose.MOBILE_VERIFICATION)
+        task_queue.enqueue(send_otp, EmailService.send_otp_email, OTPPurpose.EMAIL_VERIFICATION,
+                           user.email, email_code, 'email verification', user_id=user.id,
+                           priority=TaskPriority.HIGH)
+        task_queue.enqueue(send_otp, SMSService.send_otp_sms, OTPPurpose.MOBILE_VERIFICATION,
+                           user.mobile, mobile_code, user_id=user.id,
+                           priority=TaskPriority.HIGH)
 
         # Log action
         AuditLog.log_action(
@@ -111,7 +142,6 @@ def register():
             request_method=request.method,
             request_path=request.path
         )
-        db.session.commit()
 
         return jsonify({
             'message': 'Registration successful. Please verify your email and mobile.',
@@ -142,18 +172,13 @@ def verify_otp():
         purpose = (OTPPurpose.EMAIL_VERIFICATION if data['type'] == 'email'
                   else OTPPurpose.MOBILE_VERIFICATION)
 
-        # Find OTP
-        otp = OTP.query.filter_by(
-            user_id=user.id,
-            purpose=purpose,
-            is_used=False
-        ).order_by(OTP.created_at.desc()).first()
+        # Verify OTP
+        verified = get_otp_store().verify(user.id, purpose, data['otp'])
 
-        if not otp:
+        if verified is None:
             return jsonify({'error': 'OTP not found or already used'}), 404
 
-        # Verify OTP
-        if otp.verify(data['otp']):
+        if verified:
             # Update user verification status
             if purpose == OTPPurpose.EMAIL_VERIFICATION:
                 user.email_verified = True
@@ -198,17 +223,27 @@ def resend_otp():
         purpose = (OTPPurpose.EMAIL_VERIFICATION if data['type'] == 'email'
                   else OTPPurpose.MOBILE_VERIFICATION)
 
+        # Repeated clicks within the dedup window reuse the pending send
+        if not claim_otp_send(user.id, purpose):
+            return jsonify({'message': 'OTP sent successfully'}), 200
+
         # Create new OTP
-        if data['type'] == 'email':
-            otp = OTP.create_otp(purpose=purpose, email=user.email, user_id=user.id)
-            db.session.add(otp)
-            db.session.commit()
-            EmailService.send_otp_email(user.email, otp.code, 'email verification', user.id)
-        else:
-            otp = OTP.create_otp(purpose=purpose, mobile=user.mobile, user_id=user.id)
-            db.session.add(otp)
-            db.session.commit()
-            SMSService.send_otp_sms(user.mobile, otp.code, user.id)
+        try:
+            if data['type'] == 'email':
+                code = get_otp_store().issue(purpose=purpose, email=user.email, user_id=user.id)
+                db.session.commit()
+                task_queue.enqueue(send_otp, EmailService.send_otp_email, purpose,
+                                   user.email, code, 'email verification', user_id=user.id,
+                                   priority=TaskPriority.HIGH)
+            else:
+                code = get_otp_store().issue(purpose=purpose, mobile=user.mobile, user_id=user.id)
+                db.session.commit()
+                task_queue.enqueue(send_otp, SMSService.send_otp_sms, purpose,
+                                   user.mobile, code, user_id=user.id,
+                                   priority=TaskPriority.HIGH)
+        except Exception:
+            release_otp_send(user.id, purpose)
+            raise
 
         return jsonify({'message': 'OTP sent successfully'}), 200
 
@@ -274,7 +309,6 @@ def login():
             request_method=request.method,
             request_path=request.path
         )
-        db.session.commit()
 
         return jsonify({
             'message': 'Login successful',
@@ -340,17 +374,25 @@ def forgot_password():
             # Don't reveal if email exists
             return jsonify({'message': 'If the email exists, a reset code has been sent'}), 200
 
-        # Create OTP for password reset
-        otp = OTP.create_otp(
-            purpose=OTPPurpose.PASSWORD_RESET,
-            email=user.email,
-            user_id=user.id
-        )
-        db.session.add(otp)
-        db.session.commit()
+        if not claim_otp_send(user.id, OTPPurpose.PASSWORD_RESET):
+            return jsonify({'message': 'If the email exists, a reset code has been sent'}), 200
 
-        # Send OTP
-        EmailService.send_otp_email(user.email, otp.code, 'password reset', user.id)
+        try:
+            # Create OTP for password reset
+            code = get_otp_store().issue(
+                purpose=OTPPurpose.PASSWORD_RESET,
+                email=user.email,
+                user_id=user.id
+            )
+            db.session.commit()
+
+            # Send OTP in the background
+            task_queue.enqueue(send_otp, EmailService.send_otp_email, OTPPurpose.PASSWORD_RESET,
+                               user.email, code, 'password reset', user_id=user.id,
+                               priority=TaskPriority.HIGH)
+        except Exception:
+            release_otp_send(user.id, OTPPurpose.PASSWORD_RESET)
+            raise
 
         return jsonify({'message': 'If the email exists, a reset code has been sent'}), 200
 
@@ -379,14 +421,9 @@ def reset_password():
         if not is_valid:
             return jsonify({'error': message}), 400
 
-        # Find OTP
-        otp = OTP.query.filter_by(
-            user_id=user.id,
-            purpose=OTPPurpose.PASSWORD_RESET,
-            is_used=False
-        ).order_by(OTP.created_at.desc()).first()
-
-        if not otp or not otp.verify(data['otp']):
+        # Verify OTP
+        if not get_otp_store().verify(user.id, OTPPurpose.PASSWORD_RESET, data['otp']):
+            db.session.commit()
             return jsonify({'error': 'Invalid or expired OTP'}), 400
 
         # Reset password
@@ -402,7 +439,6 @@ def reset_password():
             description='Password reset successfully',
             ip_address=request.remote_addr
         )
-        db.session.commit()
 
         return jsonify({'message': 'Password reset successful'}), 200
 
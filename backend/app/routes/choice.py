@@ -1,15 +1,27 @@
 """
 Choice filling routes
 """
+from functools import wraps
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime
-from app.models import db, User, Student, Choice, Course, College, UserRole, AuditLog
+from app.models import db, User, Student, Course, College, UserRole, AuditLog
+from app.services.choice_service import ChoiceService
+from app.services.admission_hint_service import AdmissionHintService
 from sqlalchemy import and_
 
 bp = Blueprint('choice', __name__)
 
 
+def choice_filling_open(view):
+    """Reject choice list edits once the choice filling deadline has passed"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if ChoiceService.deadline_passed():
+            return jsonify({'error': 'Choice filling deadline has passed'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
 @bp.route('/eligible-colleges', methods=['GET'])
 @jwt_required()
 def get_eligible_colleges():
@@ -38,6 +50,7 @@ def get_eligible_colleges():
 
         # Group by college
         colleges_data = {}
+        course_dicts = []
         for course in courses:
             college = course.college
             if college.id not in colleges_data:
@@ -45,12 +58,18 @@ def get_eligible_colleges():
                     'college': college.to_dict(),
                     'courses': []
                 }
-            colleges_data[college.id]['courses'].append(course.to_dict())
+            course_dict = course.to_dict()
+            colleges_data[college.id]['courses'].append(course_dict)
+            course_dicts.append(course_dict)
+
+        # Last round's closing ranks, served from memory
+        hints_round = AdmissionHintService.annotate(course_dicts, student)
 
         return jsonify({
             'eligible_colleges': list(colleges_data.values()),
             'total_colleges': len(colleges_data),
-            'total_courses': len(courses)
+            'total_courses': len(courses),
+            'hints_round': hints_round
         }), 200
 
     except Exception as e:
@@ -59,6 +78,7 @@ def get_eligible_colleges():
 
 @bp.route('/add', methods=['POST'])
 @jwt_required()
+@choice_filling_open
 def add_choice():
     """Add a college/course to choice list"""
     try:
@@ -85,37 +105,15 @@ def add_choice():
         if not course or not course.is_active:
             return jsonify({'error': 'Invalid course'}), 404
 
-        # Check max choices limit
-        max_choices = current_app.config['MAX_CHOICES']
-        existing_choices_count = Choice.query.filter_by(student_id=student.id).count()
-
-        if existing_choices_count >= max_choices:
-            return jsonify({'error': f'Maximum {max_choices} choices allowed'}), 400
-
-        # Check if choice already exists
-        existing_choice = Choice.query.filter_by(
-            student_id=student.id,
-            course_id=course.id
-        ).first()
-
-        if existing_choice:
-            return jsonify({'error': 'Course already added to choices'}), 400
-
-        # Add choice with next preference order
-        preference_order = existing_choices_count + 1
-
-        choice = Choice(
-            student_id=student.id,
-            course_id=course.id,
-            preference_order=preference_order
-        )
-
-        db.session.add(choice)
-        db.session.commit()
+        # Drafts are autosaved to the draft store, not the choices table
+        try:
+            choice = ChoiceService.add(student, course)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
         return jsonify({
             'message': 'Choice added successfully',
-            'choice': choice.to_dict(include_course=True, include_college=True)
+            'choice': choice
         }), 201
 
     except Exception as e:
@@ -138,11 +136,10 @@ def list_choices():
         if not student:
             return jsonify({'error': 'Student profile not found'}), 404
 
-        choices = Choice.query.filter_by(student_id=student.id)\
-            .order_by(Choice.preference_order).all()
+        choices = ChoiceService.list_choices(student)
 
         return jsonify({
-            'choices': [choice.to_dict(include_course=True, include_college=True) for choice in choices],
+            'choices': choices,
             'total_choices': len(choices),
             'max_choices': current_app.config['MAX_CHOICES'],
             'submitted': student.choices_submitted
@@ -152,10 +149,11 @@ def list_choices():
         return jsonify({'error': str(e)}), 500
 
 
-@bp.route('/<int:choice_id>/remove', methods=['DELETE'])
+@bp.route('/list', methods=['PUT'])
 @jwt_required()
-def remove_choice(choice_id):
-    """Remove a choice"""
+@choice_filling_open
+def replace_choices():
+    """Replace the whole choice list in one transaction"""
     try:
         current_user_id = int(get_jwt_identity())
         user = User.query.get(current_user_id)
@@ -171,23 +169,52 @@ def remove_choice(choice_id):
         if student.choices_submitted:
             return jsonify({'error': 'Choices are already submitted and locked'}), 400
 
-        choice = Choice.query.get(choice_id)
-        if not choice or choice.student_id != student.id:
-            return jsonify({'error': 'Choice not found'}), 404
+        data = request.get_json() or {}
+
+        if 'course_ids' not in data:
+            return jsonify({'error': 'course_ids array is required'}), 400
+
+        try:
+            choices = ChoiceService.replace_list(student, data['course_ids'])
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'message': 'Choices saved successfully',
+            'choices': choices,
+            'total_choices': len(choices)
+        }), 200
 
-        preference_order = choice.preference_order
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
 
-        db.session.delete(choice)
 
-        # Reorder remaining choices
-        remaining_choices = Choice.query.filter_by(student_id=student.id)\
-            .filter(Choice.preference_order > preference_order)\
-            .order_by(Choice.preference_order).all()
+@bp.route('/<int:course_id>/remove', methods=['DELETE'])
+@jwt_required()
+@choice_filling_open
+def remove_choice(course_id):
+    """Remove a choice"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        user = User.query.get(current_user_id)
 
-        for c in remaining_choices:
-            c.preference_order -= 1
+        if not user or user.role != UserRole.STUDENT:
+            return jsonify({'error': 'Unauthorized'}), 403
 
-        db.session.commit()
+        student = user.student
+        if not student:
+            return jsonify({'error': 'Student profile not found'}), 404
+
+        # Check if choices are locked
+        if student.choices_submitted:
+            return jsonify({'error': 'Choices are already submitted and locked'}), 400
+
+        try:
+            ChoiceService.remove(student, course_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 404
 
         return jsonify({'message': 'Choice removed successfully'}), 200
 
@@ -198,6 +225,7 @@ def remove_choice(choice_id):
 
 @bp.route('/reorder', methods=['PUT'])
 @jwt_required()
+@choice_filling_open
 def reorder_choices():
     """Reorder choices"""
     try:
@@ -220,13 +248,21 @@ def reorder_choices():
         if 'choices' not in data:
             return jsonify({'error': 'Choices array is required'}), 400
 
-        # Update preference orders
-        for item in data['choices']:
-            choice = Choice.query.get(item['choice_id'])
-            if choice and choice.student_id == student.id:
-                choice.preference_order = item['preference_order']
-
-        db.session.commit()
+        # Drafts are keyed by course, so items carry course_id rather than choice_id
+        items = data['choices']
+        if not isinstance(items, list) or not all(
+            isinstance(item, dict)
+            and isinstance(item.get('course_id'), int)
+            and isinstance(item.get('preference_order'), int)
+            for item in items
+        ):
+            return jsonify({
+                'error': 'Each choice needs an integer course_id and preference_order; choice_id is no longer accepted'
+            }), 400
+
+        # Only choices whose position changes get a new order key
+        items = sorted(items, key=lambda item: item['preference_order'])
+        ChoiceService.reorder(student, [item['course_id'] for item in items])
 
         return jsonify({'message': 'Choices reordered successfully'}), 200
 
@@ -235,8 +271,46 @@ def reorder_choices():
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/<int:course_id>/move', methods=['PUT'])
+@jwt_required()
+@choice_filling_open
+def move_choice(course_id):
+    """Move a choice to a new position"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        user = User.query.get(current_user_id)
+
+        if not user or user.role != UserRole.STUDENT:
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        student = user.student
+        if not student:
+            return jsonify({'error': 'Student profile not found'}), 404
+
+        # Check if choices are locked
+        if student.choices_submitted:
+            return jsonify({'error': 'Choices are already submitted and locked'}), 400
+
+        data = request.get_json() or {}
+        position = data.get('position')
+        if not isinstance(position, int) or position < 1:
+            return jsonify({'error': 'position must be a positive integer'}), 400
+
+        try:
+            ChoiceService.move(student, course_id, position)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 404
+
+        return jsonify({'message': 'Choice moved successfully'}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/submit', methods=['POST'])
 @jwt_required()
+@choice_filling_open
 def submit_choices():
     """Submit and lock choices"""
     try:
@@ -254,23 +328,11 @@ def submit_choices():
         if student.choices_submitted:
             return jsonify({'error': 'Choices are already submitted'}), 400
 
-        # Check minimum choices
-        min_choices = current_app.config['MIN_CHOICES']
-        choices_count = Choice.query.filter_by(student_id=student.id).count()
-
-        if choices_count < min_choices:
-            return jsonify({'error': f'Minimum {min_choices} choice(s) required'}), 400
-
-        # Lock all choices
-        choices = Choice.query.filter_by(student_id=student.id).all()
-        for choice in choices:
-            choice.is_locked = True
-            choice.submitted_at = datetime.utcnow()
-
-        # Update student status
-        student.choices_submitted = True
-
-        db.session.commit()
+        # Write the draft to the choices table, locked, in one insert
+        try:
+            choices_count = ChoiceService.submit(student)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
         # Log action
         AuditLog.log_action(
@@ -280,7 +342,6 @@ def submit_choices():
             entity_id=student.id,
             description=f'Submitted {choices_count} choices'
         )
-        db.session.commit()
 
         return jsonify({
             'message': 'Choices submitted successfully',
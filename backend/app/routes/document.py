@@ -1,15 +1,23 @@
 """
 Document management routes
 """
-from flask import Blueprint, request, jsonify, send_file, current_app
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
 import os
 from datetime import datetime
 from app.models import db, User, Document, DocumentType, DocumentStatus, UserRole, AuditLog
-from app.utils.validators import validate_file_extension, validate_file_size, sanitize_filename
+from app.utils.validators import validate_file_extension, sanitize_filename
 from app.services.email_service import EmailService
 from app.services.sms_service import SMSService
+from app.services.upload_service import UploadService
+from app.services.blob_store import BlobStore
+from app.services.file_delivery_service import FileDeliveryService
+from app.services.preview_service import PreviewService
+from app.services.document_review_service import DocumentReviewService
+from app.services.file_inspection_service import FileInspectionService
+from app.services.task_queue import task_queue
 
 bp = Blueprint('document', __name__)
 
@@ -29,55 +37,54 @@ def upload_document():
         if not student:
             return jsonify({'error': 'Student profile not found'}), 404
 
-        # Check if file is in request
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
-
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-
-        # Get document type
-        document_type = request.form.get('document_type')
-        if not document_type:
-            return jsonify({'error': 'Document type is required'}), 400
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+        student_folder = os.path.join(upload_folder, f'student_{student.id}')
+        max_size = current_app.config['MAX_FILE_SIZE']
 
+        # Stream the body to a temp file in the student folder
         try:
-            document_type = DocumentType(document_type)
-        except ValueError:
-            return jsonify({'error': 'Invalid document type'}), 400
-
-        # Validate file extension
-        allowed_extensions = current_app.config['ALLOWED_EXTENSIONS']
-        if not validate_file_extension(file.filename, allowed_extensions):
-            return jsonify({'error': f'Invalid file type. Allowed: {", ".join(allowed_extensions)}'}), 400
-
-        # Check file size
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
-
-        max_size = current_app.config['MAX_FILE_SIZE']
-        if not validate_file_size(file_size, max_size):
+            form, file = UploadService.receive(
+                request, student_folder, max_size,
+                chunk_size=current_app.config['UPLOAD_CHUNK_SIZE'],
+                skip_write=BlobStore.exists
+            )
+        except RequestEntityTooLarge:
             return jsonify({'error': f'File size exceeds maximum limit of {max_size / 1024 / 1024}MB'}), 400
+        except BadRequest as e:
+            return jsonify({'error': e.description}), 400
 
-        # Sanitize filename
-        original_filename = secure_filename(file.filename)
-        filename = sanitize_filename(original_filename)
-
-        # Create upload directory if it doesn't exist
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        student_folder = os.path.join(upload_folder, f'student_{student.id}')
-        os.makedirs(student_folder, exist_ok=True)
-
-        # Generate unique filename
-        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-        file_extension = filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"{document_type.value}_{timestamp}.{file_extension}"
-        file_path = os.path.join(student_folder, unique_filename)
+        # Check if file is in request
+        if file is None:
+            return jsonify({'error': 'No file provided'}), 400
 
-        # Save file
-        file.save(file_path)
+        try:
+            if file.filename == '':
+                return jsonify({'error': 'No file selected'}), 400
+
+            # Get document type
+            document_type = form.get('document_type')
+            if not document_type:
+                return jsonify({'error': 'Document type is required'}), 400
+
+            try:
+                document_type = DocumentType(document_type)
+            except ValueError:
+                return jsonify({'error': 'Invalid document type'}), 400
+
+            # Validate file extension
+            allowed_extensions = current_app.config['ALLOWED_EXTENSIONS']
+            if not validate_file_extension(file.filename, allowed_extensions):
+                return jsonify({'error': f'Invalid file type. Allowed: {", ".join(allowed_extensions)}'}), 400
+
+            # Sanitize filename
+            original_filename = secure_filename(file.filename)
+            filename = sanitize_filename(original_filename)
+            file_extension = filename.rsplit('.', 1)[1].lower()
+
+            # Store content once per hash; identical uploads only add a reference
+            file_path = BlobStore.store(file)
+        finally:
+            file.discard()
 
         # Create document record
         document = Document(
@@ -85,9 +92,10 @@ def upload_document():
             document_type=document_type,
             file_name=original_filename,
             file_path=file_path,
-            file_size=file_size,
+            file_size=file.size,
             file_extension=file_extension,
             mime_type=file.content_type or 'application/octet-stream',
+            content_hash=file.sha256,
             status=DocumentStatus.PENDING
         )
 
@@ -102,7 +110,9 @@ def upload_document():
             entity_id=document.id,
             description=f'Document uploaded: {document_type.value}'
         )
-        db.session.commit()
+
+        # Sniff and validate the content before it reaches reviewers
+        task_queue.enqueue(FileInspectionService.check_document, document.id)
 
         return jsonify({
             'message': 'Document uploaded successfully',
@@ -164,10 +174,50 @@ def download_document(document_id):
         if not os.path.exists(document.file_path):
             return jsonify({'error': 'File not found on server'}), 404
 
-        return send_file(
+        return FileDeliveryService.send(
             document.file_path,
-            as_attachment=True,
-            download_name=document.file_name
+            document.file_name,
+            mimetype=document.mime_type,
+            etag=document.content_hash
+        )
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/<int:document_id>/preview', methods=['GET'])
+@jwt_required()
+def preview_document(document_id):
+    """Get a downscaled JPEG preview of a document"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        user = User.query.get(current_user_id)
+
+        document = Document.query.get(document_id)
+        if not document:
+            return jsonify({'error': 'Document not found'}), 404
+
+        # Check permissions
+        if user.role == UserRole.STUDENT:
+            if not user.student or document.student_id != user.student.id:
+                return jsonify({'error': 'Unauthorized'}), 403
+        elif user.role != UserRole.ADMIN:
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        variant = request.args.get('variant', 'thumbnail')
+        if variant not in PreviewService.VARIANTS:
+            return jsonify({'error': 'Invalid preview variant'}), 400
+
+        preview_path = PreviewService.preview_path(document.file_path, variant)
+        if not os.path.exists(preview_path):
+            return jsonify({'error': 'Preview not available'}), 404
+
+        return FileDeliveryService.send(
+            preview_path,
+            f'{os.path.splitext(document.file_name)[0]}_{variant}.jpg',
+            mimetype='image/jpeg',
+            etag=f'{document.content_hash}-{variant}' if document.content_hash else None,
+            as_attachment=False
         )
 
     except Exception as e:
@@ -189,6 +239,12 @@ def verify_document(document_id):
         if not document:
             return jsonify({'error': 'Document not found'}), 404
 
+        if document.claimed_by not in (None, user.id) and document.claimed_until > datetime.utcnow():
+            return jsonify({'error': 'Document is being reviewed by another admin'}), 409
+
+        if document.status == DocumentStatus.INVALID:
+            return jsonify({'error': 'Document failed file inspection and cannot be reviewed'}), 400
+
         data = request.get_json()
         action = data.get('action')  # 'verify' or 'reject'
         reason = data.get('reason', '')
@@ -198,30 +254,8 @@ def verify_document(document_id):
             document.verified_by = user.id
             document.verified_at = datetime.utcnow()
 
-            # Check if all required documents are verified
-            student = document.student
-            required_documents = [
-                DocumentType.MARKS_CARD_10TH,
-                DocumentType.MARKS_CARD_12TH,
-                DocumentType.RANK_CARD
-            ]
-
-            all_verified = True
-            for doc_type in required_documents:
-                doc = Document.query.filter_by(
-                    student_id=student.id,
-                    document_type=doc_type,
-                    status=DocumentStatus.VERIFIED
-                ).first()
-
-                if not doc:
-                    all_verified = False
-                    break
-
-            if all_verified:
-                student.documents_verified = True
-
             # Send notification
+            student = document.student
             if student.user:
                 EmailService.send_document_verification_notification(
                     student.user.email,
@@ -266,6 +300,11 @@ def verify_document(document_id):
         else:
             return jsonify({'error': 'Invalid action'}), 400
 
+        document.claimed_by = None
+        document.claimed_until = None
+
+        # Same recompute as batch review, so a rejection also clears the flag
+        DocumentReviewService.refresh_documents_verified([document.student_id])
         db.session.commit()
 
         # Log action
@@ -276,7 +315,6 @@ def verify_document(document_id):
             entity_id=document.id,
             description=f'Document {action}ed: {document.document_type.value}'
         )
-        db.session.commit()
 
         return jsonify({
             'message': f'Document {action}ed successfully',
@@ -288,6 +326,102 @@ def verify_document(document_id):
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/verify-batch', methods=['PUT'])
+@jwt_required()
+def verify_documents_batch():
+    """Verify or reject many documents at once (admin only)"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        user = User.query.get(current_user_id)
+
+        if not user or user.role != UserRole.ADMIN:
+            return jsonify({'error': 'Unauthorized - Admin access required'}), 403
+
+        data = request.get_json() or {}
+        document_ids = data.get('document_ids')
+        action = data.get('action')  # 'verify' or 'reject'
+        reason = data.get('reason', '')
+
+        if action not in ('verify', 'reject'):
+            return jsonify({'error': 'Invalid action'}), 400
+
+        if not isinstance(document_ids, list) or not document_ids \
+                or not all(isinstance(document_id, int) for document_id in document_ids):
+            return jsonify({'error': 'document_ids must be a non-empty list of integers'}), 400
+
+        max_batch = current_app.config['DOCUMENT_REVIEW_BATCH_MAX']
+        if len(document_ids) > max_batch:
+            return jsonify({'error': f'At most {max_batch} documents can be reviewed per request'}), 400
+
+        result = DocumentReviewService.review_batch(user.id, list(dict.fromkeys(document_ids)), action, reason)
+
+        return jsonify({
+            'message': f"{len(result['reviewed'])} documents {action}ed successfully",
+            **result
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/claim', methods=['POST'])
+@jwt_required()
+def claim_documents():
+    """Lease the next pending documents for review (admin only)"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        user = User.query.get(current_user_id)
+
+        if not user or user.role != UserRole.ADMIN:
+            return jsonify({'error': 'Unauthorized - Admin access required'}), 403
+
+        data = request.get_json(silent=True) or {}
+        limit = data.get('limit', 20)
+        max_claim = current_app.config['DOCUMENT_CLAIM_MAX']
+
+        if not isinstance(limit, int) or not 1 <= limit <= max_claim:
+            return jsonify({'error': f'limit must be between 1 and {max_claim}'}), 400
+
+        documents = DocumentReviewService.claim_pending(user.id, limit)
+
+        return jsonify({
+            'documents': [
+                {**doc.to_dict(), 'student': doc.student.to_dict() if doc.student else None}
+                for doc in documents
+            ]
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/release', methods=['POST'])
+@jwt_required()
+def release_documents():
+    """Return leased documents to the review queue (admin only)"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        user = User.query.get(current_user_id)
+
+        if not user or user.role != UserRole.ADMIN:
+            return jsonify({'error': 'Unauthorized - Admin access required'}), 403
+
+        data = request.get_json() or {}
+        document_ids = data.get('document_ids')
+        if not isinstance(document_ids, list) or not document_ids:
+            return jsonify({'error': 'document_ids must be a non-empty list'}), 400
+
+        released = DocumentReviewService.release(user.id, document_ids)
+
+        return jsonify({'message': f'{released} documents released'}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/pending', methods=['GET'])
 @jwt_required()
 def get_pending_documents():
@@ -302,7 +436,7 @@ def get_pending_documents():
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
 
-        pagination = Document.query.filter_by(status=DocumentStatus.PENDING)\
+        pagination = Document.query.filter_by(status=DocumentStatus.READY)\
             .order_by(Document.uploaded_at).paginate(
                 page=page, per_page=per_page, error_out=False
             )
@@ -0,0 +1,53 @@
+"""
+Server-Sent Events routes
+"""
+import json
+import queue
+from flask import Blueprint, Response, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.models import User, UserRole
+from app.services.event_bus import event_bus
+
+bp = Blueprint('events', __name__)
+
+
+@bp.route('/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_events():
+    """Stream the student's allotment, document and status changes"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        user = User.query.get(current_user_id)
+
+        if not user or user.role != UserRole.STUDENT:
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        student = user.student
+        if not student:
+            return jsonify({'error': 'Student profile not found'}), 404
+
+        student_id = student.id
+        heartbeat = current_app.config['EVENT_STREAM_HEARTBEAT_SECONDS']
+        subscriber = event_bus.subscribe(student_id)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    message = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+
+                yield f"event: {message['type']}\ndata: {json.dumps(message['data'])}\n\n"
+        finally:
+            event_bus.unsubscribe(student_id, subscriber)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -6,6 +6,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
 from app.models import db, User, Student, UserRole, AuditLog
 from app.utils.validators import validate_mobile, validate_pincode
+from app.services.student_dashboard_service import StudentDashboardService
 
 bp = Blueprint('student', __name__)
 
@@ -77,7 +78,6 @@ def update_profile():
             entity_id=student.id,
             description='Student profile updated'
         )
-        db.session.commit()
 
         return jsonify({
             'message': 'Profile updated successfully',
@@ -132,40 +132,16 @@ def get_dashboard():
     """Get student dashboard data"""
     try:
         current_user_id = int(get_jwt_identity())
-        user = User.query.get(current_user_id)
 
+        dashboard = StudentDashboardService.get_dashboard(current_user_id)
+        if dashboard:
+            return jsonify(dashboard), 200
+
+        user = User.query.get(current_user_id)
         if not user or user.role != UserRole.STUDENT:
             return jsonify({'error': 'Unauthorized'}), 403
 
-        student = user.student
-        if not student:
-            return jsonify({'error': 'Student profile not found'}), 404
-
-        # Get student statistics
-        documents_count = student.documents.count()
-        documents_verified = student.documents.filter_by(status='verified').count()
-        choices_count = student.choices.count()
-        payments_count = student.payments.filter_by(status='success').count()
-        allotments = student.allotments.all()
-
-        return jsonify({
-            'student': student.to_dict(),
-            'statistics': {
-                'documents_uploaded': documents_count,
-                'documents_verified': documents_verified,
-                'choices_filled': choices_count,
-                'payments_made': payments_count,
-                'allotments': len(allotments)
-            },
-            'status': {
-                'registration_complete': student.registration_complete,
-                'documents_verified': student.documents_verified,
-                'payment_complete': student.payment_complete,
-                'choices_submitted': student.choices_submitted,
-                'seat_allotted': student.seat_allotted,
-                'admission_confirmed': student.admission_confirmed
-            }
-        }), 200
+        return jsonify({'error': 'Student profile not found'}), 404
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
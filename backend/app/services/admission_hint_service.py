@@ -0,0 +1,102 @@
+"""
+Admission hint service - last round's closing ranks and admission likelihood
+"""
+import threading
+from flask import current_app
+from sqlalchemy import func, select
+from app.models import db, AllotmentRound, RoundCutoff
+
+_lock = threading.Lock()
+
+
+class AdmissionHintService:
+    """
+    Service annotating courses with how likely a student is to get them
+
+    The closing rank of every (course, category) in the latest completed
+    round is read from round_cutoffs the first time it is needed and kept
+    in process memory until a newer round completes or the round is re-run.
+    """
+
+    @staticmethod
+    def closing_ranks():
+        """
+        Closing ranks of the latest completed round
+
+        Returns:
+            tuple: (round_number, {course_id: {category: closing_rank}}),
+            or (None, {}) if no round has completed
+        """
+        # Re-running a round rewrites its cutoffs with new IDs
+        cutoffs_version = select(func.max(RoundCutoff.id))\
+            .where(RoundCutoff.round_id == AllotmentRound.id)\
+            .scalar_subquery()
+        latest = db.session.query(AllotmentRound.id, AllotmentRound.round_number, cutoffs_version.label('version'))\
+            .filter(AllotmentRound.is_completed == True)\
+            .order_by(AllotmentRound.round_number.desc()).first()
+        if latest is None:
+            return None, {}
+
+        cached = current_app.extensions.get('admission_hints')
+        version = (latest.id, latest.version)
+        if cached is not None and cached[0] == version:
+            return latest.round_number, cached[1]
+
+        with _lock:
+            cached = current_app.extensions.get('admission_hints')
+            if cached is None or cached[0] != version:
+                table = {}
+                for course_id, category, closing_rank in db.session.query(
+                    RoundCutoff.course_id, RoundCutoff.category, RoundCutoff.closing_rank
+                ).filter(RoundCutoff.round_id == latest.id):
+                    table.setdefault(course_id, {})[category] = closing_rank
+
+                cached = (version, table)
+                current_app.extensions['admission_hints'] = cached
+
+        return latest.round_number, cached[1]
+
+    @staticmethod
+    def likelihood(rank, closing_rank):
+        """
+        Band a rank against a closing rank
+
+        Ranks within ADMISSION_HINT_MARGIN (a fraction of the closing rank)
+        either side of it are 'medium'; better ranks are 'high', worse
+        ones 'low'.
+
+        Returns:
+            str or None: Likelihood band, or None without a closing rank
+        """
+        if closing_rank is None:
+            return None
+
+        margin = closing_rank * current_app.config['ADMISSION_HINT_MARGIN']
+        if rank < closing_rank - margin:
+            return 'high'
+        if rank <= closing_rank + margin:
+            return 'medium'
+        return 'low'
+
+    @staticmethod
+    def annotate(course_dicts, student):
+        """
+        Add last round's closing ranks and the student's likelihood to courses
+
+        Args:
+            course_dicts: Serialized courses, updated in place
+            student: Student the likelihood is computed for
+
+        Returns:
+            int or None: Round number the hints come from
+        """
+        round_number, table = AdmissionHintService.closing_ranks()
+
+        for course in course_dicts:
+            closing_ranks = table.get(course['id'], {})
+            closing_rank = closing_ranks.get(student.category)
+            course['closing_ranks'] = closing_ranks
+            course['closing_rank'] = closing_rank
+            course['admission_likelihood'] = AdmissionHintService.likelihood(student.exam_rank, closing_rank)
+
+        return round_number
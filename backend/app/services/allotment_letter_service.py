@@ -0,0 +1,218 @@
+"""
+Allotment letter service - batch rendering of allotment letters with verification QR codes
+"""
+import hashlib
+import hmac
+import os
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from PIL import Image, ImageDraw, ImageFont
+from sqlalchemy import update
+import qrcode
+from app.models import (
+    db, Student, Course, College, Allotment, AllotmentRound, AllotmentStatus
+)
+
+# Allotments that hold a seat get a letter
+LETTER_STATUSES = (
+    AllotmentStatus.ALLOTTED, AllotmentStatus.ACCEPTED_FROZEN, AllotmentStatus.ACCEPTED_UPGRADE
+)
+
+PAGE_SIZE = (1240, 1754)  # A4 at 150 dpi
+MARGIN = 110
+
+
+def _font(size):
+    try:
+        return ImageFont.truetype('DejaVuSans.ttf', size)
+    except OSError:
+        # Pillow's bundled scalable font, for images without DejaVu
+        return ImageFont.load_default(size)
+
+
+def render_letter(job):
+    """
+    Render one allotment letter to its file
+
+    Top level so it can run in a worker process. The file is written to a
+    temporary name and renamed, so a crash never leaves a partial letter.
+
+    Args:
+        job: Dict with the letter's path, format and field values
+
+    Returns:
+        tuple: (allotment_id, error or None)
+    """
+    try:
+        page = Image.new('RGB', PAGE_SIZE, 'white')
+        draw = ImageDraw.Draw(page)
+        title, heading, body = _font(44), _font(30), _font(26)
+
+        y = MARGIN
+        draw.text((MARGIN, y), job['app_name'], font=title, fill='black')
+        y += 80
+        draw.text((MARGIN, y), f"Seat Allotment Letter - Round {job['round_number']}", font=heading, fill='black')
+        y += 50
+        draw.line((MARGIN, y, PAGE_SIZE[0] - MARGIN, y), fill='black', width=2)
+        y += 40
+
+        for label, value in (
+            ('Letter No.', job['letter_number']),
+            ('Candidate', job['student_name']),
+            ('Exam Roll No.', job['roll_number']),
+            ('Rank', job['rank']),
+            ('Category', job['category']),
+            ('College', job['college_name']),
+            ('Course', job['course_name']),
+            ('Allotted On', job['allotted_on']),
+            ('Respond By', job['acceptance_deadline'])
+        ):
+            draw.text((MARGIN, y), label, font=body, fill='#444444')
+            draw.text((MARGIN + 300, y), str(value), font=body, fill='black')
+            y += 48
+
+        y += 30
+        draw.text((MARGIN, y), 'Accept or reject this seat online before the deadline above.', font=body, fill='black')
+        y += 40
+        draw.text((MARGIN, y), 'Scan the code below to verify this letter.', font=body, fill='black')
+
+        qr = qrcode.make(job['verification_url'], box_size=8, border=2).get_image().convert('RGB')
+        page.paste(qr, (MARGIN, y + 60))
+
+        temp_path = f"{job['path']}.tmp"
+        os.makedirs(os.path.dirname(job['path']), exist_ok=True)
+        page.save(temp_path, format=job['format'].upper(), resolution=150.0)
+        os.replace(temp_path, job['path'])
+        return job['allotment_id'], None
+
+    except Exception as e:
+        return job['allotment_id'], str(e)
+
+
+class AllotmentLetterService:
+    """Service for allotment letters"""
+
+    @staticmethod
+    def letter_path(round_number, allotment_id, letter_format):
+        """Sharded path for a letter: letters/round_1/2a/42.pdf under UPLOAD_FOLDER"""
+        return os.path.join(
+            current_app.config['UPLOAD_FOLDER'], 'letters', f"round_{round_number}",
+            f"{allotment_id % 256:02x}", f"{allotment_id}.{letter_format}"
+        )
+
+    @staticmethod
+    def verification_token(allotment_id, student_id, course_id):
+        """Token proving a letter was issued for this allotment"""
+        message = f"{allotment_id}:{student_id}:{course_id}".encode('utf-8')
+        key = current_app.config['SECRET_KEY'].encode('utf-8')
+        return hmac.new(key, message, hashlib.sha256).hexdigest()[:20]
+
+    @staticmethod
+    def generate_round(round_id, letter_format=None, chunk_size=None, workers=None):
+        """
+        Generate letters for every seat-holding allotment in a round
+
+        Allotments are read in keyset-paginated chunks and rendered in a
+        process pool; each chunk's rows are marked with one bulk UPDATE and
+        committed, so an interrupted run resumes where it stopped.
+
+        Args:
+            round_id: Allotment round ID
+            letter_format: 'pdf' or 'png' (default ALLOTMENT_LETTER_FORMAT)
+            chunk_size: Allotments per chunk (default ALLOTMENT_LETTER_CHUNK_SIZE)
+            workers: Rendering processes (default ALLOTMENT_LETTER_WORKERS)
+
+        Returns:
+            dict: Generated and failed counts, or None if the round does not exist
+        """
+        allotment_round = AllotmentRound.query.get(round_id)
+        if not allotment_round:
+            return None
+
+        letter_format = (letter_format or current_app.config['ALLOTMENT_LETTER_FORMAT']).lower()
+        if letter_format not in ('pdf', 'png'):
+            raise ValueError('Letter format must be pdf or png')
+
+        chunk_size = chunk_size or current_app.config['ALLOTMENT_LETTER_CHUNK_SIZE']
+        workers = workers or current_app.config['ALLOTMENT_LETTER_WORKERS']
+        result = {'generated': 0, 'failed': 0}
+
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            last_id = 0
+            while True:
+                rows = AllotmentLetterService._read_chunk(round_id, last_id, chunk_size)
+                if not rows:
+                    break
+                last_id = rows[-1].id
+
+                jobs = [AllotmentLetterService._job(row, allotment_round, letter_format) for row in rows]
+                if pool:
+                    outcomes = list(pool.map(render_letter, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+                else:
+                    outcomes = [render_letter(job) for job in jobs]
+
+                paths = {job['allotment_id']: job['path'] for job in jobs}
+                done = [allotment_id for allotment_id, error in outcomes if error is None]
+                for allotment_id, error in outcomes:
+                    if error is not None:
+                        current_app.logger.error(f"Letter for allotment {allotment_id} failed: {error}")
+
+                if done:
+                    db.session.execute(update(Allotment), [{
+                        'id': allotment_id,
+                        'allotment_letter_generated': True,
+                        'allotment_letter_path': paths[allotment_id]
+                    } for allotment_id in done])
+                    db.session.commit()
+
+                result['generated'] += len(done)
+                result['failed'] += len(outcomes) - len(done)
+        finally:
+            if pool:
+                pool.shutdown()
+
+        current_app.logger.info(
+            f"Letters for round {allotment_round.round_number}: "
+            f"generated {result['generated']}, failed {result['failed']}"
+        )
+        return result
+
+    @staticmethod
+    def _read_chunk(round_id, after_id, limit):
+        """Next chunk of allotments without a letter, with the fields a letter shows"""
+        return db.session.query(
+            Allotment.id, Allotment.student_id, Allotment.course_id, Allotment.allotted_rank,
+            Allotment.allotted_category, Allotment.allotted_at,
+            Student.first_name, Student.middle_name, Student.last_name, Student.exam_roll_number,
+            Course.name.label('course_name'), College.name.label('college_name')
+        ).join(Student, Student.id == Allotment.student_id)\
+            .join(Course, Course.id == Allotment.course_id)\
+            .join(College, College.id == Course.college_id)\
+            .filter(
+                Allotment.round_id == round_id,
+                Allotment.id > after_id,
+                Allotment.allotment_letter_generated == False,
+                Allotment.status.in_(LETTER_STATUSES)
+            ).order_by(Allotment.id).limit(limit).all()
+
+    @staticmethod
+    def _job(row, allotment_round, letter_format):
+        token = AllotmentLetterService.verification_token(row.id, row.student_id, row.course_id)
+        return {
+            'allotment_id': row.id,
+            'path': AllotmentLetterService.letter_path(allotment_round.round_number, row.id, letter_format),
+            'format': letter_format,
+            'app_name': current_app.config['APP_NAME'],
+            'round_number': allotment_round.round_number,
+            'letter_number': f"R{allotment_round.round_number}-{row.id:08d}",
+            'student_name': ' '.join(part for part in (row.first_name, row.middle_name, row.last_name) if part),
+            'roll_number': row.exam_roll_number,
+            'rank': row.allotted_rank,
+            'category': row.allotted_category,
+            'college_name': row.college_name,
+            'course_name': row.course_name,
+            'allotted_on': row.allotted_at.strftime('%d %b %Y'),
+            'acceptance_deadline': allotment_round.acceptance_deadline.strftime('%d %b %Y %H:%M UTC'),
+            'verification_url': f"{current_app.config['BACKEND_URL']}/api/allotment/{row.id}/verify?token={token}"
+        }
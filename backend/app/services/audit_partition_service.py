@@ -0,0 +1,381 @@
+"""
+Audit partition service - monthly audit log partitions with compressed NDJSON archival
+"""
+import base64
+import gzip
+import json
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import Column, Index, MetaData, Table, and_, delete, func, inspect, insert, or_, select, text
+from app.models import db, AuditLog
+
+PARTITION_PREFIX = 'audit_logs_'
+_PARTITION_TABLE = re.compile(r'^audit_logs_(\d{6})$')
+_MYSQL_PARTITION = re.compile(r'^p(\d{6})$')
+_ARCHIVE_FILE = re.compile(r'^audit_logs_(\d{6})\.ndjson\.gz$')
+
+# Columns the query API can filter on
+QUERY_FILTERS = ('user_id', 'action', 'entity_type', 'entity_id', 'ip_address', 'status')
+
+
+def _month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def _add_months(month, count):
+    year, index = divmod(month.year * 12 + month.month - 1 + count, 12)
+    return datetime(year, index + 1, 1)
+
+
+def _month_key(month):
+    return month.strftime('%Y%m')
+
+
+def _key_month(key):
+    return datetime.strptime(key, '%Y%m')
+
+
+def _serialize(row):
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+
+
+def native_partition_ddl(months, converting, foreign_keys=()):
+    """
+    MySQL statements adding monthly RANGE COLUMNS partitions to audit_logs
+
+    Args:
+        months: Month starts to add partitions for, ascending
+        converting: Whether audit_logs is not partitioned yet
+        foreign_keys: Names of audit_logs foreign keys, dropped when converting
+
+    Returns:
+        list: SQL statements in execution order
+    """
+    definitions = ', '.join(
+        [f"PARTITION p{_month_key(month)} VALUES LESS THAN ('{_add_months(month, 1):%Y-%m-%d}')"
+         for month in months] +
+        ['PARTITION p_future VALUES LESS THAN (MAXVALUE)']
+    )
+
+    if not converting:
+        return [f'ALTER TABLE audit_logs REORGANIZE PARTITION p_future INTO ({definitions})']
+
+    # Partitioned InnoDB tables allow no foreign keys, and the partitioning
+    # column must be part of the primary key
+    return [f'ALTER TABLE audit_logs DROP FOREIGN KEY `{name}`' for name in foreign_keys] + [
+        'ALTER TABLE audit_logs DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)',
+        f'ALTER TABLE audit_logs PARTITION BY RANGE COLUMNS(created_at) ({definitions})'
+    ]
+
+
+def encode_cursor(entry):
+    """Opaque keyset cursor positioned after an entry"""
+    return base64.urlsafe_b64encode(f"{entry['created_at']}|{entry['id']}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decode a keyset cursor
+
+    Returns:
+        tuple: (created_at datetime, id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        created_at, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(entry_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+class AuditPartitionService:
+    """
+    Service for month-partitioned audit log storage
+
+    On MySQL audit_logs is natively partitioned by RANGE COLUMNS(created_at)
+    with one partition per month. Elsewhere audit_logs holds the current
+    month and rotate() moves older rows into audit_logs_YYYYMM tables.
+    Cold partitions are exported to AUDIT_ARCHIVE_FOLDER as gzipped NDJSON
+    and dropped.
+    """
+
+    @staticmethod
+    def is_native():
+        """Check whether the database partitions audit_logs natively"""
+        return db.engine.dialect.name == 'mysql'
+
+    @staticmethod
+    def rotate(now=None):
+        """
+        Prepare partitions for the current month
+
+        On MySQL this adds monthly partitions AUDIT_PARTITION_MONTHS_AHEAD
+        months ahead, converting the table on first use. Elsewhere rows from
+        previous months are moved out of audit_logs into their month table.
+
+        Args:
+            now: Reference time (default now)
+
+        Returns:
+            list: Month keys (YYYYMM) created or filled
+        """
+        current = _month_start(now or datetime.utcnow())
+        if AuditPartitionService.is_native():
+            return AuditPartitionService._ensure_native_partitions(current)
+
+        oldest = db.session.query(func.min(AuditLog.created_at))\
+            .filter(AuditLog.created_at < current).scalar()
+        if oldest is None:
+            return []
+
+        columns = [column.name for column in AuditLog.__table__.columns]
+        rotated = []
+        month = _month_start(oldest)
+        while month < current:
+            next_month = _add_months(month, 1)
+            in_month = (AuditLog.created_at >= month) & (AuditLog.created_at < next_month)
+            if db.session.query(AuditLog.id).filter(in_month).first() is None:
+                month = next_month
+                continue
+
+            table = AuditPartitionService._partition_table(_month_key(month))
+            table.create(db.session.connection(), checkfirst=True)
+            db.session.execute(
+                insert(table).from_select(columns, select(AuditLog.__table__).where(in_month))
+            )
+            db.session.execute(delete(AuditLog).where(in_month))
+            db.session.commit()
+
+            rotated.append(_month_key(month))
+            month = next_month
+
+        return rotated
+
+    @staticmethod
+    def partitions(now=None):
+        """
+        List cold (before the current month) partitions still in the database
+
+        Returns:
+            list: Month keys (YYYYMM), oldest first
+        """
+        current_key = _month_key(_month_start(now or datetime.utcnow()))
+
+        if AuditPartitionService.is_native():
+            names = AuditPartitionService._native_partition_names()
+            pattern = _MYSQL_PARTITION
+        else:
+            names = inspect(db.session.connection()).get_table_names()
+            pattern = _PARTITION_TABLE
+
+        keys = [match.group(1) for match in map(pattern.match, names) if match]
+        return sorted(key for key in keys if key < current_key)
+
+    @staticmethod
+    def archive(keep_months=None, now=None):
+        """
+        Export cold partitions to compressed NDJSON and drop them
+
+        Args:
+            keep_months: Months kept in the database (default AUDIT_ARCHIVE_AFTER_MONTHS)
+            now: Reference time (default now)
+
+        Returns:
+            list: Month keys (YYYYMM) archived
+        """
+        if keep_months is None:
+            keep_months = current_app.config['AUDIT_ARCHIVE_AFTER_MONTHS']
+        now = now or datetime.utcnow()
+        cutoff_key = _month_key(_add_months(_month_start(now), -keep_months))
+
+        AuditPartitionService.rotate(now)
+
+        archive_folder = current_app.config['AUDIT_ARCHIVE_FOLDER']
+        os.makedirs(archive_folder, exist_ok=True)
+
+        archived = []
+        for key in AuditPartitionService.partitions(now):
+            if key >= cutoff_key:
+                break
+
+            AuditPartitionService._export(key, archive_folder)
+            AuditPartitionService._drop(key)
+            archived.append(key)
+            current_app.logger.info(f"Archived audit log partition {key}")
+
+        return archived
+
+    @staticmethod
+    def query(start=None, end=None, limit=100, before=None, **filters):
+        """
+        Search audit entries across live, partitioned and archived storage
+
+        Results are ordered by (created_at, id) descending and paged by
+        keyset: pass the last entry's position as `before` to continue.
+        Sources are searched newest first; archives are only opened when
+        they can still contribute to the newest `limit` entries.
+
+        Args:
+            start: Earliest created_at (inclusive)
+            end: Latest created_at (exclusive)
+            limit: Maximum number of entries
+            before: (created_at, id) keyset position to continue after
+            **filters: Equality filters on QUERY_FILTERS columns
+
+        Returns:
+            list: Entry dicts, newest first
+        """
+        filters = {key: value for key, value in filters.items() if key in QUERY_FILTERS and value is not None}
+        upper = end
+        if before and (upper is None or before[0] < upper):
+            upper = before[0] + timedelta(microseconds=1)
+
+        tables = [AuditLog.__table__]
+        if not AuditPartitionService.is_native():
+            tables += [AuditPartitionService._partition_table(key)
+                       for key in reversed(AuditPartitionService.partitions())
+                       if AuditPartitionService._overlaps(key, start, upper)]
+
+        results = []
+        for table in tables:
+            stmt = select(table).order_by(table.c.created_at.desc(), table.c.id.desc()).limit(limit)
+            for column, value in filters.items():
+                stmt = stmt.where(table.c[column] == value)
+            if start:
+                stmt = stmt.where(table.c.created_at >= start)
+            if end:
+                stmt = stmt.where(table.c.created_at < end)
+            if before:
+                stmt = stmt.where(or_(
+                    table.c.created_at < before[0],
+                    and_(table.c.created_at == before[0], table.c.id < before[1])
+                ))
+            results.extend(_serialize(row) for row in db.session.execute(stmt).mappings())
+
+        results.sort(key=lambda entry: (entry['created_at'], entry['id']), reverse=True)
+
+        for key, path in AuditPartitionService._archives():
+            if not AuditPartitionService._overlaps(key, start, upper):
+                continue
+            month_end = _add_months(_key_month(key), 1).isoformat()
+            if len(results) >= limit and results[limit - 1]['created_at'] >= month_end:
+                break
+
+            results.extend(AuditPartitionService._read_archive(path, start, end, before, filters))
+            results.sort(key=lambda entry: (entry['created_at'], entry['id']), reverse=True)
+
+        return results[:limit]
+
+    @staticmethod
+    def _partition_table(key):
+        name = f'{PARTITION_PREFIX}{key}'
+        columns = [Column(column.name, column.type, primary_key=column.primary_key)
+                   for column in AuditLog.__table__.columns]
+        indexes = [Index(index.name.replace('audit_logs', name, 1), *[column.name for column in index.columns])
+                   for index in AuditLog.__table__.indexes]
+        return Table(name, MetaData(), *columns, *indexes)
+
+    @staticmethod
+    def _overlaps(key, start, end):
+        month = _key_month(key)
+        return (end is None or month < end) and (start is None or _add_months(month, 1) > start)
+
+    @staticmethod
+    def _archives():
+        folder = current_app.config['AUDIT_ARCHIVE_FOLDER']
+        if not os.path.isdir(folder):
+            return []
+
+        matches = [(match.group(1), os.path.join(folder, match.group(0)))
+                   for match in map(_ARCHIVE_FILE.match, os.listdir(folder)) if match]
+        return sorted(matches, reverse=True)
+
+    @staticmethod
+    def _read_archive(path, start, end, before, filters):
+        start = start.isoformat() if start else None
+        end = end.isoformat() if end else None
+        before = (before[0].isoformat(), before[1]) if before else None
+
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if start and entry['created_at'] < start:
+                    continue
+                if end and entry['created_at'] >= end:
+                    continue
+                if before and (entry['created_at'], entry['id']) >= before:
+                    continue
+                if all(entry.get(column) == value for column, value in filters.items()):
+                    yield entry
+
+    @staticmethod
+    def _export(key, archive_folder):
+        month = _key_month(key)
+        if AuditPartitionService.is_native():
+            table = AuditLog.__table__
+        else:
+            table = AuditPartitionService._partition_table(key)
+
+        # On MySQL the month range prunes the scan to the one partition
+        stmt = select(table)\
+            .where(table.c.created_at >= month, table.c.created_at < _add_months(month, 1))\
+            .order_by(table.c.id)
+        rows = db.session.connection().execution_options(stream_results=True).execute(stmt).mappings()
+
+        fd, temp_path = tempfile.mkstemp(dir=archive_folder, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps(_serialize(row), default=str) + '\n')
+            os.replace(temp_path, os.path.join(archive_folder, f'{PARTITION_PREFIX}{key}.ndjson.gz'))
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    @staticmethod
+    def _drop(key):
+        if AuditPartitionService.is_native():
+            db.session.execute(text(f'ALTER TABLE audit_logs DROP PARTITION p{key}'))
+        else:
+            AuditPartitionService._partition_table(key).drop(db.session.connection())
+        db.session.commit()
+
+    @staticmethod
+    def _native_partition_names():
+        rows = db.session.execute(text(
+            "SELECT PARTITION_NAME FROM INFORMATION_SCHEMA.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'audit_logs' AND PARTITION_NAME IS NOT NULL"
+        ))
+        return [name for (name,) in rows]
+
+    @staticmethod
+    def _ensure_native_partitions(current):
+        last = _add_months(current, current_app.config['AUDIT_PARTITION_MONTHS_AHEAD'])
+        existing = set(AuditPartitionService._native_partition_names())
+
+        if not existing:
+            oldest = db.session.query(func.min(AuditLog.created_at)).scalar()
+            month = _month_start(min(oldest, current)) if oldest else current
+        else:
+            month = current
+
+        months = []
+        while month <= last:
+            if f'p{_month_key(month)}' not in existing:
+                months.append(month)
+            month = _add_months(month, 1)
+        if not months:
+            return []
+
+        foreign_keys = [foreign_key['name'] for foreign_key in
+                        inspect(db.session.connection()).get_foreign_keys('audit_logs')] if not existing else []
+        for statement in native_partition_ddl(months, not existing, foreign_keys):
+            db.session.execute(text(statement))
+        db.session.commit()
+
+        return [_month_key(month) for month in months]
@@ -0,0 +1,132 @@
+"""
+Audit sink - batched audit log writes off the request path
+"""
+import atexit
+import queue
+import threading
+import time
+from sqlalchemy import insert
+from app.models import db, AuditLog
+
+# Queued by shutdown to stop the writer thread
+_STOP = object()
+
+
+class AuditSink:
+    """
+    Queue of audit entries written in bulk by a background thread
+
+    A batch is flushed when AUDIT_BATCH_SIZE entries are queued or
+    AUDIT_FLUSH_INTERVAL seconds have passed, and once more at shutdown.
+    Entries are written on their own connection, never in the caller's
+    transaction.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = queue.Queue()
+        self._writer = None
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Bind the sink to an application"""
+        self.app = app
+        app.extensions['audit_sink'] = self
+
+    def record(self, entry):
+        """
+        Queue an audit entry
+
+        Written immediately when TASK_QUEUE_EAGER is set or the app is testing.
+
+        Args:
+            entry: Column values of the AuditLog row
+        """
+        if self.app.config['TASK_QUEUE_EAGER'] or self.app.testing:
+            self._write([entry])
+            return
+
+        self._start_writer()
+        self._queue.put(entry)
+
+    def flush(self):
+        """Write all queued entries now"""
+        batch = self._drain(self.app.config['AUDIT_BATCH_SIZE'])
+        while batch:
+            self._write(batch)
+            batch = self._drain(self.app.config['AUDIT_BATCH_SIZE'])
+
+    def shutdown(self, timeout=5):
+        """Stop the writer thread and flush entries still queued"""
+        writer = self._writer
+        if self.app is None or writer is None:
+            return
+
+        self._queue.put(_STOP)
+        writer.join(timeout)
+        self._writer = None
+        with self.app.app_context():
+            self.flush()
+
+    def _start_writer(self):
+        if self._writer:
+            return
+
+        with self._lock:
+            if self._writer:
+                return
+
+            self._writer = threading.Thread(target=self._run, name='audit-sink', daemon=True)
+            self._writer.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            entry = self._queue.get()
+            if entry is _STOP:
+                return
+
+            batch = [entry]
+            deadline = time.monotonic() + self.app.config['AUDIT_FLUSH_INTERVAL']
+            batch_size = self.app.config['AUDIT_BATCH_SIZE']
+
+            while len(batch) < batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            with self.app.app_context():
+                self._write(batch)
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP:
+                batch.append(entry)
+        return batch
+
+    def _write(self, batch):
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(insert(AuditLog), batch)
+        except Exception as e:
+            self.app.logger.error(f"Failed to write {len(batch)} audit log entries: {str(e)}")
+
+
+audit_sink = AuditSink()
@@ -0,0 +1,161 @@
+"""
+Blob store - content-addressed document storage with reference counting
+"""
+import os
+import re
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, update
+from sqlalchemy.exc import IntegrityError
+from app.models import db, Document, DocumentBlob
+from app.services.preview_service import PreviewService
+
+# Blob file names are the hex SHA-256 of their content
+BLOB_NAME = re.compile(r'^[0-9a-f]{64}$')
+
+
+class BlobStore:
+    """Service for storing document content once per SHA-256"""
+
+    @staticmethod
+    def blob_path(content_hash):
+        """Sharded path for a blob: blobs/ab/cd/abcd..."""
+        return os.path.join(
+            current_app.config['UPLOAD_FOLDER'], 'blobs',
+            content_hash[:2], content_hash[2:4], content_hash
+        )
+
+    @staticmethod
+    def exists(content_hash):
+        """Check whether a blob with this content is already stored"""
+        return db.session.query(DocumentBlob.content_hash)\
+            .filter_by(content_hash=content_hash).first() is not None
+
+    @staticmethod
+    def store(upload):
+        """
+        Store an upload's content and take a reference to it
+
+        Known content only bumps the reference count and the temp file is
+        discarded; new content is renamed into its sharded location. The
+        caller commits together with the Document row; if it rolls back
+        instead, the renamed file has no row and collect_garbage removes it.
+
+        Args:
+            upload: StreamedUpload with sha256 computed
+
+        Returns:
+            str: Path of the stored blob
+        """
+        content_hash = upload.sha256
+        blob_path = BlobStore.blob_path(content_hash)
+
+        if BlobStore._add_reference(content_hash):
+            upload.discard()
+            return blob_path
+
+        if not upload.stored:
+            raise ValueError('Upload content is no longer stored; please upload again')
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        upload.save(blob_path)
+
+        try:
+            with db.session.begin_nested():
+                db.session.add(DocumentBlob(
+                    content_hash=content_hash,
+                    file_path=blob_path,
+                    file_size=upload.size,
+                    ref_count=1
+                ))
+        except IntegrityError:
+            # Stored concurrently by another upload of the same content
+            BlobStore._add_reference(content_hash)
+
+        return blob_path
+
+    @staticmethod
+    def _add_reference(content_hash):
+        updated = DocumentBlob.query.filter_by(content_hash=content_hash)\
+            .update({DocumentBlob.ref_count: DocumentBlob.ref_count + 1}, synchronize_session=False)
+        return updated > 0
+
+    @staticmethod
+    def collect_garbage(grace_seconds=None):
+        """
+        Delete blobs no document references
+
+        References are recounted from the documents table so rows removed
+        outside the ORM are accounted for. Files under blobs/ without a
+        blob row, left by uploads whose transaction never committed, are
+        deleted too. Blobs touched within the grace period are kept so
+        in-flight uploads are not collected.
+
+        Args:
+            grace_seconds: Minimum blob age (default BLOB_GC_GRACE_SECONDS)
+
+        Returns:
+            int: Number of blobs removed
+        """
+        if grace_seconds is None:
+            grace_seconds = current_app.config['BLOB_GC_GRACE_SECONDS']
+        cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+
+        referenced = db.session.query(Document.content_hash)\
+            .filter(Document.content_hash.isnot(None))\
+            .group_by(Document.content_hash)\
+            .subquery()
+
+        orphans = DocumentBlob.query\
+            .outerjoin(referenced, referenced.c.content_hash == DocumentBlob.content_hash)\
+            .filter(referenced.c.content_hash.is_(None), DocumentBlob.updated_at <= cutoff)\
+            .all()
+
+        for blob in orphans:
+            if os.path.exists(blob.file_path):
+                os.remove(blob.file_path)
+            PreviewService.remove(blob.file_path)
+            db.session.delete(blob)
+
+        db.session.commit()
+
+        removed = len(orphans) + BlobStore._remove_untracked(cutoff)
+        current_app.logger.info(f"Blob garbage collection removed {removed} blobs")
+        return removed
+
+    @staticmethod
+    def _remove_untracked(cutoff, batch_size=500):
+        """Delete blob files older than cutoff that have no blob row"""
+        root = os.path.join(current_app.config['UPLOAD_FOLDER'], 'blobs')
+        cutoff_ts = (cutoff - datetime(1970, 1, 1)).total_seconds()
+
+        candidates = {}
+        for directory, _, names in os.walk(root):
+            for name in names:
+                path = os.path.join(directory, name)
+                if BLOB_NAME.match(name) and os.path.getmtime(path) <= cutoff_ts:
+                    candidates[name] = path
+
+        removed = 0
+        hashes = list(candidates)
+        for start in range(0, len(hashes), batch_size):
+            batch = hashes[start:start + batch_size]
+            tracked = {content_hash for (content_hash,) in db.session.query(DocumentBlob.content_hash)
+                       .filter(DocumentBlob.content_hash.in_(batch))}
+            for content_hash in batch:
+                if content_hash not in tracked:
+                    os.remove(candidates[content_hash])
+                    PreviewService.remove(candidates[content_hash])
+                    removed += 1
+        return removed
+
+
+@event.listens_for(Document, 'after_delete')
+def _release_blob_reference(mapper, connection, document):
+    """Drop the deleted document's reference to its blob"""
+    if document.content_hash:
+        connection.execute(
+            update(DocumentBlob)
+            .where(DocumentBlob.content_hash == document.content_hash)
+            .values(ref_count=DocumentBlob.ref_count - 1)
+        )
@@ -0,0 +1,80 @@
+"""
+Cache service - small key/value cache with in-process and Redis backends
+"""
+import json
+import threading
+import time
+from flask import current_app
+from app.services.redis_client import get_redis
+
+
+class MemoryCache:
+    """
+    Per-process cache with expiry
+
+    Invalidations reach only the process that makes them, so this backend
+    is only for single-process development and tests.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get a value, or None if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        """Set a value, expiring after ttl seconds"""
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (value, expires_at)
+
+    def delete(self, *keys):
+        """Delete keys"""
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+
+class RedisCache:
+    """Cache shared across processes, values stored as JSON"""
+
+    prefix = 'cache:'
+
+    def get(self, key):
+        """Get a value, or None if missing or expired"""
+        raw = get_redis().get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        """Set a value, expiring after ttl seconds"""
+        get_redis().set(self.prefix + key, json.dumps(value), ex=ttl)
+
+    def delete(self, *keys):
+        """Delete keys"""
+        if keys:
+            get_redis().delete(*[self.prefix + key for key in keys])
+
+
+_BACKENDS = {
+    'memory': MemoryCache,
+    'redis': RedisCache
+}
+
+
+def get_cache():
+    """Get the cache configured by CACHE_BACKEND"""
+    cache = current_app.extensions.get('cache')
+    if cache is None:
+        cache = _BACKENDS[current_app.config['CACHE_BACKEND']]()
+        current_app.extensions['cache'] = cache
+    return cache
@@ -0,0 +1,232 @@
+"""
+Choice draft store - unsubmitted choice lists kept outside the database
+"""
+import threading
+import time
+from flask import current_app
+from app.services.redis_client import get_redis
+
+# append() results that are not order keys
+APPEND_DUPLICATE = -1
+APPEND_FULL = -2
+
+# Check and append in one step so concurrent appends cannot overfill the
+# draft or share an order key
+_APPEND_SCRIPT = """
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return {-1, 0}
+end
+local count = redis.call('ZCARD', KEYS[1])
+if count >= tonumber(ARGV[3]) then
+    return {-2, count}
+end
+local key = tonumber(ARGV[2])
+local last = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+if last[2] then
+    key = tonumber(last[2]) + key
+end
+redis.call('ZADD', KEYS[1], key, ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return {key, count + 1}
+"""
+
+
+class MemoryChoiceDraftStore:
+    """
+    Per-process draft store with sliding expiry
+
+    Drafts are lost on restart and each worker process holds its own, so
+    this backend is only for single-process development and tests.
+    """
+
+    # Drafts are not visible to other processes and do not survive a restart
+    shared = False
+
+    def __init__(self):
+        self._drafts = {}
+        self._lock = threading.Lock()
+
+    def _live(self, student_id):
+        entry = self._drafts.get(student_id)
+        if entry is None:
+            return None
+        keys, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._drafts[student_id]
+            return None
+        return keys
+
+    def load(self, student_id):
+        """
+        Get a student's draft
+
+        Returns:
+            dict or None: Order key by course ID, or None if no draft exists
+        """
+        with self._lock:
+            keys = self._live(student_id)
+            return dict(keys) if keys is not None else None
+
+    def save(self, student_id, changed, removed=()):
+        """
+        Write changed entries and refresh the draft's expiry
+
+        Args:
+            student_id: Owner of the draft
+            changed: Order key by course ID for added or moved entries
+            removed: Course IDs to drop from the draft
+        """
+        with self._lock:
+            keys = self._live(student_id) or {}
+            for course_id in removed:
+                keys.pop(course_id, None)
+            keys.update(changed)
+            self._drafts[student_id] = (keys, time.monotonic() + current_app.config['CHOICE_DRAFT_TTL'])
+
+    def append(self, student_id, course_id, gap, limit):
+        """
+        Add a course after the last entry unless it is present or the draft is full
+
+        Returns:
+            tuple: (order key or APPEND_DUPLICATE/APPEND_FULL, entries in the draft)
+        """
+        with self._lock:
+            keys = self._live(student_id) or {}
+            if course_id in keys:
+                return APPEND_DUPLICATE, len(keys)
+            if len(keys) >= limit:
+                return APPEND_FULL, len(keys)
+
+            key = max(keys.values(), default=0) + gap
+            keys[course_id] = key
+            self._drafts[student_id] = (keys, time.monotonic() + current_app.config['CHOICE_DRAFT_TTL'])
+            return key, len(keys)
+
+    def load_all(self):
+        """
+        Get every live draft
+
+        Returns:
+            dict: Draft (order key by course ID) by student ID
+        """
+        with self._lock:
+            student_ids = list(self._drafts)
+            drafts = {student_id: self._live(student_id) for student_id in student_ids}
+            return {student_id: dict(keys) for student_id, keys in drafts.items() if keys is not None}
+
+    def count(self, student_id):
+        """Number of entries in a student's draft"""
+        with self._lock:
+            return len(self._live(student_id) or ())
+
+    def discard(self, student_id):
+        """Delete a student's draft"""
+        with self._lock:
+            self._drafts.pop(student_id, None)
+
+
+class RedisChoiceDraftStore:
+    """Draft store backed by one sorted set per student, scored by order key"""
+
+    shared = True
+
+    def __init__(self):
+        self._append_script = None
+
+    @staticmethod
+    def _key(student_id):
+        return f"choice_draft:{student_id}"
+
+    def load(self, student_id):
+        """
+        Get a student's draft
+
+        An emptied draft has no key in Redis and loads as None.
+
+        Returns:
+            dict or None: Order key by course ID, or None if no draft exists
+        """
+        entries = get_redis().zrange(self._key(student_id), 0, -1, withscores=True)
+        if not entries:
+            return None
+        return {int(course_id): int(key) for course_id, key in entries}
+
+    def save(self, student_id, changed, removed=()):
+        """
+        Write changed entries and refresh the draft's expiry in one round trip
+
+        Args:
+            student_id: Owner of the draft
+            changed: Order key by course ID for added or moved entries
+            removed: Course IDs to drop from the draft
+        """
+        key = self._key(student_id)
+        pipe = get_redis().pipeline()
+        if removed:
+            pipe.zrem(key, *removed)
+        if changed:
+            pipe.zadd(key, changed)
+        pipe.expire(key, current_app.config['CHOICE_DRAFT_TTL'])
+        pipe.execute()
+
+    def append(self, student_id, course_id, gap, limit):
+        """
+        Add a course after the last entry unless it is present or the draft is full
+
+        Returns:
+            tuple: (order key or APPEND_DUPLICATE/APPEND_FULL, entries in the draft)
+        """
+        client = get_redis()
+        if self._append_script is None:
+            self._append_script = client.register_script(_APPEND_SCRIPT)
+
+        key, count = self._append_script(
+            keys=[self._key(student_id)],
+            args=[course_id, gap, limit, current_app.config['CHOICE_DRAFT_TTL']],
+            client=client
+        )
+        return int(key), int(count)
+
+    def load_all(self):
+        """
+        Get every live draft, scanning keys and reading them in one pipeline
+
+        Returns:
+            dict: Draft (order key by course ID) by student ID
+        """
+        client = get_redis()
+        keys = list(client.scan_iter(match=self._key('*')))
+        if not keys:
+            return {}
+
+        pipe = client.pipeline()
+        for key in keys:
+            pipe.zrange(key, 0, -1, withscores=True)
+
+        return {
+            int(key.rsplit(':', 1)[1]): {int(course_id): int(order) for course_id, order in entries}
+            for key, entries in zip(keys, pipe.execute()) if entries
+        }
+
+    def count(self, student_id):
+        """Number of entries in a student's draft"""
+        return get_redis().zcard(self._key(student_id))
+
+    def discard(self, student_id):
+        """Delete a student's draft"""
+        get_redis().delete(self._key(student_id))
+
+
+_BACKENDS = {
+    'memory': MemoryChoiceDraftStore,
+    'redis': RedisChoiceDraftStore
+}
+
+
+def get_draft_store():
+    """Get the draft store configured by CHOICE_DRAFT_BACKEND"""
+    store = current_app.extensions.get('choice_draft_store')
+    if store is None:
+        store = _BACKENDS[current_app.config['CHOICE_DRAFT_BACKEND']]()
+        current_app.extensions['choice_draft_store'] = store
+    return store
@@ -0,0 +1,461 @@
+"""
+Choice service - draft choice lists and their submission
+"""
+import bisect
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import joinedload
+from app.models import db, Student, Choice, Course, College, AuditLog
+from app.services.choice_draft_store import APPEND_DUPLICATE, APPEND_FULL, get_draft_store
+from app.services.event_bus import event_bus
+from app.services.student_dashboard_service import StudentDashboardService
+
+
+def _longest_increasing(keys):
+    """Indices of a longest strictly increasing subsequence of the non-None keys"""
+    tails, tail_keys, previous = [], [], {}
+    for index, key in enumerate(keys):
+        if key is None:
+            continue
+        position = bisect.bisect_left(tail_keys, key)
+        previous[index] = tails[position - 1] if position else None
+        if position == len(tails):
+            tails.append(index)
+            tail_keys.append(key)
+        else:
+            tails[position] = index
+            tail_keys[position] = key
+
+    kept = set()
+    index = tails[-1] if tails else None
+    while index is not None:
+        kept.add(index)
+        index = previous[index]
+    return kept
+
+
+def plan_order_keys(keys, gap):
+    """
+    Assign sparse order keys to a list in its new order, changing as few as possible
+
+    The longest increasing run of existing keys is kept and every other
+    entry gets a key spaced evenly inside the gap around it, so a move or
+    insert changes one key. When a gap is exhausted the whole list is
+    rebalanced to multiples of gap.
+
+    Args:
+        keys: Current keys in the new order, None for new entries
+        gap: Spacing between keys after rebalancing or when appending
+
+    Returns:
+        list: Keys in the new order
+    """
+    result = [None] * len(keys)
+    for index in _longest_increasing(keys):
+        result[index] = keys[index]
+
+    start = 0
+    while start < len(keys):
+        if result[start] is not None:
+            start += 1
+            continue
+
+        end = start
+        while end < len(keys) and result[end] is None:
+            end += 1
+
+        lower = result[start - 1] if start else 0
+        upper = result[end] if end < len(keys) else None
+        count = end - start
+        step = gap if upper is None else (upper - lower) // (count + 1)
+        if step < 1:
+            return [gap * (index + 1) for index in range(len(keys))]
+
+        for offset in range(count):
+            result[start + offset] = lower + step * (offset + 1)
+        start = end
+
+    return result
+
+
+def _parse_deadline(value):
+    """Parse CHOICE_FILLING_DEADLINE into naive UTC; values without an offset are UTC"""
+    if not value:
+        return None
+    deadline = datetime.fromisoformat(value)
+    if deadline.tzinfo is not None:
+        deadline = deadline.astimezone(timezone.utc).replace(tzinfo=None)
+    return deadline
+
+
+class ChoiceService:
+    """
+    Service for editing choice lists
+
+    Unsubmitted lists live in the draft store keyed by student, as course
+    IDs with sparse order keys. The choices table only receives the final
+    list, locked, when the student submits.
+    """
+
+    @staticmethod
+    def load_draft(student_id):
+        """
+        Get a student's draft in preference order
+
+        Unlocked rows left in the choices table from before drafts existed
+        are copied into the draft the first time it is read. They are only
+        deleted when the draft store is shared, so a per-process store
+        never holds the only copy of a list.
+
+        Args:
+            student_id: Owner of the draft
+
+        Returns:
+            list: (course_id, order_key) pairs in preference order
+        """
+        store = get_draft_store()
+        draft = store.load(student_id)
+        if draft is None:
+            rows = db.session.query(Choice.id, Choice.course_id, Choice.preference_order)\
+                .filter(Choice.student_id == student_id, Choice.is_locked == False).all()
+            draft = {row.course_id: row.preference_order for row in rows}
+            if rows:
+                store.save(student_id, draft)
+                if store.shared:
+                    db.session.execute(delete(Choice).where(Choice.id.in_([row.id for row in rows])))
+                    db.session.commit()
+
+        return sorted(draft.items(), key=lambda entry: entry[1])
+
+    @staticmethod
+    def list_choices(student):
+        """
+        A student's choices in preference order with course and college data
+
+        Submitted lists are read from the choices table, drafts from the
+        draft store.
+
+        Returns:
+            list: Serialized choices, each with its 1-based position
+        """
+        if student.choices_submitted:
+            choices = Choice.query.options(joinedload(Choice.course).joinedload(Course.college))\
+                .filter_by(student_id=student.id)\
+                .order_by(Choice.preference_order).all()
+            return [
+                {**choice.to_dict(include_course=True, include_college=True), 'position': position}
+                for position, choice in enumerate(choices, start=1)
+            ]
+
+        draft = ChoiceService.load_draft(student.id)
+        courses = {course.id: course for course in Course.query.options(joinedload(Course.college))
+                   .filter(Course.id.in_([course_id for course_id, _ in draft]))} if draft else {}
+        entries = [(course_id, key) for course_id, key in draft if course_id in courses]
+
+        return [
+            ChoiceService._serialize_draft_entry(student.id, courses[course_id], key, position)
+            for position, (course_id, key) in enumerate(entries, start=1)
+        ]
+
+    @staticmethod
+    def add(student, course):
+        """
+        Append a course to a student's draft
+
+        Returns:
+            dict: The new choice, serialized as by list_choices
+
+        Raises:
+            ValueError: If the list is full or already has the course
+        """
+        # Moves legacy rows into the draft before appending to it
+        ChoiceService.load_draft(student.id)
+
+        max_choices = current_app.config['MAX_CHOICES']
+        key, count = get_draft_store().append(
+            student.id, course.id, current_app.config['CHOICE_ORDER_GAP'], max_choices
+        )
+        if key == APPEND_DUPLICATE:
+            raise ValueError('Course already added to choices')
+        if key == APPEND_FULL:
+            raise ValueError(f'Maximum {max_choices} choices allowed')
+
+        return ChoiceService._serialize_draft_entry(student.id, course, key, count)
+
+    @staticmethod
+    def remove(student, course_id):
+        """
+        Drop a course from a student's draft; the other entries keep their keys
+
+        Raises:
+            ValueError: If the course is not in the draft
+        """
+        if not any(existing == course_id for existing, _ in ChoiceService.load_draft(student.id)):
+            raise ValueError('Choice not found')
+
+        get_draft_store().save(student.id, {}, removed=[course_id])
+
+    @staticmethod
+    def replace_list(student, course_ids):
+        """
+        Replace a student's draft with an ordered list of courses
+
+        The courses are validated with one IN query and the new list is
+        diffed against the draft, so only added or moved entries are
+        written.
+
+        Args:
+            student: Student whose list is replaced
+            course_ids: Course IDs in preference order
+
+        Returns:
+            list: The student's choices, serialized as by list_choices
+
+        Raises:
+            ValueError: If the list is invalid
+        """
+        if not isinstance(course_ids, list) or not all(isinstance(course_id, int) for course_id in course_ids):
+            raise ValueError('course_ids must be a list of integers')
+        if len(set(course_ids)) != len(course_ids):
+            raise ValueError('Each course can be chosen only once')
+
+        max_choices = current_app.config['MAX_CHOICES']
+        if len(course_ids) > max_choices:
+            raise ValueError(f'Maximum {max_choices} choices allowed')
+
+        ChoiceService._check_courses(course_ids)
+
+        draft = dict(ChoiceService.load_draft(student.id))
+        wanted = set(course_ids)
+        ChoiceService._save_order(student.id, draft, course_ids,
+                                  removed=[course_id for course_id in draft if course_id not in wanted])
+
+        return ChoiceService.list_choices(student)
+
+    @staticmethod
+    def reorder(student, course_ids):
+        """
+        Put a student's draft in a new order
+
+        Courses not listed keep their relative order after the listed ones.
+
+        Args:
+            student: Student whose list is reordered
+            course_ids: Course IDs in the new preference order
+        """
+        draft = ChoiceService.load_draft(student.id)
+        current = dict(draft)
+        listed = [course_id for course_id in dict.fromkeys(course_ids) if course_id in current]
+        listed_ids = set(listed)
+
+        ChoiceService._save_order(student.id, current,
+                                  listed + [course_id for course_id, _ in draft if course_id not in listed_ids])
+
+    @staticmethod
+    def move(student, course_id, position):
+        """
+        Move one course to a 1-based position, normally rewriting only its key
+
+        Raises:
+            ValueError: If the course is not in the draft
+        """
+        draft = ChoiceService.load_draft(student.id)
+        ordered = [existing for existing, _ in draft]
+        if course_id not in ordered:
+            raise ValueError('Choice not found')
+
+        ordered.remove(course_id)
+        ordered.insert(max(0, min(position - 1, len(ordered))), course_id)
+        ChoiceService._save_order(student.id, dict(draft), ordered)
+
+    @staticmethod
+    def submit(student):
+        """
+        Materialise a student's draft as locked choices
+
+        The submitted flag is claimed with a conditional UPDATE so a
+        concurrent submit cannot write the list twice; the list itself is
+        one bulk insert. The draft is discarded after the commit.
+
+        Returns:
+            int: Number of choices submitted
+
+        Raises:
+            ValueError: If the draft is too short, names courses that are no
+                longer offered, or was already submitted
+        """
+        draft = ChoiceService.load_draft(student.id)
+
+        min_choices = current_app.config['MIN_CHOICES']
+        if len(draft) < min_choices:
+            raise ValueError(f'Minimum {min_choices} choice(s) required')
+
+        ChoiceService._check_courses([course_id for course_id, _ in draft])
+
+        claimed = db.session.execute(
+            update(Student)
+            .where(Student.id == student.id, Student.choices_submitted == False)
+            .values(choices_submitted=True)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.session.rollback()
+            raise ValueError('Choices are already submitted')
+
+        # Legacy unlocked rows stay behind when the draft store is not shared
+        db.session.execute(
+            delete(Choice)
+            .where(Choice.student_id == student.id, Choice.is_locked == False)
+            .execution_options(synchronize_session=False)
+        )
+        now = datetime.utcnow()
+        db.session.execute(insert(Choice), [{
+            'student_id': student.id,
+            'course_id': course_id,
+            'preference_order': key,
+            'is_locked': True,
+            'submitted_at': now
+        } for course_id, key in draft])
+
+        StudentDashboardService.mark_changed([student.id])
+        event_bus.defer([(student.id, 'student_status', {'choices_submitted': True})])
+        db.session.commit()
+        db.session.expire_all()
+
+        get_draft_store().discard(student.id)
+        return len(draft)
+
+    @staticmethod
+    def deadline_passed(now=None):
+        """Whether the choice filling deadline (UTC) is set and has passed"""
+        deadline = _parse_deadline(current_app.config['CHOICE_FILLING_DEADLINE'])
+        return deadline is not None and (now or datetime.utcnow()) >= deadline
+
+    @staticmethod
+    def lock_outstanding(now=None):
+        """
+        Lock every choice list that was not submitted, as at the deadline
+
+        Live drafts of unsubmitted students are bulk inserted, then one
+        UPDATE marks every student with unlocked choices as submitted and
+        one UPDATE locks those choices. A single summary audit entry
+        records the sweep. Draft entries for courses that are no longer
+        offered are dropped.
+
+        Args:
+            now: Lock time (default now)
+
+        Returns:
+            dict: Number of students and choices locked
+        """
+        now = now or datetime.utcnow()
+        store = get_draft_store()
+        drafts = store.load_all()
+
+        pending = {student_id for (student_id,) in db.session.query(Student.id).filter(
+            Student.id.in_(list(drafts)),
+            Student.choices_submitted == False
+        )} if drafts else set()
+
+        course_ids = {course_id for student_id in pending for course_id in drafts[student_id]}
+        offered = {course_id for (course_id,) in db.session.query(Course.id).join(College).filter(
+            Course.id.in_(course_ids),
+            Course.is_active == True,
+            College.is_active == True
+        )} if course_ids else set()
+
+        rows = [{
+            'student_id': student_id,
+            'course_id': course_id,
+            'preference_order': key,
+            'is_locked': False
+        } for student_id in pending for course_id, key in drafts[student_id].items() if course_id in offered]
+
+        if rows:
+            # The draft replaces any unlocked rows the student still has
+            db.session.execute(
+                delete(Choice)
+                .where(Choice.student_id.in_({row['student_id'] for row in rows}), Choice.is_locked == False)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.execute(insert(Choice), rows)
+
+        unlocked = select(Choice.student_id).where(Choice.is_locked == False).distinct()
+        student_ids = [student_id for (student_id,) in db.session.execute(unlocked)]
+
+        db.session.execute(
+            update(Student)
+            .where(Student.choices_submitted == False, Student.id.in_(unlocked))
+            .values(choices_submitted=True)
+            .execution_options(synchronize_session=False)
+        )
+        locked = db.session.execute(
+            update(Choice)
+            .where(Choice.is_locked == False)
+            .values(is_locked=True, submitted_at=now, updated_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        StudentDashboardService.mark_changed(student_ids)
+        event_bus.defer(
+            (student_id, 'student_status', {'choices_submitted': True}) for student_id in student_ids
+        )
+        db.session.commit()
+        db.session.expire_all()
+
+        for student_id in drafts:
+            store.discard(student_id)
+
+        AuditLog.log_action(
+            user_id=None,
+            action='choices_locked_at_deadline',
+            entity_type='Student',
+            description=f'Locked {locked} choices for {len(student_ids)} students at the choice filling deadline',
+            new_values={'students': len(student_ids), 'choices': locked}
+        )
+
+        return {'students': len(student_ids), 'choices': locked}
+
+    @staticmethod
+    def _serialize_draft_entry(student_id, course, key, position):
+        """Serialize one draft entry in the shape of a submitted choice"""
+        return {
+            'course_id': course.id,
+            'student_id': student_id,
+            'preference_order': key,
+            'position': position,
+            'is_locked': False,
+            'course': course.to_dict(include_college=True),
+            'college': course.college.to_dict()
+        }
+
+    @staticmethod
+    def _check_courses(course_ids):
+        """Raise ValueError naming any course that is not open for choice filling"""
+        valid = {course_id for (course_id,) in db.session.query(Course.id).join(College).filter(
+            Course.id.in_(course_ids),
+            Course.is_active == True,
+            College.is_active == True
+        )} if course_ids else set()
+        invalid = [course_id for course_id in course_ids if course_id not in valid]
+        if invalid:
+            raise ValueError(f'Invalid courses: {", ".join(map(str, invalid))}')
+
+    @staticmethod
+    def _save_order(student_id, current, ordered, removed=()):
+        """
+        Write a new draft order
+
+        Args:
+            student_id: Owner of the draft
+            current: Current order key by course ID
+            ordered: Course IDs in the new order
+            removed: Course IDs to drop
+        """
+        keys = plan_order_keys([current.get(course_id) for course_id in ordered],
+                               current_app.config['CHOICE_ORDER_GAP'])
+        changed = {course_id: key for course_id, key in zip(ordered, keys) if current.get(course_id) != key}
+
+        if changed or removed:
+            get_draft_store().save(student_id, changed, removed)
@@ -0,0 +1,248 @@
+"""
+Document review service - set-based verification and rejection of documents
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import joinedload
+from app.models import (
+    db, User, Student, Document, DocumentType, DocumentStatus, AuditLog
+)
+from app.services.email_service import EmailService
+from app.services.event_bus import event_bus
+from app.services.sms_service import SMSService
+from app.services.student_dashboard_service import StudentDashboardService
+from app.services.task_queue import task_queue
+
+# Documents a student needs verified before documents_verified is set
+REQUIRED_DOCUMENTS = (
+    DocumentType.MARKS_CARD_10TH,
+    DocumentType.MARKS_CARD_12TH,
+    DocumentType.RANK_CARD
+)
+
+_ACTION_STATUS = {
+    'verify': DocumentStatus.VERIFIED,
+    'reject': DocumentStatus.REJECTED
+}
+
+
+class DocumentReviewService:
+    """Service for reviewing many documents at once"""
+
+    @staticmethod
+    def review_batch(admin_id, document_ids, action, reason=''):
+        """
+        Verify or reject a batch of documents
+
+        Documents are updated with one statement, documents_verified is
+        recomputed for the affected students with one grouped query and
+        everything commits once. Audit entries then go to the audit sink
+        and email and SMS notifications to the task queue. Only documents
+        READY for review are changed; those leased to another reviewer,
+        awaiting inspection, invalid or already reviewed are skipped.
+
+        Args:
+            admin_id: Reviewing admin's user ID
+            document_ids: IDs of documents to review
+            action: 'verify' or 'reject'
+            reason: Rejection reason
+
+        Returns:
+            dict: Reviewed, missing, claimed-by-others, invalid and
+            otherwise not ready document IDs
+        """
+        status = _ACTION_STATUS[action]
+        reason = reason if action == 'reject' else None
+        now = datetime.utcnow()
+
+        rows = db.session.query(
+            Document.id, Document.student_id, Document.document_type, Document.status,
+            Student.first_name, Student.middle_name, Student.last_name,
+            User.id.label('user_id'), User.email, User.mobile
+        ).join(Student, Student.id == Document.student_id)\
+            .outerjoin(User, User.id == Student.user_id)\
+            .filter(Document.id.in_(document_ids))\
+            .with_for_update(of=Document)\
+            .all()
+
+        claimed = {document_id for (document_id,) in db.session.query(Document.id).filter(
+            Document.id.in_(document_ids), Document.claimed_until > now, Document.claimed_by != admin_id
+        )}
+        invalid = {row.id for row in rows if row.status == DocumentStatus.INVALID}
+        not_ready = {row.id for row in rows if row.status not in (DocumentStatus.READY, DocumentStatus.INVALID)}
+        rows = [row for row in rows if row.id not in claimed and row.status == DocumentStatus.READY]
+
+        reviewed_ids = [row.id for row in rows]
+        student_ids = {row.student_id for row in rows}
+
+        if reviewed_ids:
+            db.session.execute(
+                update(Document)
+                .where(Document.id.in_(reviewed_ids), Document.status == DocumentStatus.READY)
+                .values(status=status, verified_by=admin_id, verified_at=now, rejection_reason=reason,
+                        claimed_by=None, claimed_until=None)
+                .execution_options(synchronize_session=False)
+            )
+
+            DocumentReviewService.refresh_documents_verified(student_ids)
+
+            StudentDashboardService.mark_changed(student_ids)
+            event_bus.defer((row.student_id, 'document', {
+                'document_id': row.id,
+                'document_type': row.document_type.value,
+                'status': status.value,
+                'rejection_reason': reason
+            }) for row in rows)
+
+        db.session.commit()
+
+        # Expire cached instances so later reads see the new state
+        db.session.expire_all()
+
+        for row in rows:
+            AuditLog.log_action(
+                user_id=admin_id,
+                action=f'document_{action}ed',
+                entity_type='Document',
+                entity_id=row.id,
+                description=f'Document {action}ed: {row.document_type.value}'
+            )
+            if row.user_id:
+                DocumentReviewService._enqueue_notifications(row, status.value, reason)
+
+        found = {row.id for row in rows} | claimed | invalid | not_ready
+        return {
+            'reviewed': reviewed_ids,
+            'not_found': [document_id for document_id in document_ids if document_id not in found],
+            'claimed_by_others': sorted(claimed),
+            'invalid': sorted(invalid),
+            'not_ready': sorted(not_ready - claimed)
+        }
+
+    @staticmethod
+    def claim_pending(admin_id, limit):
+        """
+        Lease the oldest unclaimed documents awaiting review to a reviewer
+
+        Candidates are read with FOR UPDATE SKIP LOCKED where the database
+        supports it, and the lease UPDATE re-checks that each row is still
+        free, so concurrent reviewers never hold the same document. Leases
+        expire after DOCUMENT_CLAIM_LEASE_SECONDS and the documents return
+        to the queue.
+
+        Args:
+            admin_id: Reviewing admin's user ID
+            limit: Maximum number of documents to lease
+
+        Returns:
+            list: Leased Document objects, oldest first
+        """
+        now = datetime.utcnow()
+        # Whole seconds, as MySQL DATETIME stores them
+        lease_until = now.replace(microsecond=0) + timedelta(seconds=current_app.config['DOCUMENT_CLAIM_LEASE_SECONDS'])
+        unclaimed = or_(Document.claimed_until.is_(None), Document.claimed_until <= now)
+
+        candidate_ids = [document_id for (document_id,) in db.session.query(Document.id)
+                         .filter(Document.status == DocumentStatus.READY, unclaimed)
+                         .order_by(Document.uploaded_at)
+                         .limit(limit)
+                         .with_for_update(skip_locked=True)]
+
+        if candidate_ids:
+            db.session.execute(
+                update(Document)
+                .where(Document.id.in_(candidate_ids), Document.status == DocumentStatus.READY, unclaimed)
+                .values(claimed_by=admin_id, claimed_until=lease_until)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+
+        if not candidate_ids:
+            return []
+
+        return Document.query.options(joinedload(Document.student)).filter(
+            Document.id.in_(candidate_ids),
+            Document.claimed_by == admin_id
+        ).order_by(Document.uploaded_at).all()
+
+    @staticmethod
+    def release(admin_id, document_ids):
+        """
+        Return a reviewer's leased documents to the queue
+
+        Args:
+            admin_id: Reviewing admin's user ID
+            document_ids: IDs of documents to release
+
+        Returns:
+            int: Number of documents released
+        """
+        released = db.session.execute(
+            update(Document)
+            .where(Document.id.in_(document_ids), Document.claimed_by == admin_id)
+            .values(claimed_by=None, claimed_until=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        return released
+
+    @staticmethod
+    def refresh_documents_verified(student_ids):
+        """
+        Recompute documents_verified for students with one grouped query
+
+        Pending document changes are flushed first. A student_status event
+        is queued for each student whose flag changes.
+
+        Args:
+            student_ids: IDs of students whose documents changed
+
+        Returns:
+            dict: New documents_verified value of each student whose flag changed
+        """
+        if not student_ids:
+            return {}
+
+        complete = {student_id for (student_id,) in db.session.query(Document.student_id)
+                    .filter(
+                        Document.student_id.in_(student_ids),
+                        Document.document_type.in_(REQUIRED_DOCUMENTS),
+                        Document.status == DocumentStatus.VERIFIED
+                    )
+                    .group_by(Document.student_id)
+                    .having(func.count(func.distinct(Document.document_type)) == len(REQUIRED_DOCUMENTS))}
+
+        current = db.session.query(Student.id, Student.documents_verified)\
+            .filter(Student.id.in_(student_ids))
+        changed = {student_id: student_id in complete for student_id, verified in current
+                   if bool(verified) != (student_id in complete)}
+
+        for verified in (True, False):
+            ids = [student_id for student_id, value in changed.items() if value is verified]
+            if ids:
+                db.session.execute(
+                    update(Student)
+                    .where(Student.id.in_(ids))
+                    .values(documents_verified=verified)
+                    .execution_options(synchronize_session=False)
+                )
+
+        event_bus.defer(
+            (student_id, 'student_status', {'documents_verified': verified})
+            for student_id, verified in changed.items()
+        )
+        return changed
+
+    @staticmethod
+    def _enqueue_notifications(row, status, reason):
+        document_type = row.document_type.value
+        full_name = ' '.join(filter(None, (row.first_name, row.middle_name, row.last_name)))
+        task_queue.enqueue(
+            EmailService.send_document_verification_notification,
+            row.email, full_name, document_type, status, reason, user_id=row.user_id
+        )
+        task_queue.enqueue(
+            SMSService.send_document_verification_sms,
+            row.mobile, full_name, document_type, status, user_id=row.user_id
+        )
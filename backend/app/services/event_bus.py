@@ -0,0 +1,205 @@
+"""
+Event bus - publish student status changes to Server-Sent Event streams
+"""
+import itertools
+import json
+import queue
+import threading
+import time
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.models import db, Student, Document, Allotment
+from app.services.redis_client import get_redis
+
+REDIS_CHANNEL = 'student_events'
+
+# Student flags whose changes are pushed to the student
+STUDENT_STATUS_FIELDS = (
+    'registration_complete', 'documents_verified', 'payment_complete',
+    'choices_submitted', 'seat_allotted', 'admission_confirmed'
+)
+
+
+class EventBus:
+    """
+    In-process pub/sub of per-student events
+
+    Subscribers are local queues. With EVENT_BUS_BACKEND set to 'redis',
+    publishes go through a Redis channel and a listener thread in every
+    process delivers them to its local subscribers.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._listener = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Bind the bus to an application"""
+        self.app = app
+        app.extensions['event_bus'] = self
+
+    def subscribe(self, student_id):
+        """
+        Register a subscriber for a student's events
+
+        Returns:
+            queue.Queue: Queue receiving event dicts
+        """
+        subscriber = queue.Queue(maxsize=self.app.config['EVENT_STREAM_QUEUE_SIZE'])
+        with self._lock:
+            self._subscribers.setdefault(student_id, set()).add(subscriber)
+
+        if self.app.config['EVENT_BUS_BACKEND'] == 'redis':
+            self._start_listener()
+
+        return subscriber
+
+    def unsubscribe(self, student_id, subscriber):
+        """Remove a subscriber"""
+        with self._lock:
+            subscribers = self._subscribers.get(student_id)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[student_id]
+
+    def publish(self, student_id, event_type, data):
+        """Publish an event to every subscriber of a student"""
+        message = {'student_id': student_id, 'type': event_type, 'data': data}
+
+        if self.app.config['EVENT_BUS_BACKEND'] == 'redis':
+            get_redis().publish(REDIS_CHANNEL, json.dumps(message))
+        else:
+            self._deliver(message)
+
+    def defer(self, events):
+        """
+        Publish events when the current transaction commits
+
+        For set-based writes, which bypass the flush hook that notices
+        status changes.
+
+        Args:
+            events: (student_id, event_type, data) tuples
+        """
+        db.session.info.setdefault('pending_events', []).extend(events)
+
+    def _deliver(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(message['student_id'], ()))
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # Slow client; it will resync on reconnect
+                pass
+
+    def _start_listener(self):
+        if self._listener:
+            return
+
+        with self._lock:
+            if self._listener:
+                return
+            self._listener = threading.Thread(target=self._listen, name='event-bus-listener', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        """
+        Relay the Redis channel to local subscribers
+
+        A lost connection is retried with exponential backoff while anyone
+        is subscribed; once nobody is, the thread exits and the next
+        subscribe starts a new one.
+        """
+        delay = 1
+        max_delay = self.app.config['EVENT_BUS_RECONNECT_MAX_SECONDS']
+        try:
+            while True:
+                pubsub = None
+                try:
+                    with self.app.app_context():
+                        pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                        pubsub.subscribe(REDIS_CHANNEL)
+                    delay = 1
+
+                    for item in pubsub.listen():
+                        try:
+                            self._deliver(json.loads(item['data']))
+                        except (ValueError, KeyError):
+                            continue
+                except Exception as e:
+                    self.app.logger.warning(f"Event bus listener lost Redis: {str(e)}; retrying in {delay}s")
+                finally:
+                    if pubsub is not None:
+                        pubsub.close()
+
+                with self._lock:
+                    if not self._subscribers:
+                        return
+                time.sleep(delay)
+                delay = min(delay * 2, max_delay)
+        finally:
+            with self._lock:
+                self._listener = None
+
+
+event_bus = EventBus()
+
+
+def _changed(obj, *fields):
+    state = inspect(obj)
+    return [field for field in fields if state.attrs[field].history.has_changes()]
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_status_events(session, flush_context):
+    """Queue events for status changes written in this transaction"""
+    events = session.info.setdefault('pending_events', [])
+
+    for obj in itertools.chain(session.new, session.dirty):
+        if isinstance(obj, Allotment) and _changed(obj, 'status'):
+            events.append((obj.student_id, 'allotment', {
+                'allotment_id': obj.id,
+                'round_id': obj.round_id,
+                'course_id': obj.course_id,
+                'status': obj.status.value
+            }))
+        elif isinstance(obj, Document) and _changed(obj, 'status'):
+            events.append((obj.student_id, 'document', {
+                'document_id': obj.id,
+                'document_type': obj.document_type.value,
+                'status': obj.status.value,
+                'rejection_reason': obj.rejection_reason
+            }))
+        elif isinstance(obj, Student) and obj in session.dirty:
+            fields = _changed(obj, *STUDENT_STATUS_FIELDS)
+            if fields:
+                events.append((obj.id, 'student_status', {
+                    field: getattr(obj, field) for field in fields
+                }))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_status_events(session):
+    events = session.info.pop('pending_events', None)
+    if not events or not has_app_context():
+        return
+
+    for student_id, event_type, data in events:
+        try:
+            event_bus.publish(student_id, event_type, data)
+        except Exception as e:
+            current_app.logger.error(f"Failed to publish {event_type} event: {str(e)}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_status_events(session):
+    session.info.pop('pending_events', None)
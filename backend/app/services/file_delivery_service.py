@@ -0,0 +1,67 @@
+"""
+File delivery service - hand file bodies to the front proxy or stream them with range support
+"""
+import os
+from flask import current_app, request, send_file, Response
+from werkzeug.http import quote_etag
+
+
+class FileDeliveryService:
+    """Service for sending stored files to clients"""
+
+    @staticmethod
+    def send(file_path, download_name, mimetype=None, etag=None, as_attachment=True):
+        """
+        Send a stored file according to FILE_DELIVERY_MODE
+
+        'x-accel-redirect' and 'x-sendfile' return only headers and let the
+        front proxy (nginx / Apache, lighttpd) stream the bytes. 'direct'
+        streams from the worker with HTTP Range and conditional request
+        support. A matching If-None-Match is answered with 304 in every mode.
+
+        Args:
+            file_path: Path of the file under UPLOAD_FOLDER
+            download_name: File name presented to the client
+            mimetype: Content type (guessed from download_name if omitted)
+            etag: Strong ETag value, e.g. the content SHA-256
+            as_attachment: Send Content-Disposition: attachment
+
+        Returns:
+            Response
+        """
+        mode = current_app.config['FILE_DELIVERY_MODE']
+
+        if mode == 'direct':
+            response = send_file(
+                file_path,
+                mimetype=mimetype,
+                as_attachment=as_attachment,
+                download_name=download_name,
+                conditional=True,
+                etag=etag if etag else True
+            )
+            response.cache_control.private = True
+            return response
+
+        if etag and etag in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        response = Response(mimetype=mimetype or 'application/octet-stream')
+        disposition = 'attachment' if as_attachment else 'inline'
+        response.headers.set('Content-Disposition', disposition, filename=download_name)
+
+        if mode == 'x-accel-redirect':
+            relative_path = os.path.relpath(file_path, current_app.config['UPLOAD_FOLDER'])
+            prefix = current_app.config['X_ACCEL_REDIRECT_PREFIX'].rstrip('/')
+            response.headers['X-Accel-Redirect'] = f"{prefix}/{relative_path.replace(os.sep, '/')}"
+        elif mode == 'x-sendfile':
+            response.headers['X-Sendfile'] = os.path.abspath(file_path)
+        else:
+            raise ValueError(f'Unknown FILE_DELIVERY_MODE: {mode}')
+
+        if etag:
+            response.headers['ETag'] = quote_etag(etag)
+        response.cache_control.private = True
+        return response
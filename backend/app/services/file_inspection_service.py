@@ -0,0 +1,203 @@
+"""
+File inspection service - magic-byte sniffing and structure checks of uploaded documents
+"""
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from PIL import Image
+from app.models import db, Document, DocumentStatus
+from app.services.preview_service import PreviewService
+from app.services.task_queue import task_queue, TaskPriority
+
+try:
+    import magic
+except ImportError:  # libmagic not installed
+    magic = None
+
+SNIFF_BYTES = 2048
+
+# Content types accepted for each allowed extension
+EXTENSION_MIME_TYPES = {
+    'pdf': {'application/pdf'},
+    'jpg': {'image/jpeg'},
+    'jpeg': {'image/jpeg'},
+    'png': {'image/png'}
+}
+
+# Fallback signatures when libmagic is unavailable
+_SIGNATURES = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png')
+)
+
+_STARTXREF = re.compile(rb'startxref\s+(\d+)\s+%%EOF\s*$')
+
+
+def sniff_mime_type(head):
+    """Detect a content type from the first bytes of a file"""
+    if magic is not None:
+        return magic.from_buffer(head, mime=True)
+
+    for signature, mime_type in _SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    return 'application/octet-stream'
+
+
+def inspect_file(file_path, extension):
+    """
+    Check that a file's content matches its extension and is not corrupt
+
+    Top level so it can run in a worker process.
+
+    Args:
+        file_path: Path of the stored file
+        extension: Lower-case file extension from the upload
+
+    Returns:
+        tuple: (mime_type, error) - error is None if the file is valid
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(SNIFF_BYTES)
+
+    mime_type = sniff_mime_type(head)
+    if mime_type not in EXTENSION_MIME_TYPES.get(extension, ()):
+        return mime_type, f'File content ({mime_type}) does not match .{extension} extension'
+
+    try:
+        if mime_type == 'application/pdf':
+            error = _check_pdf(file_path)
+        else:
+            error = _check_image(file_path)
+    except Exception as e:
+        error = f'Corrupt file: {str(e)}'
+
+    return mime_type, error
+
+
+def _check_image(file_path):
+    with Image.open(file_path) as image:
+        image.verify()
+    # verify() skips pixel data; decoding catches truncated files
+    with Image.open(file_path) as image:
+        image.load()
+        if not image.width or not image.height:
+            return 'Image has no pixels'
+    return None
+
+
+def _check_pdf(file_path):
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        f.seek(max(0, size - 1024))
+        match = _STARTXREF.search(f.read())
+        if not match:
+            return 'PDF is truncated (no startxref/%EOF trailer)'
+
+        offset = int(match.group(1))
+        if offset >= size:
+            return 'PDF cross-reference offset is out of range'
+
+        # The offset points to a classic xref table or an xref stream object
+        f.seek(offset)
+        section = f.read(32).lstrip()
+        if not (section.startswith(b'xref') or re.match(rb'\d+\s+\d+\s+obj', section)):
+            return 'PDF cross-reference table not found'
+    return None
+
+
+class FileInspectionService:
+    """Service for validating uploaded documents before review"""
+
+    _pool = None
+    _pool_lock = threading.Lock()
+
+    @staticmethod
+    def check_document(document_id):
+        """
+        Inspect a pending document and move it to the review queue
+
+        Valid documents become READY with the sniffed content type recorded
+        and their previews are scheduled; mislabelled or corrupt ones become
+        INVALID with the reason. The inspection itself runs in a process
+        pool unless the task queue is eager.
+
+        Args:
+            document_id: ID of the uploaded document
+
+        Returns:
+            bool: True if the document is ready for review
+        """
+        document = Document.query.get(document_id)
+        if not document or document.status != DocumentStatus.PENDING:
+            return False
+
+        pool = FileInspectionService._get_pool()
+        if pool is None:
+            mime_type, error = inspect_file(document.file_path, document.file_extension)
+        else:
+            mime_type, error = pool.submit(inspect_file, document.file_path, document.file_extension).result()
+
+        document.mime_type = mime_type
+        if error:
+            document.status = DocumentStatus.INVALID
+            document.rejection_reason = error
+            current_app.logger.info(f"Document {document_id} failed inspection: {error}")
+        else:
+            document.status = DocumentStatus.READY
+        db.session.commit()
+
+        if error is None:
+            task_queue.enqueue(PreviewService.generate, document.file_path, priority=TaskPriority.LOW)
+
+        return error is None
+
+    @staticmethod
+    def inspect_pending(batch_size=500):
+        """
+        Inspect every document still awaiting inspection
+
+        Backfills documents uploaded before inspection existed and any
+        whose inspection task was lost, so they reach the review queue.
+
+        Args:
+            batch_size: Document IDs read per query
+
+        Returns:
+            dict: Number of documents made ready and found invalid
+        """
+        result = {'ready': 0, 'invalid': 0}
+        last_id = 0
+        while True:
+            document_ids = [document_id for (document_id,) in db.session.query(Document.id).filter(
+                Document.status == DocumentStatus.PENDING,
+                Document.id > last_id
+            ).order_by(Document.id).limit(batch_size)]
+            if not document_ids:
+                return result
+            last_id = document_ids[-1]
+
+            for document_id in document_ids:
+                try:
+                    ready = FileInspectionService.check_document(document_id)
+                except OSError as e:
+                    # Leave documents whose file is unreadable pending for another run
+                    db.session.rollback()
+                    current_app.logger.error(f"Document {document_id} could not be inspected: {str(e)}")
+                    continue
+                result['ready' if ready else 'invalid'] += 1
+
+    @staticmethod
+    def _get_pool():
+        app = current_app
+        workers = app.config['FILE_INSPECTION_WORKERS']
+        if workers <= 0 or app.config['TASK_QUEUE_EAGER'] or app.testing:
+            return None
+
+        with FileInspectionService._pool_lock:
+            if FileInspectionService._pool is None:
+                FileInspectionService._pool = ProcessPoolExecutor(max_workers=workers)
+            return FileInspectionService._pool
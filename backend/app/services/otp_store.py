@@ -0,0 +1,178 @@
+"""
+OTP store - pluggable persistence for one-time passwords
+"""
+import secrets
+from datetime import datetime
+from flask import current_app
+from app.models import db, OTP
+from app.services.redis_client import get_redis
+
+
+class SQLOTPStore:
+    """OTP store backed by the otps table"""
+
+    def issue(self, purpose, user_id, email=None, mobile=None):
+        """
+        Create a new OTP in the current session
+
+        The caller commits, so the OTP lands in the same transaction as
+        the rest of the request.
+
+        Returns:
+            str: Generated OTP code
+        """
+        otp = OTP.create_otp(
+            purpose=purpose,
+            validity_minutes=current_app.config['OTP_VALIDITY_MINUTES'],
+            email=email,
+            mobile=mobile,
+            user_id=user_id,
+            length=current_app.config['OTP_LENGTH']
+        )
+        db.session.add(otp)
+        return otp.code
+
+    def verify(self, user_id, purpose, code):
+        """
+        Verify the latest unused OTP for a user and purpose
+
+        Served by the (user_id, purpose, is_used, created_at) index. The
+        attempt counter is updated in the session; the caller commits.
+
+        Returns:
+            bool or None: True if valid, False if invalid or expired,
+            None if no unused OTP exists
+        """
+        otp = OTP.query.filter_by(
+            user_id=user_id,
+            purpose=purpose,
+            is_used=False
+        ).order_by(OTP.created_at.desc()).first()
+
+        if not otp:
+            return None
+
+        return otp.verify(str(code))
+
+    def purge_expired(self, batch_size=None):
+        """
+        Delete expired OTPs in batches
+
+        Args:
+            batch_size: Rows deleted per transaction (default OTP_PURGE_BATCH_SIZE)
+
+        Returns:
+            int: Number of rows deleted
+        """
+        batch_size = batch_size or current_app.config['OTP_PURGE_BATCH_SIZE']
+        cutoff = datetime.utcnow()
+        purged = 0
+
+        while True:
+            ids = [row.id for row in db.session.query(OTP.id)
+                   .filter(OTP.expires_at < cutoff)
+                   .limit(batch_size)]
+            if not ids:
+                break
+
+            OTP.query.filter(OTP.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            purged += len(ids)
+
+        return purged
+
+
+# Count an attempt and return the stored code in one atomic step, so the
+# key cannot expire between the read and the increment. The remaining TTL
+# is re-applied so the counter never outlives the code.
+_VERIFY_SCRIPT = """
+local code = redis.call('HGET', KEYS[1], 'code')
+if not code then
+    return nil
+end
+local ttl = redis.call('PTTL', KEYS[1])
+local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+if ttl > 0 then
+    redis.call('PEXPIRE', KEYS[1], ttl)
+end
+return {code, attempts}
+"""
+
+
+class RedisOTPStore:
+    """OTP store backed by Redis keys with native expiry"""
+
+    max_attempts = 3
+
+    def __init__(self):
+        self._verify_script = None
+
+    @staticmethod
+    def _key(user_id, purpose):
+        return f"otp:{user_id}:{purpose.value}"
+
+    def issue(self, purpose, user_id, email=None, mobile=None):
+        """
+        Store a new OTP, replacing any previous one for the same purpose
+
+        Returns:
+            str: Generated OTP code
+        """
+        code = OTP.generate_code(current_app.config['OTP_LENGTH'])
+        key = self._key(user_id, purpose)
+
+        pipe = get_redis().pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping={'code': code, 'attempts': 0})
+        pipe.expire(key, current_app.config['OTP_VALIDITY_MINUTES'] * 60)
+        pipe.execute()
+
+        return code
+
+    def verify(self, user_id, purpose, code):
+        """
+        Verify the OTP for a user and purpose with a single script call
+
+        Returns:
+            bool or None: True if valid, False if invalid, None if no OTP
+            exists (never issued, already used or expired)
+        """
+        client = get_redis()
+        key = self._key(user_id, purpose)
+
+        if self._verify_script is None:
+            self._verify_script = client.register_script(_VERIFY_SCRIPT)
+
+        result = self._verify_script(keys=[key], client=client)
+        if result is None:
+            return None
+
+        stored_code, attempts = result
+        if attempts > self.max_attempts:
+            client.delete(key)
+            return False
+
+        if secrets.compare_digest(stored_code, str(code)):
+            # Only the request that deletes the key may use the code
+            return client.delete(key) == 1
+
+        return False
+
+    def purge_expired(self, batch_size=None):
+        """Expired keys are evicted by Redis; nothing to purge"""
+        return 0
+
+
+_BACKENDS = {
+    'sql': SQLOTPStore,
+    'redis': RedisOTPStore
+}
+
+
+def get_otp_store():
+    """Get the OTP store configured by OTP_STORE_BACKEND"""
+    store = current_app.extensions.get('otp_store')
+    if store is None:
+        store = _BACKENDS[current_app.config['OTP_STORE_BACKEND']]()
+        current_app.extensions['otp_store'] = store
+    return store
@@ -0,0 +1,124 @@
+"""
+Preview service - downscaled JPEG previews of stored documents for reviewers
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+from flask import current_app
+from PIL import Image
+
+
+class PreviewService:
+    """Service for generating and locating document previews"""
+
+    VARIANTS = ('thumbnail', 'preview')
+
+    @staticmethod
+    def preview_path(blob_path, variant='preview'):
+        """Path of a preview variant stored next to its blob"""
+        return f"{blob_path}.{variant}.jpg"
+
+    @staticmethod
+    def generate(blob_path):
+        """
+        Generate the thumbnail and preview JPEGs for a blob
+
+        Images are downscaled with Pillow; PDFs (detected by their header)
+        are rasterised from their first page with pdftoppm when it is
+        installed and skipped otherwise. Existing previews are kept, so
+        shared blobs are rendered once.
+
+        Args:
+            blob_path: Path of the stored document content
+
+        Returns:
+            bool: True if previews exist after the call
+        """
+        sizes = {
+            'thumbnail': current_app.config['DOCUMENT_THUMBNAIL_SIZE'],
+            'preview': current_app.config['DOCUMENT_PREVIEW_SIZE']
+        }
+        missing = [v for v in PreviewService.VARIANTS
+                   if not os.path.exists(PreviewService.preview_path(blob_path, v))]
+        if not missing:
+            return True
+
+        try:
+            with PreviewService._open_first_page(blob_path) as image:
+                if image is None:
+                    return False
+
+                image = image.convert('RGB')
+                for variant in missing:
+                    rendered = image.copy()
+                    rendered.thumbnail((sizes[variant], sizes[variant]))
+                    PreviewService._save_atomic(rendered, PreviewService.preview_path(blob_path, variant))
+            return True
+
+        except Exception as e:
+            current_app.logger.warning(f"Preview generation failed for {blob_path}: {str(e)}")
+            return False
+
+    @staticmethod
+    def remove(blob_path):
+        """Delete all preview variants of a blob"""
+        for variant in PreviewService.VARIANTS:
+            path = PreviewService.preview_path(blob_path, variant)
+            if os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def _open_first_page(blob_path):
+        with open(blob_path, 'rb') as f:
+            is_pdf = f.read(5) == b'%PDF-'
+
+        if is_pdf:
+            return _PDFFirstPage(blob_path, current_app.config['DOCUMENT_PREVIEW_SIZE'])
+
+        image = Image.open(blob_path)
+        image.draft('RGB', (current_app.config['DOCUMENT_PREVIEW_SIZE'],) * 2)
+        return image
+
+    @staticmethod
+    def _save_atomic(image, path):
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                image.save(f, 'JPEG', quality=current_app.config['DOCUMENT_PREVIEW_QUALITY'], optimize=True)
+            os.replace(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+
+class _PDFFirstPage:
+    """Context manager rendering page 1 of a PDF to a Pillow image via pdftoppm"""
+
+    def __init__(self, pdf_path, size):
+        self.pdf_path = pdf_path
+        self.size = size
+        self.temp_dir = None
+        self.image = None
+
+    def __enter__(self):
+        pdftoppm = shutil.which('pdftoppm')
+        if pdftoppm is None:
+            return None
+
+        self.temp_dir = tempfile.mkdtemp()
+        output = os.path.join(self.temp_dir, 'page')
+        subprocess.run(
+            [pdftoppm, '-f', '1', '-l', '1', '-singlefile', '-jpeg',
+             '-scale-to', str(self.size), self.pdf_path, output],
+            check=True, timeout=60, capture_output=True
+        )
+        self.image = Image.open(f"{output}.jpg")
+        return self.image
+
+    def __exit__(self, *exc):
+        if self.image is not None:
+            self.image.close()
+        if self.temp_dir:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+        return False
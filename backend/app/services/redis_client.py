@@ -0,0 +1,23 @@
+"""
+Shared Redis connection for cache, queue and store backends
+"""
+from flask import current_app
+
+
+def get_redis():
+    """
+    Get the application's Redis client
+
+    The client is created lazily from REDIS_URL on first use and kept on the
+    application so every backend shares one connection pool.
+
+    Returns:
+        redis.Redis: Client returning decoded strings
+    """
+    client = current_app.extensions.get('redis')
+    if client is None:
+        import redis
+
+        client = redis.Redis.from_url(current_app.config['REDIS_URL'], decode_responses=True)
+        current_app.extensions['redis'] = client
+    return client
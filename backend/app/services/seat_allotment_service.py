@@ -3,13 +3,17 @@ Seat Allotment Service - Core algorithm for automated seat allocation
 """
 from flask import current_app
 from datetime import datetime, timedelta
-from sqlalchemy import and_
+from sqlalchemy import and_, bindparam, delete, func, insert, select, update
 from app.models import (
     db, Student, Choice, Course, Allotment, AllotmentRound,
-    AllotmentStatus
+    AllotmentStatus, RoundCutoff
 )
+from app.services.cache import get_cache
 from app.services.email_service import EmailService
+from app.services.event_bus import event_bus
+from app.services.seat_ledger_service import SeatLedgerService
 from app.services.sms_service import SMSService
+from app.services.student_dashboard_service import StudentDashboardService
 
 
 class SeatAllotmentService:
@@ -73,21 +77,31 @@ class SeatAllotmentService:
             if not allotment_round:
                 return {'error': 'Round not found'}
 
+            # Release seats nobody answered for before allotting new ones
+            SeatAllotmentService.lapse_expired()
+
             current_app.logger.info(f"Starting seat allotment for round {allotment_round.round_number}")
 
             # Get all eligible students who have submitted choices
-            eligible_students = Student.query.filter(
-                and_(
-                    Student.choices_submitted == True,
-                    Student.payment_complete == True,
-                    Student.documents_verified == True
-                )
-            ).order_by(Student.exam_rank).all()
+            eligibility = and_(
+                Student.choices_submitted == True,
+                Student.payment_complete == True,
+                Student.documents_verified == True
+            )
+            eligible_students = Student.query.filter(eligibility).order_by(Student.exam_rank).all()
+
+            # Only courses this round can allot need their ledger opened;
+            # reconcile --fix opens the rest
+            round_course_ids = [course_id for (course_id,) in db.session.query(Choice.course_id).join(
+                Student, Student.id == Choice.student_id
+            ).filter(eligibility, Choice.is_locked == True).distinct()]
+            SeatLedgerService.open_missing(round_course_ids)
 
             current_app.logger.info(f"Found {len(eligible_students)} eligible students")
 
             allotments_made = 0
             students_processed = 0
+            new_allotments = []
 
             # Process each student in rank order
             for student in eligible_students:
@@ -170,6 +184,7 @@ class SeatAllotmentService:
                     student.seat_allotted = True
 
                     db.session.add(allotment)
+                    new_allotments.append(allotment)
                     allotments_made += 1
                     seat_allotted = True
 
@@ -200,7 +215,18 @@ class SeatAllotmentService:
             allotment_round.total_allotments = allotments_made
             allotment_round.is_completed = True
 
+            db.session.flush()
+            SeatLedgerService.record([{
+                'course_id': allotment.course_id,
+                'category': allotment.allotted_category,
+                'delta': -1,
+                'cause': 'allotted',
+                'allotment_id': allotment.id
+            } for allotment in new_allotments])
+
+            SeatAllotmentService.record_cutoffs(round_id)
             db.session.commit()
+            get_cache().delete(SeatAllotmentService.cutoffs_cache_key(round_id))
 
             current_app.logger.info(
                 f"Seat allotment completed for round {allotment_round.round_number}. "
@@ -219,6 +245,59 @@ class SeatAllotmentService:
             current_app.logger.error(f"Seat allotment failed: {str(e)}")
             return {'error': str(e), 'success': False}
 
+    @staticmethod
+    def cutoffs_cache_key(round_id):
+        return f"round_cutoffs:{round_id}"
+
+    @staticmethod
+    def record_cutoffs(round_id):
+        """
+        Write a round's opening rank, closing rank and seats filled per course and category
+
+        Replaces any cutoffs already recorded for the round with one
+        INSERT ... SELECT grouped over the round's allotments. The caller
+        commits.
+
+        Args:
+            round_id: Allotment round ID
+        """
+        db.session.flush()
+        db.session.execute(delete(RoundCutoff).where(RoundCutoff.round_id == round_id))
+        db.session.execute(insert(RoundCutoff).from_select(
+            ['round_id', 'course_id', 'category', 'opening_rank', 'closing_rank', 'seats_filled'],
+            select(
+                Allotment.round_id,
+                Allotment.course_id,
+                Allotment.allotted_category,
+                func.min(Allotment.allotted_rank),
+                func.max(Allotment.allotted_rank),
+                func.count(Allotment.id)
+            ).where(Allotment.round_id == round_id)
+            .group_by(Allotment.round_id, Allotment.course_id, Allotment.allotted_category)
+        ))
+
+    @staticmethod
+    def get_round_cutoffs(round_id):
+        """
+        Get a round's cutoffs, served from cache after the first read
+
+        Args:
+            round_id: Allotment round ID
+
+        Returns:
+            list: Cutoff dicts ordered by course and category
+        """
+        cache = get_cache()
+        key = SeatAllotmentService.cutoffs_cache_key(round_id)
+
+        cutoffs = cache.get(key)
+        if cutoffs is None:
+            cutoffs = [cutoff.to_dict() for cutoff in RoundCutoff.query
+                       .filter_by(round_id=round_id)
+                       .order_by(RoundCutoff.course_id, RoundCutoff.category)]
+            cache.set(key, cutoffs, ttl=current_app.config['ROUND_CUTOFF_CACHE_TTL'])
+        return cutoffs
+
     @staticmethod
     def _check_category_seat(course, category):
         """Check if category-wise seat is available"""
@@ -248,95 +327,283 @@ class SeatAllotmentService:
         elif category == 'EWS' and course.ews_seats > 0:
             course.ews_seats -= 1
 
+    # Per-category seat counter on Course for each allotment category
+    CATEGORY_SEATS = {
+        category: getattr(Course, column) for category, column in Course.CATEGORY_SEAT_COLUMNS.items()
+    }
+
     @staticmethod
-    def accept_seat(allotment_id, freeze=True):
+    def accept_seat(allotment_id, freeze=True, idempotency_key=None):
         """
         Accept an allotted seat
 
+        The status moves out of ALLOTTED with a conditional UPDATE that also
+        requires the round's acceptance deadline not to have passed, so an
+        acceptance cannot race the lapse sweep, and the round counter is incremented in SQL, so concurrent or repeated
+        requests cannot double count. A retry carrying the idempotency key
+        of the request that already applied is reported as a replay.
+
         Args:
             allotment_id: Allotment ID
             freeze: True to freeze (no upgrade), False to accept with upgrade option
+            idempotency_key: Client key identifying this request
 
         Returns:
-            bool: True if successful
+            tuple: (success, replayed)
         """
+        status = AllotmentStatus.ACCEPTED_FROZEN if freeze else AllotmentStatus.ACCEPTED_UPGRADE
+
         try:
-            allotment = Allotment.query.get(allotment_id)
-            if not allotment:
-                return False
-
-            if allotment.status != AllotmentStatus.ALLOTTED:
-                current_app.logger.warning(f"Allotment {allotment_id} already processed")
-                return False
-
-            # Update status
-            allotment.status = (
-                AllotmentStatus.ACCEPTED_FROZEN if freeze
-                else AllotmentStatus.ACCEPTED_UPGRADE
+            allotment = SeatAllotmentService._transition(allotment_id, status, idempotency_key)
+            if allotment is None:
+                return SeatAllotmentService._replayed(allotment_id, status, idempotency_key)
+
+            db.session.execute(
+                update(AllotmentRound)
+                .where(AllotmentRound.id == allotment.round_id)
+                .values(accepted_count=func.coalesce(AllotmentRound.accepted_count, 0) + 1)
+                .execution_options(synchronize_session=False)
             )
-            allotment.acceptance_date = datetime.utcnow()
 
             # If frozen, mark admission as confirmed
             if freeze:
-                allotment.student.admission_confirmed = True
-                current_app.logger.info(f"Student {allotment.student.id} admission confirmed")
-
-            # Update round statistics
-            allotment.round.accepted_count += 1
+                db.session.execute(
+                    update(Student)
+                    .where(Student.id == allotment.student_id)
+                    .values(admission_confirmed=True)
+                    .execution_options(synchronize_session=False)
+                )
+                event_bus.defer([(allotment.student_id, 'student_status', {'admission_confirmed': True})])
+                current_app.logger.info(f"Student {allotment.student_id} admission confirmed")
 
             db.session.commit()
-            return True
+            db.session.expire_all()
+            return True, False
 
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"Seat acceptance failed: {str(e)}")
-            return False
+            return False, False
 
     @staticmethod
-    def reject_seat(allotment_id, reason=None):
+    def reject_seat(allotment_id, reason=None, idempotency_key=None):
         """
         Reject an allotted seat
 
+        Only an ALLOTTED seat can be rejected before its round's acceptance
+        deadline; the transition is a conditional UPDATE and the seat is returned to the course's total
+        and category counters with one atomic increment, so a repeated
+        request cannot restore the seat twice.
+
         Args:
             allotment_id: Allotment ID
             reason: Rejection reason
+            idempotency_key: Client key identifying this request
 
         Returns:
-            bool: True if successful
+            tuple: (success, replayed)
         """
         try:
-            allotment = Allotment.query.get(allotment_id)
-            if not allotment:
-                return False
-
-            # Update status
-            allotment.status = AllotmentStatus.REJECTED
-            allotment.rejection_reason = reason
-            allotment.acceptance_date = datetime.utcnow()
-
-            # Restore seat availability
-            course = allotment.course
-            course.available_seats += 1
-
-            # Restore category-wise seat
-            if allotment.allotted_category == 'General':
-                course.general_seats += 1
-            elif allotment.allotted_category == 'OBC':
-                course.obc_seats += 1
-            elif allotment.allotted_category == 'SC':
-                course.sc_seats += 1
-            elif allotment.allotted_category == 'ST':
-                course.st_seats += 1
-            elif allotment.allotted_category == 'EWS':
-                course.ews_seats += 1
-
-            # Update round statistics
-            allotment.round.rejected_count += 1
+            allotment = SeatAllotmentService._transition(
+                allotment_id, AllotmentStatus.REJECTED, idempotency_key, rejection_reason=reason
+            )
+            if allotment is None:
+                return SeatAllotmentService._replayed(allotment_id, AllotmentStatus.REJECTED, idempotency_key)
+
+            # Restore seat availability, including the category seat; the
+            # course's ledger was opened when the round that allotted it ran
+            category_seats = SeatAllotmentService.CATEGORY_SEATS[allotment.allotted_category]
+            db.session.execute(
+                update(Course)
+                .where(Course.id == allotment.course_id)
+                .values({
+                    Course.available_seats: Course.available_seats + 1,
+                    category_seats: category_seats + 1
+                })
+                .execution_options(synchronize_session=False)
+            )
+            SeatLedgerService.record([{
+                'course_id': allotment.course_id,
+                'category': allotment.allotted_category,
+                'delta': 1,
+                'cause': 'rejected',
+                'allotment_id': allotment_id
+            }])
+            db.session.execute(
+                update(AllotmentRound)
+                .where(AllotmentRound.id == allotment.round_id)
+                .values(rejected_count=func.coalesce(AllotmentRound.rejected_count, 0) + 1)
+                .execution_options(synchronize_session=False)
+            )
 
             db.session.commit()
-            return True
+            db.session.expire_all()
+            return True, False
 
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"Seat rejection failed: {str(e)}")
-            return False
+            return False, False
+
+    @staticmethod
+    def lapse_expired(now=None):
+        """
+        Lapse allotments left unanswered past their round's acceptance deadline
+
+        Each round is swept in one transaction: its unanswered allotments
+        are locked and moved to LAPSED with one UPDATE, their seats go back
+        to the course counters with one grouped UPDATE per course, and the
+        round's lapsed_count is incremented.
+
+        Args:
+            now: Sweep time (default now)
+
+        Returns:
+            dict: Number of rounds swept and allotments lapsed
+        """
+        now = now or datetime.utcnow()
+        round_ids = [round_id for (round_id,) in db.session.query(Allotment.round_id).join(AllotmentRound).filter(
+            Allotment.status == AllotmentStatus.ALLOTTED,
+            AllotmentRound.acceptance_deadline < now
+        ).distinct()]
+
+        lapsed = 0
+        for round_id in round_ids:
+            lapsed += SeatAllotmentService._lapse_round(round_id, now)
+
+        if lapsed:
+            current_app.logger.info(f"Lapsed {lapsed} unanswered allotments in {len(round_ids)} rounds")
+        return {'rounds': len(round_ids), 'lapsed': lapsed}
+
+    @staticmethod
+    def _lapse_round(round_id, now):
+        """Lapse one round's unanswered allotments and release their seats"""
+        try:
+            rows = db.session.query(
+                Allotment.id, Allotment.student_id, Allotment.course_id, Allotment.allotted_category
+            ).filter(
+                Allotment.round_id == round_id,
+                Allotment.status == AllotmentStatus.ALLOTTED
+            ).with_for_update().all()
+            if not rows:
+                db.session.rollback()
+                return 0
+
+            db.session.execute(
+                update(Allotment)
+                .where(Allotment.id.in_([row.id for row in rows]), Allotment.status == AllotmentStatus.ALLOTTED)
+                .values(status=AllotmentStatus.LAPSED, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+
+            # Seats released per course, total and by category
+            released = {}
+            for row in rows:
+                seats = released.setdefault(row.course_id, dict.fromkeys(SeatAllotmentService.CATEGORY_SEATS, 0))
+                seats[row.allotted_category] += 1
+
+            params = [{
+                'b_course_id': course_id,
+                'b_total': sum(seats.values()),
+                **{f'b_{category}': count for category, count in seats.items()}
+            } for course_id, seats in released.items()]
+            SeatLedgerService.open_missing(list(released))
+            courses = Course.__table__
+            category_columns = {category: courses.c[attribute.key]
+                                for category, attribute in SeatAllotmentService.CATEGORY_SEATS.items()}
+            db.session.connection().execute(
+                update(courses)
+                .where(courses.c.id == bindparam('b_course_id'))
+                .values({
+                    courses.c.available_seats: courses.c.available_seats + bindparam('b_total'),
+                    **{column: column + bindparam(f'b_{category}') for category, column in category_columns.items()}
+                }),
+                params
+            )
+            SeatLedgerService.record([{
+                'course_id': row.course_id,
+                'category': row.allotted_category,
+                'delta': 1,
+                'cause': 'lapsed',
+                'allotment_id': row.id
+            } for row in rows])
+
+            db.session.execute(
+                update(AllotmentRound)
+                .where(AllotmentRound.id == round_id)
+                .values(lapsed_count=func.coalesce(AllotmentRound.lapsed_count, 0) + len(rows))
+                .execution_options(synchronize_session=False)
+            )
+
+            StudentDashboardService.mark_changed(row.student_id for row in rows)
+            event_bus.defer((row.student_id, 'allotment', {
+                'allotment_id': row.id,
+                'round_id': round_id,
+                'course_id': row.course_id,
+                'status': AllotmentStatus.LAPSED.value
+            }) for row in rows)
+
+            db.session.commit()
+            db.session.expire_all()
+            return len(rows)
+
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Lapsing round {round_id} failed: {str(e)}")
+            raise
+
+    @staticmethod
+    def _transition(allotment_id, status, idempotency_key, **values):
+        """
+        Move an allotment out of ALLOTTED with a conditional UPDATE
+
+        The UPDATE only matches while the round's acceptance deadline has
+        not passed; later the allotment belongs to the lapse sweep.
+
+        Returns:
+            Row or None: The allotment's student, course, round and category
+            if this call made the transition, None otherwise
+        """
+        now = datetime.utcnow()
+        open_rounds = select(AllotmentRound.id).where(AllotmentRound.acceptance_deadline >= now)
+        changed = db.session.execute(
+            update(Allotment)
+            .where(
+                Allotment.id == allotment_id,
+                Allotment.status == AllotmentStatus.ALLOTTED,
+                Allotment.round_id.in_(open_rounds)
+            )
+            .values(status=status, acceptance_date=now,
+                    idempotency_key=idempotency_key, **values)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not changed:
+            return None
+
+        allotment = db.session.query(
+            Allotment.student_id, Allotment.course_id, Allotment.round_id, Allotment.allotted_category
+        ).filter(Allotment.id == allotment_id).one()
+
+        StudentDashboardService.mark_changed([allotment.student_id])
+        event_bus.defer([(allotment.student_id, 'allotment', {
+            'allotment_id': allotment_id,
+            'round_id': allotment.round_id,
+            'course_id': allotment.course_id,
+            'status': status.value
+        })])
+        return allotment
+
+    @staticmethod
+    def _replayed(allotment_id, status, idempotency_key):
+        """Whether a request that made no change repeats the one that already did"""
+        db.session.rollback()
+        if not idempotency_key:
+            current_app.logger.warning(f"Allotment {allotment_id} already processed")
+            return False, False
+
+        replayed = db.session.query(Allotment.id).filter(
+            Allotment.id == allotment_id,
+            Allotment.status == status,
+            Allotment.idempotency_key == idempotency_key
+        ).first() is not None
+        return replayed, replayed
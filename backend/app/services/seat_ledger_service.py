@@ -0,0 +1,143 @@
+"""
+Seat ledger service - append-only seat history and counter reconciliation
+"""
+from datetime import datetime
+from sqlalchemy import bindparam, case, func, insert, select, update
+from app.models import db, Course, SeatLedgerEntry
+
+SEAT_COUNTERS = ('available_seats',) + tuple(Course.CATEGORY_SEAT_COLUMNS.values())
+
+
+class SeatLedgerService:
+    """Service for the seat ledger"""
+
+    @staticmethod
+    def record(entries):
+        """
+        Append ledger entries with one bulk insert
+
+        The caller commits, so entries land in the same transaction as the
+        counter changes they describe.
+
+        Args:
+            entries: Dicts with course_id, category, delta, cause and allotment_id
+        """
+        if entries:
+            now = datetime.utcnow()
+            db.session.execute(insert(SeatLedgerEntry), [{**entry, 'created_at': now} for entry in entries])
+
+    @staticmethod
+    def open_missing(course_ids=None):
+        """
+        Write opening balances for courses whose ledger has not started
+
+        Must run before a course's counters change in the transaction, so
+        the opening balance is the state the first movement starts from.
+        The course rows are locked first and the ledger is checked with a
+        locking read, so concurrent first movements on a course open it
+        once. The caller commits.
+
+        Args:
+            course_ids: Courses to check (default all)
+
+        Returns:
+            int: Number of courses opened
+        """
+        locked = db.session.query(Course.id)
+        if course_ids is not None:
+            locked = locked.filter(Course.id.in_(course_ids))
+        locked_ids = [course_id for (course_id,) in locked.order_by(Course.id).with_for_update()]
+        if not locked_ids:
+            return 0
+
+        # A locking read sees openings committed while this transaction waited
+        opened = {course_id for (course_id,) in db.session.query(SeatLedgerEntry.course_id).filter(
+            SeatLedgerEntry.course_id.in_(locked_ids),
+            SeatLedgerEntry.cause == 'opening'
+        ).with_for_update()}
+
+        missing = [course_id for course_id in locked_ids if course_id not in opened]
+        courses = db.session.query(Course.id, *[getattr(Course, counter) for counter in SEAT_COUNTERS])\
+            .filter(Course.id.in_(missing)).all() if missing else []
+
+        SeatLedgerService.record([{
+            'course_id': course.id,
+            'category': category,
+            'delta': getattr(course, counter),
+            'cause': 'opening',
+            'allotment_id': None
+        } for course in courses for category, counter in
+            [(None, 'available_seats')] + list(Course.CATEGORY_SEAT_COLUMNS.items())])
+
+        return len(courses)
+
+    @staticmethod
+    def balances():
+        """
+        Seat counters implied by the ledger, from one grouped aggregation
+
+        Returns:
+            dict: {course_id: {counter: seats}} for every course with a ledger
+        """
+        rows = db.session.query(
+            SeatLedgerEntry.course_id,
+            SeatLedgerEntry.category,
+            func.sum(SeatLedgerEntry.delta),
+            func.sum(case((SeatLedgerEntry.cause == 'opening', SeatLedgerEntry.delta), else_=0))
+        ).group_by(SeatLedgerEntry.course_id, SeatLedgerEntry.category)
+
+        balances = {}
+        for course_id, category, total, opening in rows:
+            balance = balances.setdefault(course_id, dict.fromkeys(SEAT_COUNTERS, 0))
+            if category is None:
+                balance['available_seats'] += total
+            else:
+                # Movements also change the total; category openings do not
+                balance[Course.CATEGORY_SEAT_COLUMNS[category]] += total
+                balance['available_seats'] += total - opening
+        return balances
+
+    @staticmethod
+    def reconcile(fix=False):
+        """
+        Compare course seat counters with the ledger
+
+        Courses without a ledger are skipped; with fix they are opened at
+        their current counters. Without fix nothing is written.
+
+        Args:
+            fix: Open missing ledgers and reset drifted counters to the
+                ledger's values
+
+        Returns:
+            list: Drift dicts with course_id, counter, actual and expected
+        """
+        if fix:
+            SeatLedgerService.open_missing()
+            db.session.commit()
+
+        balances = SeatLedgerService.balances()
+        drift = []
+        for course in db.session.query(Course.id, *[getattr(Course, counter) for counter in SEAT_COUNTERS]):
+            expected = balances.get(course.id)
+            if expected is None:
+                continue
+            drift.extend({
+                'course_id': course.id,
+                'counter': counter,
+                'actual': getattr(course, counter),
+                'expected': expected[counter]
+            } for counter in SEAT_COUNTERS if getattr(course, counter) != expected[counter])
+
+        if fix and drift:
+            courses = Course.__table__
+            db.session.connection().execute(
+                update(courses)
+                .where(courses.c.id == bindparam('b_course_id'))
+                .values({courses.c[counter]: bindparam(f'b_{counter}') for counter in SEAT_COUNTERS}),
+                [{'b_course_id': course_id, **{f'b_{counter}': seats for counter, seats in balances[course_id].items()}}
+                 for course_id in {entry['course_id'] for entry in drift}]
+            )
+            db.session.commit()
+
+        return drift
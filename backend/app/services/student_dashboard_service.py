@@ -0,0 +1,146 @@
+"""
+Student dashboard service - consolidated statistics with per-student caching
+"""
+import itertools
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from app.models import (
+    db, User, UserRole, Student, Document, DocumentStatus, Choice,
+    Payment, PaymentStatus, Allotment
+)
+from app.services.cache import get_cache
+from app.services.choice_draft_store import get_draft_store
+
+
+def _count(model, *criteria):
+    """Correlated count of a student's child rows"""
+    return select(func.count(model.id))\
+        .where(model.student_id == Student.id, *criteria)\
+        .correlate(Student)\
+        .scalar_subquery()
+
+
+class StudentDashboardService:
+    """Service for the student dashboard"""
+
+    @staticmethod
+    def cache_key(student_id):
+        return f"dashboard:{student_id}"
+
+    @staticmethod
+    def get_dashboard(user_id):
+        """
+        Get dashboard data for a student user
+
+        Served from cache when possible; otherwise the student row and all
+        statistics are loaded in a single query and cached until the
+        student or one of their documents, choices, payments or allotments
+        changes. Until choices are submitted, choices_filled is the size of
+        the student's draft, read fresh on every call.
+
+        Args:
+            user_id: Student's user ID
+
+        Returns:
+            dict: Dashboard data, or None if the user has no student profile
+        """
+        cache = get_cache()
+        student_key = f"dashboard_student:{user_id}"
+
+        student_id = cache.get(student_key)
+        if student_id is not None:
+            dashboard = cache.get(StudentDashboardService.cache_key(student_id))
+            if dashboard is not None:
+                return StudentDashboardService._with_draft(dashboard, student_id)
+
+        row = db.session.query(
+            Student,
+            _count(Document).label('documents_uploaded'),
+            _count(Document, Document.status == DocumentStatus.VERIFIED).label('documents_verified'),
+            _count(Choice).label('choices_filled'),
+            _count(Payment, Payment.status == PaymentStatus.SUCCESS).label('payments_made'),
+            _count(Allotment).label('allotments')
+        ).join(User, User.id == Student.user_id)\
+            .filter(User.id == user_id, User.role == UserRole.STUDENT)\
+            .first()
+
+        if not row:
+            return None
+
+        student = row.Student
+        dashboard = {
+            'student': student.to_dict(),
+            'statistics': {
+                'documents_uploaded': row.documents_uploaded,
+                'documents_verified': row.documents_verified,
+                'choices_filled': row.choices_filled,
+                'payments_made': row.payments_made,
+                'allotments': row.allotments
+            },
+            'status': {
+                'registration_complete': student.registration_complete,
+                'documents_verified': student.documents_verified,
+                'payment_complete': student.payment_complete,
+                'choices_submitted': student.choices_submitted,
+                'seat_allotted': student.seat_allotted,
+                'admission_confirmed': student.admission_confirmed
+            }
+        }
+
+        ttl = current_app.config['DASHBOARD_CACHE_TTL']
+        cache.set(student_key, student.id, ttl=ttl)
+        cache.set(StudentDashboardService.cache_key(student.id), dashboard, ttl=ttl)
+        return StudentDashboardService._with_draft(dashboard, student.id)
+
+    @staticmethod
+    def _with_draft(dashboard, student_id):
+        """Count draft choices for students who have not submitted yet"""
+        if dashboard['status']['choices_submitted']:
+            return dashboard
+
+        return {**dashboard, 'statistics': {
+            **dashboard['statistics'],
+            'choices_filled': get_draft_store().count(student_id)
+        }}
+
+    @staticmethod
+    def mark_changed(student_ids):
+        """
+        Invalidate students' dashboards when the current transaction commits
+
+        For set-based writes, which bypass the flush hook that notices
+        changed rows.
+        """
+        db.session.info.setdefault('changed_students', set()).update(student_ids)
+
+    @staticmethod
+    def invalidate(*student_ids):
+        """Drop cached dashboards for students"""
+        get_cache().delete(*[StudentDashboardService.cache_key(student_id) for student_id in student_ids])
+
+
+_CHILD_MODELS = (Document, Choice, Payment, Allotment)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_students(session, flush_context):
+    """Remember which students had rows written in this transaction"""
+    changed = session.info.setdefault('changed_students', set())
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Student):
+            changed.add(obj.id)
+        elif isinstance(obj, _CHILD_MODELS):
+            changed.add(obj.student_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_students(session):
+    changed = session.info.pop('changed_students', None)
+    if changed and has_app_context():
+        StudentDashboardService.invalidate(*changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_students(session):
+    session.info.pop('changed_students', None)
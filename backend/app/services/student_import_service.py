@@ -0,0 +1,263 @@
+"""
+Student import service - bulk registration from board-supplied rank lists
+"""
+import csv
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import bcrypt as bcrypt_lib
+from flask import current_app
+from app.models import db, User, Student, UserRole, AuditLog
+from app.services.cache import get_cache
+from app.utils.validators import (
+    validate_email, validate_mobile, validate_password, validate_date, validate_rank
+)
+
+REQUIRED_FIELDS = [
+    'email', 'mobile', 'password', 'first_name', 'last_name', 'date_of_birth',
+    'gender', 'exam_type', 'exam_rank', 'exam_roll_number', 'category'
+]
+
+GENDERS = {'Male', 'Female', 'Other'}
+EXAM_TYPES = {'KCET', 'COMEDK', 'Other'}
+CATEGORIES = {'General', 'OBC', 'SC', 'ST', 'EWS'}
+
+MAX_REPORTED_ERRORS = 1000
+
+
+def _hash_password(args):
+    """Hash a password with bcrypt (runs in a worker process)"""
+    password, rounds, prefix = args
+    return bcrypt_lib.hashpw(password.encode('utf-8'), bcrypt_lib.gensalt(rounds=rounds, prefix=prefix)).decode('utf-8')
+
+
+class StudentImportService:
+    """Service for bulk student registration"""
+
+    @staticmethod
+    def validate_row(row):
+        """
+        Validate one CSV row with the registration rules
+
+        Returns:
+            str: Error message, or None if the row is valid
+        """
+        for field in REQUIRED_FIELDS:
+            if not row.get(field):
+                return f'Missing required field: {field}'
+
+        if not validate_email(row['email']):
+            return 'Invalid email format'
+        if not validate_mobile(row['mobile']):
+            return 'Invalid mobile number'
+
+        is_valid, message = validate_password(row['password'])
+        if not is_valid:
+            return message
+
+        if not validate_date(row['date_of_birth']):
+            return 'Invalid date of birth'
+        if not validate_rank(row['exam_rank']):
+            return 'Invalid exam rank'
+        if row['gender'] not in GENDERS:
+            return 'Invalid gender'
+        if row['exam_type'] not in EXAM_TYPES:
+            return 'Invalid exam type'
+        if row['category'] not in CATEGORIES:
+            return 'Invalid category'
+
+        return None
+
+    @staticmethod
+    def import_csv(stream, mark_verified=False, chunk_size=None, workers=None):
+        """
+        Import students from a CSV stream
+
+        Rows are validated and deduplicated against existing emails, mobiles
+        and roll numbers (fetched once) and against earlier rows in the file.
+        Valid rows are inserted in chunks with bulk_insert_mappings, one
+        commit per chunk; passwords are hashed in a process pool. Pool
+        processes are spawned rather than forked, so running inside a
+        threaded server or the task queue does not copy its threads' state.
+
+        Args:
+            stream: Binary or text file object with a header row
+            mark_verified: Mark imported accounts as email/mobile verified
+            chunk_size: Rows per insert batch (default STUDENT_IMPORT_CHUNK_SIZE)
+            workers: Hashing processes (default STUDENT_IMPORT_WORKERS)
+
+        Returns:
+            dict: Imported and skipped counts with per-line errors
+        """
+        chunk_size = chunk_size or current_app.config['STUDENT_IMPORT_CHUNK_SIZE']
+        workers = workers or current_app.config['STUDENT_IMPORT_WORKERS']
+
+        if not isinstance(stream, io.TextIOBase):
+            stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+        # One pre-fetch of every existing unique key
+        emails, mobiles, roll_numbers = set(), set(), set()
+        for email, mobile, roll_number in db.session.query(
+                User.email, User.mobile, Student.exam_roll_number).outerjoin(Student):
+            emails.add(email)
+            mobiles.add(mobile)
+            if roll_number:
+                roll_numbers.add(roll_number)
+
+        result = {'imported': 0, 'skipped': 0, 'errors': []}
+
+        def skip(line, error):
+            result['skipped'] += 1
+            if len(result['errors']) < MAX_REPORTED_ERRORS:
+                result['errors'].append({'line': line, 'error': error})
+
+        pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+        ) if workers > 1 else None
+        try:
+            chunk = []
+            # Line 1 is the header
+            for line, row in enumerate(csv.DictReader(stream), start=2):
+                row = {key.strip(): (value or '').strip() for key, value in row.items() if key}
+
+                error = StudentImportService.validate_row(row)
+                if error:
+                    skip(line, error)
+                    continue
+
+                email = row['email'].lower()
+                if email in emails:
+                    skip(line, 'Email already registered')
+                    continue
+                if row['mobile'] in mobiles:
+                    skip(line, 'Mobile number already registered')
+                    continue
+                if row['exam_roll_number'] in roll_numbers:
+                    skip(line, 'Exam roll number already registered')
+                    continue
+
+                emails.add(email)
+                mobiles.add(row['mobile'])
+                roll_numbers.add(row['exam_roll_number'])
+                row['email'] = email
+                chunk.append(row)
+
+                if len(chunk) >= chunk_size:
+                    result['imported'] += StudentImportService._insert_chunk(chunk, mark_verified, pool)
+                    chunk = []
+
+            if chunk:
+                result['imported'] += StudentImportService._insert_chunk(chunk, mark_verified, pool)
+        finally:
+            if pool:
+                pool.shutdown()
+
+        current_app.logger.info(
+            f"Student import finished. Imported: {result['imported']}, Skipped: {result['skipped']}"
+        )
+        return result
+
+    @staticmethod
+    def _insert_chunk(rows, mark_verified, pool):
+        """Hash passwords and bulk insert users and students for one chunk"""
+        rounds = current_app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        prefix = current_app.config.get('BCRYPT_HASH_PREFIX', '2b').encode('utf-8')
+        hash_args = [(row['password'], rounds, prefix) for row in rows]
+
+        if pool:
+            hashes = list(pool.map(_hash_password, hash_args, chunksize=max(1, len(rows) // 32)))
+        else:
+            hashes = [_hash_password(args) for args in hash_args]
+
+        db.session.bulk_insert_mappings(User, [
+            {
+                'email': row['email'],
+                'mobile': row['mobile'],
+                'password_hash': password_hash,
+                'role': UserRole.STUDENT,
+                'is_verified': mark_verified,
+                'email_verified': mark_verified,
+                'mobile_verified': mark_verified
+            }
+            for row, password_hash in zip(rows, hashes)
+        ])
+
+        user_ids = dict(db.session.query(User.email, User.id)
+                        .filter(User.email.in_([row['email'] for row in rows])))
+
+        db.session.bulk_insert_mappings(Student, [
+            {
+                'user_id': user_ids[row['email']],
+                'first_name': row['first_name'],
+                'last_name': row['last_name'],
+                'middle_name': row.get('middle_name') or None,
+                'date_of_birth': datetime.strptime(row['date_of_birth'], '%Y-%m-%d').date(),
+                'gender': row['gender'],
+                'exam_type': row['exam_type'],
+                'exam_rank': int(row['exam_rank']),
+                'exam_roll_number': row['exam_roll_number'],
+                'category': row['category'],
+                'domicile_state': row.get('domicile_state') or 'Karnataka',
+                'is_pwd': row.get('is_pwd', '').lower() in ('1', 'true', 'yes')
+            }
+            for row in rows
+        ])
+
+        db.session.commit()
+        return len(rows)
+
+    @staticmethod
+    def job_key(job_id):
+        return f"student_import:{job_id}"
+
+    @staticmethod
+    def get_job(job_id):
+        """
+        Get a background import's state
+
+        Returns:
+            dict or None: status ('queued', 'running', 'completed' or
+            'failed') with the result or error, None if unknown or expired
+        """
+        return get_cache().get(StudentImportService.job_key(job_id))
+
+    @staticmethod
+    def set_job(job_id, status, **details):
+        """Record a background import's state for STUDENT_IMPORT_JOB_TTL"""
+        get_cache().set(
+            StudentImportService.job_key(job_id),
+            {'job_id': job_id, 'status': status, **details},
+            current_app.config['STUDENT_IMPORT_JOB_TTL']
+        )
+
+    @staticmethod
+    def run_job(job_id, csv_path, mark_verified, user_id):
+        """
+        Import a saved CSV as a task queue job and record the outcome
+
+        The CSV is deleted when the job finishes.
+        """
+        StudentImportService.set_job(job_id, 'running')
+        try:
+            with open(csv_path, 'rb') as csv_file:
+                result = StudentImportService.import_csv(csv_file, mark_verified=mark_verified)
+
+            AuditLog.log_action(
+                user_id=user_id,
+                action='students_imported',
+                entity_type='Student',
+                description=f"Imported {result['imported']} students, skipped {result['skipped']}"
+            )
+            db.session.commit()
+            StudentImportService.set_job(job_id, 'completed', result=result)
+
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Student import {job_id} failed: {str(e)}")
+            StudentImportService.set_job(job_id, 'failed', error=str(e))
+
+        finally:
+            if os.path.exists(csv_path):
+                os.remove(csv_path)
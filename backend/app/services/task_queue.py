@@ -0,0 +1,168 @@
+"""
+Task queue - in-process background execution of slow side effects
+"""
+import atexit
+import functools
+import itertools
+import queue
+import threading
+import time
+from flask import has_app_context
+from app.models import db
+from app.services.redis_client import get_redis
+
+
+class TaskPriority:
+    """Task priority levels (lower runs first)"""
+    HIGH = 0
+    NORMAL = 5
+    LOW = 9
+
+
+class TaskQueue:
+    """Priority queue drained by worker threads inside the application context"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._dedup = {}
+        atexit.register(self.shutdown)
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Bind the queue to an application"""
+        self.app = app
+        self._dedup = {}
+        app.extensions['task_queue'] = self
+
+    def enqueue(self, func, *args, priority=TaskPriority.NORMAL, **kwargs):
+        """
+        Schedule func(*args, **kwargs) to run in the background
+
+        Runs inline when TASK_QUEUE_EAGER is set or the app is testing.
+
+        Args:
+            func: Callable to run
+            priority: TaskPriority level
+        """
+        if self.app.config['TASK_QUEUE_EAGER'] or self.app.testing:
+            self._run_eager(func, args, kwargs)
+            return
+
+        self._start_workers()
+        self._queue.put((priority, next(self._counter), func, args, kwargs))
+
+    def enqueue_once(self, dedup_key, window_seconds, func, *args, priority=TaskPriority.NORMAL,
+                     hold_until_done=False, **kwargs):
+        """
+        Schedule a task unless the same dedup_key was scheduled within the window
+
+        With hold_until_done the key is released when the task finishes, so
+        the window only bounds how long a task lost with its process blocks
+        the key.
+
+        Returns:
+            bool: True if the task was enqueued, False if deduplicated
+        """
+        if not self.claim(dedup_key, window_seconds):
+            return False
+
+        if hold_until_done:
+            task = func
+
+            @functools.wraps(task)
+            def func(*args, **kwargs):
+                try:
+                    return task(*args, **kwargs)
+                finally:
+                    self.release(dedup_key)
+
+        self.enqueue(func, *args, priority=priority, **kwargs)
+        return True
+
+    def claim(self, dedup_key, window_seconds):
+        """
+        Claim a dedup key for window_seconds
+
+        Uses Redis SET NX when TASK_DEDUP_BACKEND is 'redis' so the window
+        holds across worker processes, otherwise an in-process map.
+
+        Returns:
+            bool: True if the key was free and is now claimed
+        """
+        if self.app.config['TASK_DEDUP_BACKEND'] == 'redis':
+            return bool(get_redis().set(f"dedup:{dedup_key}", 1, nx=True, ex=window_seconds))
+
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._dedup.get(dedup_key)
+            if expires_at and expires_at > now:
+                return False
+
+            self._dedup = {key: exp for key, exp in self._dedup.items() if exp > now}
+            self._dedup[dedup_key] = now + window_seconds
+            return True
+
+    def release(self, dedup_key):
+        """Free a dedup key before its window ends"""
+        if self.app.config['TASK_DEDUP_BACKEND'] == 'redis':
+            get_redis().delete(f"dedup:{dedup_key}")
+            return
+
+        with self._lock:
+            self._dedup.pop(dedup_key, None)
+
+    def shutdown(self, timeout=10):
+        """Wait for queued tasks to finish, up to timeout seconds"""
+        deadline = time.monotonic() + timeout
+        while self._workers and self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def _start_workers(self):
+        if self._workers:
+            return
+
+        with self._lock:
+            if self._workers:
+                return
+
+            for index in range(self.app.config['TASK_QUEUE_WORKERS']):
+                worker = threading.Thread(target=self._work, name=f'task-queue-{index}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _work(self):
+        while True:
+            _, _, func, args, kwargs = self._queue.get()
+            try:
+                self._run(func, args, kwargs)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, func, args, kwargs):
+        with self.app.app_context():
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error(f"Background task {func.__name__} failed: {str(e)}")
+            finally:
+                db.session.remove()
+
+    def _run_eager(self, func, args, kwargs):
+        if not has_app_context():
+            self._run(func, args, kwargs)
+            return
+
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            self.app.logger.error(f"Background task {func.__name__} failed: {str(e)}")
+
+
+task_queue = TaskQueue()
@@ -0,0 +1,150 @@
+"""
+Upload service - streaming multipart uploads with bounded memory
+"""
+import hashlib
+import os
+import tempfile
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+from werkzeug.sansio.multipart import MultipartDecoder, Field, File, Data, Epilogue, NeedData
+
+# Limit for ordinary (non-file) form fields
+MAX_FIELD_SIZE = 64 * 1024
+
+
+class StreamedUpload:
+    """A file part written to a temporary file while it was received"""
+
+    def __init__(self, filename, content_type, temp_path):
+        self.filename = filename or ''
+        self.content_type = content_type
+        self.temp_path = temp_path
+        self.size = 0
+        self.sha256 = None
+
+    @property
+    def stored(self):
+        """Whether the content was written to disk"""
+        return self.temp_path is not None
+
+    def save(self, file_path):
+        """Atomically move the received file into place"""
+        os.replace(self.temp_path, file_path)
+        self.temp_path = None
+
+    def discard(self):
+        """Delete the temporary file if it was not saved"""
+        if self.temp_path and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+        self.temp_path = None
+
+
+class UploadService:
+    """Service for receiving file uploads"""
+
+    @staticmethod
+    def receive(request, dest_dir, max_size, chunk_size=8192, file_field='file',
+                hash_field='sha256', skip_write=None):
+        """
+        Stream a multipart/form-data request body to disk
+
+        The body is read in chunk_size pieces; the file part is written to a
+        temporary file in dest_dir while its size and SHA-256 are computed,
+        and reading stops as soon as it exceeds max_size.
+
+        If the client sends its SHA-256 in hash_field before the file part
+        and skip_write(claimed_hash) returns True, the file is only hashed,
+        not written, and the claimed hash must match.
+
+        Args:
+            request: Flask request
+            dest_dir: Directory for the temporary file (same filesystem as
+                the final location so save() is an atomic rename)
+            max_size: Maximum file size in bytes
+            chunk_size: Bytes read from the request stream at a time
+            file_field: Name of the file part
+            hash_field: Name of the optional client-supplied SHA-256 field
+            skip_write: Callable deciding whether known content can skip disk
+
+        Returns:
+            tuple: (form fields dict, StreamedUpload or None)
+
+        Raises:
+            BadRequest: If the body is not valid multipart/form-data
+            RequestEntityTooLarge: If the file exceeds max_size
+        """
+        boundary = request.mimetype_params.get('boundary')
+        if request.mimetype != 'multipart/form-data' or not boundary:
+            raise BadRequest('Expected a multipart/form-data upload')
+
+        decoder = MultipartDecoder(boundary.encode('latin-1'), max_form_memory_size=MAX_FIELD_SIZE)
+        fields = {}
+        upload = None
+        output = None
+        hasher = None
+        receiving = False
+        claimed_hash = None
+        current = None
+        field_data = []
+
+        os.makedirs(dest_dir, exist_ok=True)
+
+        try:
+            stream = request.stream
+            while True:
+                chunk = stream.read(chunk_size)
+                decoder.receive_data(chunk or None)
+
+                event = decoder.next_event()
+                while not isinstance(event, (Epilogue, NeedData)):
+                    if isinstance(event, Field):
+                        current = event
+                        field_data = []
+                    elif isinstance(event, File):
+                        current = event
+                        if event.name == file_field and upload is None:
+                            receiving = True
+                            hasher = hashlib.sha256()
+                            claimed_hash = (fields.get(hash_field) or '').lower() or None
+                            temp_path = None
+                            if not (claimed_hash and skip_write and skip_write(claimed_hash)):
+                                fd, temp_path = tempfile.mkstemp(dir=dest_dir, prefix='.upload_', suffix='.part')
+                                output = os.fdopen(fd, 'wb')
+                            upload = StreamedUpload(event.filename, event.headers.get('content-type'), temp_path)
+                    elif isinstance(event, Data):
+                        if isinstance(current, Field):
+                            field_data.append(event.data)
+                            if sum(len(part) for part in field_data) > MAX_FIELD_SIZE:
+                                raise RequestEntityTooLarge()
+                            if not event.more_data:
+                                fields[current.name] = b''.join(field_data).decode('utf-8', 'replace')
+                        elif receiving and current.name == file_field:
+                            upload.size += len(event.data)
+                            if upload.size > max_size:
+                                raise RequestEntityTooLarge()
+                            hasher.update(event.data)
+                            if output is not None:
+                                output.write(event.data)
+                            if not event.more_data:
+                                receiving = False
+                                upload.sha256 = hasher.hexdigest()
+                                if output is not None:
+                                    output.close()
+                                    output = None
+                                elif upload.sha256 != claimed_hash:
+                                    raise BadRequest('Content hash mismatch')
+                    event = decoder.next_event()
+
+                if isinstance(event, Epilogue) or not chunk:
+                    break
+
+            if receiving:
+                raise BadRequest('Incomplete upload')
+
+        except Exception:
+            if output is not None:
+                output.close()
+            if upload:
+                upload.discard()
+            raise
+
+        return fields, upload
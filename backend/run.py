@@ -2,6 +2,7 @@
 Application entry point
 """
 import os
+import click
 from app import create_app, db
 from app.models import User, Student, Document, College, Course
 
@@ -30,6 +31,146 @@ def init_db():
     print("Database initialized successfully!")
 
 
+@app.cli.command()
+def purge_otps():
+    """Delete expired OTPs in batches"""
+    from app.services.otp_store import get_otp_store
+
+    purged = get_otp_store().purge_expired()
+    print(f"Purged {purged} expired OTPs")
+
+
+@app.cli.command()
+def gc_blobs():
+    """Delete stored document blobs no document references"""
+    from app.services.blob_store import BlobStore
+
+    removed = BlobStore.collect_garbage()
+    print(f"Removed {removed} unreferenced blobs")
+
+
+@app.cli.command()
+def rotate_audit():
+    """Move audit entries into monthly partitions"""
+    from app.services.audit_partition_service import AuditPartitionService
+
+    months = AuditPartitionService.rotate()
+    print(f"Prepared audit partitions: {', '.join(months) or 'none'}")
+
+
+@app.cli.command()
+@click.option('--keep-months', type=int, default=None, help='Months of audit history kept in the database')
+def archive_audit(keep_months):
+    """Export cold audit partitions to compressed NDJSON and drop them"""
+    from app.services.audit_partition_service import AuditPartitionService
+
+    months = AuditPartitionService.archive(keep_months=keep_months)
+    print(f"Archived audit partitions: {', '.join(months) or 'none'}")
+
+
+@app.cli.command()
+@click.option('--force', is_flag=True, help='Lock even if the choice filling deadline has not passed')
+def lock_choices(force):
+    """Lock every unsubmitted choice list at the choice filling deadline"""
+    from app.services.choice_service import ChoiceService
+    from app.services.choice_draft_store import get_draft_store
+
+    # A per-process draft store is empty here, so its drafts would be skipped
+    if not get_draft_store().shared:
+        raise click.ClickException(
+            "Drafts are held in the web process; set CHOICE_DRAFT_BACKEND=redis "
+            "or lock from the admin endpoint"
+        )
+
+    if not force and not ChoiceService.deadline_passed():
+        print("Choice filling deadline has not passed; use --force to lock anyway")
+        return
+
+    result = ChoiceService.lock_outstanding()
+    print(f"Locked {result['choices']} choices for {result['students']} students")
+
+
+@app.cli.command()
+def inspect_documents():
+    """Inspect documents still pending, such as uploads from before inspection"""
+    from app.services.file_inspection_service import FileInspectionService
+
+    result = FileInspectionService.inspect_pending()
+    print(f"Inspected documents: {result['ready']} ready for review, {result['invalid']} invalid")
+
+
+@app.cli.command()
+def lapse_allotments():
+    """Release seats of allotments unanswered past their acceptance deadline"""
+    from app.services.seat_allotment_service import SeatAllotmentService
+
+    result = SeatAllotmentService.lapse_expired()
+    print(f"Lapsed {result['lapsed']} allotments in {result['rounds']} rounds")
+
+
+@app.cli.command()
+@click.option('--fix', is_flag=True, help='Reset drifted counters to the ledger balances')
+def reconcile_seats(fix):
+    """Compare course seat counters with the seat ledger"""
+    from app.services.seat_ledger_service import SeatLedgerService
+
+    drift = SeatLedgerService.reconcile(fix=fix)
+    for entry in drift:
+        print(f"  Course {entry['course_id']} {entry['counter']}: "
+              f"counter {entry['actual']}, ledger {entry['expected']}")
+    print(f"{len(drift)} drifted counters{' reset' if fix and drift else ''}")
+
+
+@app.cli.command()
+@click.option('--round', 'round_number', type=int, required=True, help='Allotment round number')
+@click.option('--format', 'letter_format', type=click.Choice(['pdf', 'png']), default=None, help='Letter file format')
+def generate_letters(round_number, letter_format):
+    """Generate allotment letters for a round; rerun to resume"""
+    from app.models import AllotmentRound
+    from app.services.allotment_letter_service import AllotmentLetterService
+
+    allotment_round = AllotmentRound.query.filter_by(round_number=round_number).first()
+    if not allotment_round:
+        print(f"Round {round_number} not found")
+        return
+
+    result = AllotmentLetterService.generate_round(allotment_round.id, letter_format)
+    print(f"Generated {result['generated']} letters, {result['failed']} failed")
+
+
+@app.cli.command()
+def record_cutoffs():
+    """Record cutoffs for completed rounds that have none"""
+    from app.models import AllotmentRound, RoundCutoff
+    from app.services.cache import get_cache
+    from app.services.seat_allotment_service import SeatAllotmentService
+
+    rounds = AllotmentRound.query.filter(
+        AllotmentRound.is_completed == True,
+        ~AllotmentRound.id.in_(db.session.query(RoundCutoff.round_id))
+    ).all()
+    for allotment_round in rounds:
+        SeatAllotmentService.record_cutoffs(allotment_round.id)
+        db.session.commit()
+        get_cache().delete(SeatAllotmentService.cutoffs_cache_key(allotment_round.id))
+        print(f"Recorded cutoffs for round {allotment_round.round_number}")
+
+
+@app.cli.command()
+@click.argument('csv_path')
+@click.option('--mark-verified', is_flag=True, help='Mark imported accounts as verified')
+def import_students(csv_path, mark_verified):
+    """Bulk register students from a CSV rank list"""
+    from app.services.student_import_service import StudentImportService
+
+    with open(csv_path, 'rb') as csv_file:
+        result = StudentImportService.import_csv(csv_file, mark_verified=mark_verified)
+
+    print(f"Imported {result['imported']} students, skipped {result['skipped']}")
+    for error in result['errors']:
+        print(f"  Line {error['line']}: {error['error']}")
+
+
 @app.cli.command()
 def seed_db():
     """Seed the database with sample data"""
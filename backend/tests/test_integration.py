@@ -6,7 +6,8 @@ import pytest
 import json
 from datetime import datetime, timedelta
 from app import create_app, db
-from app.models import User, Student, UserRole, Course, College, Choice, AllotmentRound, Payment, PaymentStatus
+from app.models import User, Student, UserRole, Course, College, Choice, Allotment, AllotmentRound, Payment, PaymentStatus
+from app.services.seat_allotment_service import SeatAllotmentService
 
 
 @pytest.fixture
@@ -15,6 +16,9 @@ def app():
     app = create_app()
     app.config['TESTING'] = True
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['CHOICE_DRAFT_BACKEND'] = 'memory'
+    app.config['CACHE_BACKEND'] = 'memory'
+    app.config['TASK_DEDUP_BACKEND'] = 'memory'
     app.config['JWT_SECRET_KEY'] = 'test-secret-key'
 
     with app.app_context():
@@ -152,6 +156,35 @@ def sample_college_course(app):
     return Ref(college_id, course_id)
 
 
+@pytest.fixture
+def sample_allotment(app, verified_user, sample_college_course):
+    """Allot the sample course to the verified student in round 1"""
+    with app.app_context():
+        allotment_round = AllotmentRound(
+            round_number=1,
+            start_date=datetime.utcnow(),
+            end_date=datetime.utcnow() + timedelta(days=7),
+            acceptance_deadline=datetime.utcnow() + timedelta(days=10),
+            is_completed=True
+        )
+        db.session.add(allotment_round)
+        db.session.flush()
+
+        course = Course.query.get(sample_college_course.course_id)
+        course.available_seats -= 1
+        course.general_seats -= 1
+        allotment = Allotment(
+            student_id=Student.query.one().id,
+            course_id=course.id,
+            round_id=allotment_round.id,
+            allotted_rank=1500,
+            allotted_category='General'
+        )
+        db.session.add(allotment)
+        db.session.commit()
+        return allotment.id
+
+
 class TestAuthenticationAPI:
     """Integration tests for authentication endpoints"""
 
@@ -220,6 +253,67 @@ class TestAuthenticationAPI:
         data = json.loads(response.data)
         assert data['email'] == 'student@test.com'
 
+    def test_resend_otp_deduplicated(self, client, app, monkeypatch):
+        """Test resend within the dedup window does not issue another OTP"""
+        from app.services.email_service import EmailService
+        from app.services.sms_service import SMSService
+
+        # A delivered send keeps the window; a failed one frees it
+        monkeypatch.setattr(EmailService, 'send_otp_email', lambda *args, **kwargs: True)
+        monkeypatch.setattr(SMSService, 'send_otp_sms', lambda *args, **kwargs: True)
+        response = client.post('/api/auth/register',
+            json={
+                'email': 'resend@test.com',
+                'mobile': '7777777777',
+                'password': 'Resend@123',
+                'first_name': 'Resend',
+                'last_name': 'User',
+                'date_of_birth': '2000-01-01',
+                'gender': 'Female',
+                'exam_type': 'KCET',
+                'exam_rank': 2500,
+                'exam_roll_number': 'KCET2024003',
+                'category': 'General'
+            },
+            content_type='application/json'
+        )
+        user_id = json.loads(response.data)['user_id']
+
+        response = client.post('/api/auth/resend-otp',
+            json={'user_id': user_id, 'type': 'email'},
+            content_type='application/json'
+        )
+
+        assert response.status_code == 200
+        with app.app_context():
+            from app.models import OTP, OTPPurpose
+            assert OTP.query.filter_by(user_id=user_id, purpose=OTPPurpose.EMAIL_VERIFICATION).count() == 1
+
+    def test_failed_otp_send_releases_window(self, client, auth_token, app, monkeypatch):
+        """Test a send that fails does not block the retry for the dedup window"""
+        from app.models import OTP, OTPPurpose
+        from app.services.otp_store import SQLOTPStore
+
+        def fail(*args, **kwargs):
+            raise RuntimeError('store unavailable')
+
+        with monkeypatch.context() as patch:
+            patch.setattr(SQLOTPStore, 'issue', fail)
+            response = client.post('/api/auth/forgot-password', json={'email': 'student@test.com'})
+            assert response.status_code == 500
+
+        response = client.post('/api/auth/forgot-password', json={'email': 'student@test.com'})
+        assert response.status_code == 200
+        with app.app_context():
+            assert OTP.query.filter_by(purpose=OTPPurpose.PASSWORD_RESET).count() == 1
+
+        # Mail is not configured under test, so that delivery failed in the
+        # task and freed the window again
+        response = client.post('/api/auth/forgot-password', json={'email': 'student@test.com'})
+        assert response.status_code == 200
+        with app.app_context():
+            assert OTP.query.filter_by(purpose=OTPPurpose.PASSWORD_RESET).count() == 2
+
 
 class TestStudentAPI:
     """Integration tests for student endpoints"""
@@ -266,6 +360,340 @@ class TestStudentAPI:
         assert 'student' in data
         assert 'statistics' in data
 
+    def test_dashboard_cache_invalidated_on_change(self, client, auth_token, sample_college_course):
+        """Test cached dashboard reflects a newly added choice"""
+        headers = {'Authorization': f'Bearer {auth_token}'}
+
+        response = client.get('/api/student/dashboard', headers=headers)
+        assert json.loads(response.data)['statistics']['choices_filled'] == 0
+
+        client.post('/api/choices/add',
+            json={'course_id': sample_college_course.course_id},
+            headers=headers,
+            content_type='application/json'
+        )
+
+        response = client.get('/api/student/dashboard', headers=headers)
+        assert json.loads(response.data)['statistics']['choices_filled'] == 1
+
+
+class TestDocumentAPI:
+    """Integration tests for document endpoints"""
+
+    def test_upload_document_streamed(self, client, auth_token, app, tmp_path):
+        """Test upload is streamed to disk with size and hash recorded"""
+        import io
+        import hashlib
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        content = b'%PDF-1.4\n' + b'0' * 20000
+
+        response = client.post('/api/documents/upload',
+            data={'document_type': 'rank_card', 'file': (io.BytesIO(content), 'rank card.pdf')},
+            headers={'Authorization': f'Bearer {auth_token}'},
+            content_type='multipart/form-data'
+        )
+
+        assert response.status_code == 201
+        document = json.loads(response.data)['document']
+        assert document['file_size'] == len(content)
+
+        with app.app_context():
+            from app.models import Document
+            stored = Document.query.get(document['id'])
+            assert stored.content_hash == hashlib.sha256(content).hexdigest()
+            with open(stored.file_path, 'rb') as f:
+                assert f.read() == content
+
+    def test_upload_document_too_large(self, client, auth_token, app, tmp_path):
+        """Test oversized upload is rejected and leaves no temp file"""
+        import io
+        import os
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        app.config['MAX_FILE_SIZE'] = 1024
+
+        response = client.post('/api/documents/upload',
+            data={'document_type': 'rank_card', 'file': (io.BytesIO(b'0' * 4096), 'rank.pdf')},
+            headers={'Authorization': f'Bearer {auth_token}'},
+            content_type='multipart/form-data'
+        )
+
+        assert response.status_code == 400
+        assert all(not files for _, _, files in os.walk(tmp_path))
+
+    def test_upload_identical_content_deduplicated(self, client, auth_token, app, tmp_path):
+        """Test identical uploads share one blob, with or without a hash hint"""
+        import io
+        import hashlib
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        content = b'%PDF-1.4\nsame content'
+        headers = {'Authorization': f'Bearer {auth_token}'}
+
+        client.post('/api/documents/upload',
+            data={'document_type': 'rank_card', 'file': (io.BytesIO(content), 'rank.pdf')},
+            headers=headers, content_type='multipart/form-data'
+        )
+        response = client.post('/api/documents/upload',
+            data={
+                'document_type': 'rank_card',
+                'sha256': hashlib.sha256(content).hexdigest(),
+                'file': (io.BytesIO(content), 'rank.pdf')
+            },
+            headers=headers, content_type='multipart/form-data'
+        )
+
+        assert response.status_code == 201
+        with app.app_context():
+            from app.models import Document, DocumentBlob
+            blob = DocumentBlob.query.one()
+            assert blob.ref_count == 2
+            assert {doc.file_path for doc in Document.query.all()} == {blob.file_path}
+
+    def test_download_document_range_and_etag(self, client, auth_token, app, tmp_path):
+        """Test direct downloads honour Range and If-None-Match"""
+        import io
+        import hashlib
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        content = b'%PDF-1.4\n' + b'0123456789' * 100
+        headers = {'Authorization': f'Bearer {auth_token}'}
+
+        response = client.post('/api/documents/upload',
+            data={'document_type': 'rank_card', 'file': (io.BytesIO(content), 'rank.pdf')},
+            headers=headers, content_type='multipart/form-data'
+        )
+        url = f"/api/documents/{json.loads(response.data)['document']['id']}/download"
+        etag = hashlib.sha256(content).hexdigest()
+
+        response = client.get(url, headers={**headers, 'Range': 'bytes=0-8'})
+        assert response.status_code == 206
+        assert response.data == content[:9]
+        assert response.headers['ETag'] == f'"{etag}"'
+
+        response = client.get(url, headers={**headers, 'If-None-Match': f'"{etag}"'})
+        assert response.status_code == 304
+
+    def test_download_document_offloaded(self, client, auth_token, app, tmp_path):
+        """Test X-Accel-Redirect mode returns headers only"""
+        import io
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        app.config['FILE_DELIVERY_MODE'] = 'x-accel-redirect'
+        headers = {'Authorization': f'Bearer {auth_token}'}
+
+        response = client.post('/api/documents/upload',
+            data={'document_type': 'rank_card', 'file': (io.BytesIO(b'%PDF-1.4\nbody'), 'rank.pdf')},
+            headers=headers, content_type='multipart/form-data'
+        )
+        document_id = json.loads(response.data)['document']['id']
+
+        response = client.get(f'/api/documents/{document_id}/download', headers=headers)
+        assert response.status_code == 200
+        assert response.data == b''
+        assert response.headers['X-Accel-Redirect'].startswith('/protected-uploads/blobs/')
+        assert 'rank.pdf' in response.headers['Content-Disposition']
+
+    def test_document_preview_generated(self, client, auth_token, app, tmp_path):
+        """Test uploading an image renders a downscaled preview"""
+        import io
+        from PIL import Image
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        headers = {'Authorization': f'Bearer {auth_token}'}
+
+        image = io.BytesIO()
+        Image.new('RGB', (2000, 1500), (200, 30, 30)).save(image, 'JPEG')
+        image.seek(0)
+        response = client.post('/api/documents/upload',
+            data={'document_type': 'photo', 'file': (image, 'photo.jpg')},
+            headers=headers, content_type='multipart/form-data'
+        )
+        document_id = json.loads(response.data)['document']['id']
+
+        response = client.get(f'/api/documents/{document_id}/preview', headers=headers)
+        assert response.status_code == 200
+        assert response.mimetype == 'image/jpeg'
+        thumbnail = Image.open(io.BytesIO(response.data))
+        assert max(thumbnail.size) == app.config['DOCUMENT_THUMBNAIL_SIZE']
+
+    def test_upload_inspected_before_review(self, client, auth_token, app, tmp_path):
+        """Test uploads are sniffed and only valid files reach the review queue"""
+        import io
+        from PIL import Image
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        headers = {'Authorization': f'Bearer {auth_token}'}
+
+        image = io.BytesIO()
+        Image.new('RGB', (64, 64)).save(image, 'PNG')
+        image.seek(0)
+        response = client.post('/api/documents/upload',
+            data={'document_type': 'photo', 'file': (image, 'photo.png')},
+            headers=headers, content_type='multipart/form-data'
+        )
+        valid_id = json.loads(response.data)['document']['id']
+
+        response = client.post('/api/documents/upload',
+            data={'document_type': 'rank_card', 'file': (io.BytesIO(b'GIF89a not a pdf'), 'rank.pdf')},
+            headers=headers, content_type='multipart/form-data'
+        )
+        invalid_id = json.loads(response.data)['document']['id']
+
+        with app.app_context():
+            from app.models import Document, DocumentStatus
+            assert Document.query.get(valid_id).status == DocumentStatus.READY
+            assert Document.query.get(valid_id).mime_type == 'image/png'
+            invalid = Document.query.get(invalid_id)
+            assert invalid.status == DocumentStatus.INVALID
+            assert 'does not match .pdf' in invalid.rejection_reason
+
+    def test_legacy_pending_documents_backfilled(self, client, auth_token, admin_token, app, tmp_path):
+        """Test the inspect_documents CLI queues legacy uploads and invalid files cannot be reviewed"""
+        from PIL import Image
+        from run import inspect_documents
+        from app.models import Document, DocumentType, DocumentStatus
+
+        valid_path, invalid_path = tmp_path / 'photo.png', tmp_path / 'rank.pdf'
+        Image.new('RGB', (64, 64)).save(valid_path, 'PNG')
+        invalid_path.write_bytes(b'GIF89a not a pdf')
+        with app.app_context():
+            student = Student.query.first()
+            documents = [Document(
+                student_id=student.id, document_type=document_type,
+                file_name=path.name, file_path=str(path), file_size=path.stat().st_size,
+                file_extension=path.suffix[1:], mime_type='application/octet-stream'
+            ) for document_type, path in ((DocumentType.PHOTO, valid_path), (DocumentType.RANK_CARD, invalid_path))]
+            db.session.add_all(documents)
+            db.session.commit()
+            valid_id, invalid_id = [document.id for document in documents]
+
+        result = app.test_cli_runner().invoke(inspect_documents)
+        assert '1 ready for review, 1 invalid' in result.output
+
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        response = client.post('/api/documents/claim', json={'limit': 5}, headers=headers)
+        assert [doc['id'] for doc in json.loads(response.data)['documents']] == [valid_id]
+
+        response = client.put(f'/api/documents/{invalid_id}/verify', json={'action': 'verify'}, headers=headers)
+        assert response.status_code == 400
+
+        response = client.put('/api/documents/verify-batch',
+            json={'document_ids': [invalid_id], 'action': 'verify'}, headers=headers)
+        data = json.loads(response.data)
+        assert data['reviewed'] == [] and data['invalid'] == [invalid_id]
+        with app.app_context():
+            assert Document.query.get(invalid_id).status == DocumentStatus.INVALID
+
+    def test_verify_documents_batch(self, client, auth_token, admin_token, app):
+        """Test batch verification updates documents, student flag and audit log"""
+        from app.models import Document, DocumentType, DocumentStatus, AuditLog
+        with app.app_context():
+            student = Student.query.first()
+            document_ids = []
+            for document_type in (DocumentType.MARKS_CARD_10TH, DocumentType.MARKS_CARD_12TH, DocumentType.RANK_CARD):
+                document = Document(
+                    student_id=student.id, document_type=document_type,
+                    file_name='doc.pdf', file_path='/tmp/doc.pdf', file_size=10,
+                    file_extension='pdf', mime_type='application/pdf', status=DocumentStatus.READY
+                )
+                db.session.add(document)
+                db.session.flush()
+                document_ids.append(document.id)
+            pending = Document(
+                student_id=student.id, document_type=DocumentType.PHOTO,
+                file_name='photo.png', file_path='/tmp/photo.png', file_size=10,
+                file_extension='png', mime_type='image/png'
+            )
+            db.session.add(pending)
+            db.session.commit()
+            student_id = student.id
+            pending_id = pending.id
+
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        response = client.put('/api/documents/verify-batch',
+            json={'document_ids': document_ids + [pending_id, 99999], 'action': 'verify'},
+            headers=headers
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert sorted(data['reviewed']) == sorted(document_ids)
+        assert data['not_ready'] == [pending_id]
+        assert data['not_found'] == [99999]
+
+        with app.app_context():
+            assert Student.query.get(student_id).documents_verified is True
+            assert Document.query.filter_by(status=DocumentStatus.VERIFIED).count() == 3
+            assert Document.query.get(pending_id).status == DocumentStatus.PENDING
+            assert AuditLog.query.filter_by(action='document_verifyed').count() == 3
+
+        # Reviewed documents cannot be re-reviewed in a batch, and a single
+        # rejection clears the student's flag through the same recompute
+        response = client.put('/api/documents/verify-batch',
+            json={'document_ids': document_ids[:1], 'action': 'reject'}, headers=headers)
+        assert json.loads(response.data)['not_ready'] == document_ids[:1]
+        response = client.put(f'/api/documents/{document_ids[0]}/verify',
+            json={'action': 'reject', 'reason': 'Blurred'}, headers=headers)
+        assert response.status_code == 200
+        with app.app_context():
+            assert Student.query.get(student_id).documents_verified is False
+
+    def test_claim_documents_leased_once(self, client, auth_token, admin_token, app):
+        """Test concurrent reviewers lease disjoint documents"""
+        from app.models import Document, DocumentType, DocumentStatus
+        with app.app_context():
+            student = Student.query.first()
+            for document_type in (DocumentType.MARKS_CARD_10TH, DocumentType.MARKS_CARD_12TH, DocumentType.RANK_CARD):
+                db.session.add(Document(
+                    student_id=student.id, document_type=document_type,
+                    file_name='doc.pdf', file_path='/tmp/doc.pdf', file_size=10,
+                    file_extension='pdf', mime_type='application/pdf', status=DocumentStatus.READY
+                ))
+            other = User(email='admin2@test.com', mobile='9999999998', password='Admin@123', role=UserRole.ADMIN)
+            other.is_verified = other.email_verified = other.mobile_verified = True
+            db.session.add(other)
+            db.session.commit()
+
+        response = client.post('/api/auth/login', json={'identifier': 'admin2@test.com', 'password': 'Admin@123'})
+        other_token = json.loads(response.data)['access_token']
+
+        response = client.post('/api/documents/claim', json={'limit': 2},
+            headers={'Authorization': f'Bearer {admin_token}'})
+        first = [doc['id'] for doc in json.loads(response.data)['documents']]
+        response = client.post('/api/documents/claim', json={'limit': 2},
+            headers={'Authorization': f'Bearer {other_token}'})
+        second = [doc['id'] for doc in json.loads(response.data)['documents']]
+
+        assert len(first) == 2
+        assert len(second) == 1
+        assert not set(first) & set(second)
+
+        response = client.put(f'/api/documents/{first[0]}/verify', json={'action': 'verify'},
+            headers={'Authorization': f'Bearer {other_token}'})
+        assert response.status_code == 409
+
+    def test_claim_documents_second_precision_lease(self, client, auth_token, admin_token, app):
+        """Test claimed documents are returned when the lease column drops fractional seconds"""
+        from sqlalchemy import text
+        from app.models import Document, DocumentType, DocumentStatus
+        with app.app_context():
+            student = Student.query.first()
+            db.session.add(Document(
+                student_id=student.id, document_type=DocumentType.RANK_CARD,
+                file_name='doc.pdf', file_path='/tmp/doc.pdf', file_size=10,
+                file_extension='pdf', mime_type='application/pdf', status=DocumentStatus.READY
+            ))
+            # Store claimed_until the way a MySQL DATETIME column does
+            db.session.execute(text(
+                "CREATE TRIGGER truncate_claimed_until AFTER UPDATE OF claimed_until ON documents "
+                "BEGIN UPDATE documents SET claimed_until = substr(NEW.claimed_until, 1, 19) WHERE id = NEW.id; END"
+            ))
+            db.session.commit()
+
+        try:
+            response = client.post('/api/documents/claim', json={'limit': 5},
+                headers={'Authorization': f'Bearer {admin_token}'})
+            assert len(json.loads(response.data)['documents']) == 1
+        finally:
+            with app.app_context():
+                db.session.execute(text('DROP TRIGGER truncate_claimed_until'))
+                db.session.commit()
+
 
 class TestChoiceFillingAPI:
     """Integration tests for choice filling endpoints"""
@@ -281,6 +709,32 @@ class TestChoiceFillingAPI:
         assert 'eligible_colleges' in data
         assert len(data['eligible_colleges']) > 0
 
+    def test_eligible_colleges_closing_rank_hints(self, client, auth_token, app, sample_college_course):
+        """Test courses carry last round's closing rank and a likelihood band"""
+        with app.app_context():
+            allotment_round = AllotmentRound(
+                round_number=1, start_date=datetime.utcnow(), end_date=datetime.utcnow(),
+                acceptance_deadline=datetime.utcnow(), is_completed=True
+            )
+            db.session.add(allotment_round)
+            db.session.flush()
+            db.session.add(Allotment(
+                student_id=Student.query.one().id, course_id=sample_college_course.course_id,
+                round_id=allotment_round.id, allotted_rank=1400, allotted_category='General'
+            ))
+            SeatAllotmentService.record_cutoffs(allotment_round.id)
+            db.session.commit()
+
+        response = client.get('/api/choices/eligible-colleges',
+            headers={'Authorization': f'Bearer {auth_token}'}
+        )
+
+        data = json.loads(response.data)
+        course = data['eligible_colleges'][0]['courses'][0]
+        assert data['hints_round'] == 1
+        assert course['closing_ranks'] == {'General': 1400}
+        assert course['admission_likelihood'] == 'medium'
+
     def test_add_choice(self, client, auth_token, sample_college_course):
         """Test adding a choice"""
         course_id = sample_college_course.course_id
@@ -336,6 +790,165 @@ class TestChoiceFillingAPI:
         data = json.loads(response.data)
         assert 'message' in data
 
+    def test_draft_materialised_on_submit(self, client, auth_token, app, sample_college_course):
+        """Test draft edits stay out of the choices table until submit"""
+        headers = {'Authorization': f'Bearer {auth_token}'}
+        course_id = sample_college_course.course_id
+
+        client.post('/api/choices/add', json={'course_id': course_id}, headers=headers)
+        with app.app_context():
+            assert Choice.query.count() == 0
+
+        response = client.post('/api/choices/submit', headers=headers)
+        assert response.status_code == 200
+
+        with app.app_context():
+            choices = Choice.query.all()
+            assert [(choice.course_id, choice.is_locked) for choice in choices] == [(course_id, True)]
+            assert choices[0].submitted_at is not None
+
+        listed = json.loads(client.get('/api/choices/list', headers=headers).data)
+        assert listed['submitted'] is True
+        assert [choice['course_id'] for choice in listed['choices']] == [course_id]
+
+        response = client.delete(f'/api/choices/{course_id}/remove', headers=headers)
+        assert response.status_code == 400
+
+    def test_legacy_choices_kept_without_shared_draft_store(self, client, auth_token, app, sample_college_course):
+        """Test unlocked rows are copied, not moved, into a per-process draft and replaced on submit"""
+        headers = {'Authorization': f'Bearer {auth_token}'}
+        course_id = sample_college_course.course_id
+        with app.app_context():
+            db.session.add(Choice(student_id=Student.query.one().id, course_id=course_id, preference_order=1))
+            db.session.commit()
+
+        listed = json.loads(client.get('/api/choices/list', headers=headers).data)
+        assert [choice['course_id'] for choice in listed['choices']] == [course_id]
+        with app.app_context():
+            assert [choice.is_locked for choice in Choice.query.all()] == [False]
+
+        response = client.post('/api/choices/submit', headers=headers)
+        assert response.status_code == 200
+        with app.app_context():
+            assert [choice.is_locked for choice in Choice.query.all()] == [True]
+
+    def test_deadline_locks_outstanding_drafts(self, client, auth_token, admin_token, app, sample_college_course,
+                                               monkeypatch):
+        """Test edits are refused after the deadline and the sweep locks drafts"""
+        headers = {'Authorization': f'Bearer {auth_token}'}
+        course_id = sample_college_course.course_id
+        client.post('/api/choices/add', json={'course_id': course_id}, headers=headers)
+
+        monkeypatch.setitem(app.config, 'CHOICE_FILLING_DEADLINE', (datetime.utcnow() - timedelta(minutes=1)).isoformat())
+        response = client.put('/api/choices/list', json={'course_ids': []}, headers=headers)
+        assert response.status_code == 403
+
+        response = client.post('/api/admin/choices/lock', headers={'Authorization': f'Bearer {admin_token}'})
+        assert response.status_code == 200
+        assert json.loads(response.data)['result'] == {'students': 1, 'choices': 1}
+
+        with app.app_context():
+            assert Student.query.one().choices_submitted is True
+            assert [choice.is_locked for choice in Choice.query.all()] == [True]
+
+    def test_lock_choices_cli(self, client, auth_token, app, sample_college_course, monkeypatch):
+        """Test the deadline sweep CLI refuses a per-process draft store and locks shared drafts"""
+        from run import lock_choices
+        from app.services.choice_draft_store import MemoryChoiceDraftStore
+
+        headers = {'Authorization': f'Bearer {auth_token}'}
+        client.post('/api/choices/add', json={'course_id': sample_college_course.course_id}, headers=headers)
+        runner = app.test_cli_runner()
+
+        result = runner.invoke(lock_choices, ['--force'])
+        assert result.exit_code != 0
+        assert 'CHOICE_DRAFT_BACKEND' in result.output
+        with app.app_context():
+            assert Choice.query.count() == 0
+
+        # Stand in for a store every process shares
+        monkeypatch.setattr(MemoryChoiceDraftStore, 'shared', True)
+        result = runner.invoke(lock_choices, ['--force'])
+        assert result.exit_code == 0
+        assert 'Locked 1 choices for 1 students' in result.output
+        with app.app_context():
+            assert Student.query.one().choices_submitted is True
+            assert [choice.is_locked for choice in Choice.query.all()] == [True]
+
+    def test_replace_choice_list(self, client, auth_token, app, sample_college_course):
+        """Test replacing the ordered choice list in one request"""
+        with app.app_context():
+            courses = []
+            for code in ('ECE', 'ME', 'CV'):
+                course = Course(
+                    college_id=sample_college_course.college_id, name=code, code=code, branch=code,
+                    degree='B.E.', duration_years=4, total_seats=10, available_seats=10,
+                    general_seats=5, min_rank=100, max_rank=5000, tuition_fee=100000
+                )
+                db.session.add(course)
+                db.session.flush()
+                courses.append(course.id)
+            db.session.commit()
+        headers = {'Authorization': f'Bearer {auth_token}'}
+        cse = sample_college_course.course_id
+
+        response = client.put('/api/choices/list', json={'course_ids': [cse] + courses}, headers=headers)
+        assert response.status_code == 200
+
+        # Drop one course, add nothing new and reverse the rest
+        new_order = [courses[2], courses[0], cse]
+        response = client.put('/api/choices/list', json={'course_ids': new_order}, headers=headers)
+        assert response.status_code == 200
+        choices = json.loads(response.data)['choices']
+        assert [choice['course_id'] for choice in choices] == new_order
+        assert [choice['position'] for choice in choices] == [1, 2, 3]
+        orders = [choice['preference_order'] for choice in choices]
+        assert orders == sorted(set(orders))
+
+        # Moving one choice rewrites only its own order key
+        response = client.put(f"/api/choices/{cse}/move", json={'position': 1}, headers=headers)
+        assert response.status_code == 200
+        moved = json.loads(client.get('/api/choices/list', headers=headers).data)['choices']
+        assert [choice['course_id'] for choice in moved] == [cse, courses[2], courses[0]]
+        assert [choice['preference_order'] for choice in moved][1:] == orders[:2]
+
+        response = client.put('/api/choices/list', json={'course_ids': [cse, 99999]}, headers=headers)
+        assert response.status_code == 400
+
+    def test_add_and_reorder_validation(self, client, auth_token, app, sample_college_course):
+        """Test duplicate and over-limit adds are refused and reorder items need course IDs"""
+        headers = {'Authorization': f'Bearer {auth_token}'}
+        course_id = sample_college_course.course_id
+
+        response = client.post('/api/choices/add', json={'course_id': course_id}, headers=headers)
+        assert response.status_code == 201
+        response = client.post('/api/choices/add', json={'course_id': course_id}, headers=headers)
+        assert response.status_code == 400
+
+        app.config['MAX_CHOICES'] = 1
+        with app.app_context():
+            course = Course(
+                college_id=sample_college_course.college_id, name='ECE', code='ECE', branch='ECE',
+                degree='B.E.', duration_years=4, total_seats=10, available_seats=10,
+                general_seats=5, min_rank=100, max_rank=5000, tuition_fee=100000
+            )
+            db.session.add(course)
+            db.session.commit()
+            other_id = course.id
+        response = client.post('/api/choices/add', json={'course_id': other_id}, headers=headers)
+        assert response.status_code == 400
+        assert 'Maximum 1 choices' in json.loads(response.data)['error']
+
+        response = client.put('/api/choices/reorder',
+            json={'choices': [{'choice_id': 1, 'preference_order': 1}]}, headers=headers)
+        assert response.status_code == 400
+        response = client.put('/api/choices/reorder',
+            json={'choices': [{'course_id': course_id, 'preference_order': 'first'}]}, headers=headers)
+        assert response.status_code == 400
+        response = client.put('/api/choices/reorder',
+            json={'choices': [{'course_id': course_id, 'preference_order': 1}]}, headers=headers)
+        assert response.status_code == 200
+
 
 class TestPaymentAPI:
     """Integration tests for payment endpoints"""
@@ -416,6 +1029,108 @@ class TestAdminAPI:
         data = json.loads(response.data)
         assert 'result' in data
 
+    def test_round_cutoffs_recorded(self, client, admin_token, auth_token, app, sample_college_course):
+        """Test a completed round records cutoffs served by the cutoffs endpoint"""
+        with app.app_context():
+            student = Student.query.one()
+            student.choices_submitted = True
+            student.payment_complete = True
+            student.documents_verified = True
+            db.session.add(Choice(student_id=student.id, course_id=sample_college_course.course_id,
+                                  preference_order=1024, is_locked=True))
+            db.session.commit()
+
+        response = client.post('/api/admin/allotment/trigger',
+            json={'round_number': 1},
+            headers={'Authorization': f'Bearer {admin_token}'}
+        )
+        assert json.loads(response.data)['result']['allotments_made'] == 1
+
+        with app.app_context():
+            round_id = AllotmentRound.query.filter_by(round_number=1).one().id
+
+        response = client.get(f'/api/allotment/round/{round_id}/cutoffs?category=General',
+            headers={'Authorization': f'Bearer {auth_token}'}
+        )
+        assert response.status_code == 200
+        assert json.loads(response.data)['cutoffs'] == [{
+            'round_id': round_id, 'course_id': sample_college_course.course_id, 'category': 'General',
+            'opening_rank': 1500, 'closing_rank': 1500, 'seats_filled': 1
+        }]
+
+    def test_import_students(self, client, admin_token, app, tmp_path):
+        """Test bulk student import from CSV runs as a background job"""
+        import io
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        csv_data = (
+            'email,mobile,password,first_name,last_name,date_of_birth,gender,'
+            'exam_type,exam_rank,exam_roll_number,category\n'
+            'one@test.com,9000000001,Import@123,One,Student,2000-01-01,Male,KCET,100,KCET2024201,General\n'
+            'two@test.com,9000000002,Import@123,Two,Student,2000-02-02,Female,KCET,200,KCET2024202,OBC\n'
+            'admin@test.com,9000000003,Import@123,Dup,Student,2000-03-03,Male,KCET,300,KCET2024203,General\n'
+            'bad-email,9000000004,Import@123,Bad,Student,2000-04-04,Male,KCET,400,KCET2024204,General\n'
+        )
+
+        response = client.post('/api/admin/students/import',
+            data={'file': (io.BytesIO(csv_data.encode()), 'ranks.csv'), 'mark_verified': 'true'},
+            headers={'Authorization': f'Bearer {admin_token}'},
+            content_type='multipart/form-data'
+        )
+
+        assert response.status_code == 202
+        job_id = json.loads(response.data)['job_id']
+
+        # The queue runs tasks inline under test, so the job has finished
+        response = client.get(f'/api/admin/students/import/{job_id}',
+            headers={'Authorization': f'Bearer {admin_token}'}
+        )
+        assert response.status_code == 200
+        job = json.loads(response.data)['job']
+        assert job['status'] == 'completed'
+        result = job['result']
+        assert result['imported'] == 2
+        assert result['skipped'] == 2
+        assert [error['line'] for error in result['errors']] == [4, 5]
+        assert not list((tmp_path / 'imports').iterdir())
+
+        with app.app_context():
+            user = User.query.filter_by(email='two@test.com').first()
+            assert user.check_password('Import@123')
+            assert user.student.category == 'OBC'
+
+    def test_search_audit_logs_keyset(self, client, admin_token, app):
+        """Test audit search filters by entity and pages with a cursor"""
+        from app.models import AuditLog
+        with app.app_context():
+            for index in range(5):
+                db.session.add(AuditLog(
+                    action='seat_accepted', entity_type='Allotment', entity_id=7,
+                    created_at=datetime.utcnow() - timedelta(minutes=index)
+                ))
+            db.session.add(AuditLog(action='seat_accepted', entity_type='Allotment', entity_id=8))
+            db.session.commit()
+
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        seen = []
+        cursor = None
+        while True:
+            params = {'entity_type': 'Allotment', 'entity_id': 7, 'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            response = client.get('/api/admin/audit-logs', query_string=params, headers=headers)
+            assert response.status_code == 200
+            data = json.loads(response.data)
+            seen.extend(log['id'] for log in data['logs'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+
+        assert len(seen) == len(set(seen)) == 5
+        response = client.get('/api/admin/audit-logs', query_string={'cursor': 'bogus'}, headers=headers)
+        assert response.status_code == 400
+        response = client.get('/api/admin/audit-logs', query_string={'start_date': '2025-13-01'}, headers=headers)
+        assert response.status_code == 400
+
 
 class TestAllotmentAPI:
     """Integration tests for allotment endpoints"""
@@ -452,5 +1167,121 @@ class TestAllotmentAPI:
         assert len(data['rounds']) == 1
 
 
+    def test_reject_seat_idempotent(self, client, auth_token, app, sample_allotment, sample_college_course):
+        """Test a repeated rejection restores the seat once and replays by key"""
+        headers = {'Authorization': f'Bearer {auth_token}', 'Idempotency-Key': 'reject-1'}
+
+        for replayed in (False, True):
+            response = client.post(f'/api/allotment/{sample_allotment}/reject', json={'reason': 'Too far'}, headers=headers)
+            assert response.status_code == 200
+            assert json.loads(response.data).get('replayed', False) is replayed
+
+        response = client.post(f'/api/allotment/{sample_allotment}/accept', json={'freeze': True},
+            headers={'Authorization': f'Bearer {auth_token}'}
+        )
+        assert response.status_code == 400
+
+        with app.app_context():
+            course = Course.query.get(sample_college_course.course_id)
+            assert (course.available_seats, course.general_seats) == (100, 50)
+            assert AllotmentRound.query.one().rejected_count == 1
+
+
+    def test_unanswered_allotment_lapses(self, client, auth_token, app, sample_allotment, sample_college_course):
+        """Test the sweep lapses unanswered seats past the deadline and releases them"""
+        with app.app_context():
+            assert SeatAllotmentService.lapse_expired() == {'rounds': 0, 'lapsed': 0}
+
+            after_deadline = datetime.utcnow() + timedelta(days=11)
+            assert SeatAllotmentService.lapse_expired(now=after_deadline) == {'rounds': 1, 'lapsed': 1}
+
+            course = Course.query.get(sample_college_course.course_id)
+            assert (course.available_seats, course.general_seats) == (100, 50)
+            assert Allotment.query.get(sample_allotment).status.value == 'lapsed'
+            assert AllotmentRound.query.one().lapsed_count == 1
+
+        response = client.post(f'/api/allotment/{sample_allotment}/accept', json={'freeze': True},
+            headers={'Authorization': f'Bearer {auth_token}'}
+        )
+        assert response.status_code == 400
+
+
+    def test_accept_after_deadline_refused(self, client, auth_token, app, sample_allotment):
+        """Test a seat cannot be accepted once its round's acceptance deadline has passed"""
+        with app.app_context():
+            AllotmentRound.query.one().acceptance_deadline = datetime.utcnow() - timedelta(minutes=1)
+            db.session.commit()
+
+        response = client.post(f'/api/allotment/{sample_allotment}/accept', json={'freeze': True},
+            headers={'Authorization': f'Bearer {auth_token}'}
+        )
+        assert response.status_code == 400
+
+        with app.app_context():
+            assert Allotment.query.get(sample_allotment).status.value == 'allotted'
+            assert not AllotmentRound.query.one().accepted_count
+
+
+    def test_seat_ledger_reconciliation(self, client, auth_token, app, sample_allotment, sample_college_course):
+        """Test ledger balances follow seat changes and expose counter drift"""
+        from app.models import SeatLedgerEntry
+        from app.services.seat_ledger_service import SeatLedgerService
+
+        with app.app_context():
+            assert SeatLedgerService.reconcile() == []
+            assert SeatLedgerEntry.query.count() == 0
+
+            # Opening is idempotent once a course's ledger has started
+            assert SeatLedgerService.open_missing([sample_college_course.course_id]) == 1
+            assert SeatLedgerService.open_missing([sample_college_course.course_id]) == 0
+            db.session.commit()
+
+        client.post(f'/api/allotment/{sample_allotment}/reject', json={'reason': 'Too far'},
+            headers={'Authorization': f'Bearer {auth_token}'}
+        )
+
+        with app.app_context():
+            assert SeatLedgerService.reconcile() == []
+
+            course = Course.query.get(sample_college_course.course_id)
+            course.available_seats = 120
+            db.session.commit()
+
+            drift = SeatLedgerService.reconcile(fix=True)
+            assert drift == [{'course_id': course.id, 'counter': 'available_seats', 'actual': 120, 'expected': 100}]
+            assert Course.query.get(course.id).available_seats == 100
+
+    def test_generate_allotment_letters(self, client, auth_token, app, sample_allotment, tmp_path):
+        """Test round letters are generated once, downloadable and verifiable"""
+        import os
+        from app.services.allotment_letter_service import AllotmentLetterService
+
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        with app.app_context():
+            allotment = Allotment.query.get(sample_allotment)
+            round_id = allotment.round_id
+            token = AllotmentLetterService.verification_token(allotment.id, allotment.student_id, allotment.course_id)
+
+            assert AllotmentLetterService.generate_round(round_id, 'png', workers=1) == {'generated': 1, 'failed': 0}
+            assert AllotmentLetterService.generate_round(round_id, 'png', workers=1) == {'generated': 0, 'failed': 0}
+
+            allotment = Allotment.query.get(sample_allotment)
+            assert allotment.allotment_letter_generated
+            assert os.path.exists(allotment.allotment_letter_path)
+
+        response = client.get(f'/api/allotment/{sample_allotment}/letter',
+            headers={'Authorization': f'Bearer {auth_token}'}
+        )
+        assert response.status_code == 200
+        assert response.mimetype == 'image/png'
+
+        response = client.get(f'/api/allotment/{sample_allotment}/verify?token={token}')
+        assert response.status_code == 200
+        assert response.get_json()['valid']
+
+        response = client.get(f'/api/allotment/{sample_allotment}/verify?token=forged')
+        assert response.status_code == 404
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
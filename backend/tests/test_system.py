@@ -18,6 +18,9 @@ def app():
     app = create_app()
     app.config['TESTING'] = True
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['CHOICE_DRAFT_BACKEND'] = 'memory'
+    app.config['CACHE_BACKEND'] = 'memory'
+    app.config['TASK_DEDUP_BACKEND'] = 'memory'
     app.config['JWT_SECRET_KEY'] = 'test-secret-key'
     app.config['MIN_CHOICES'] = 1
     app.config['MAX_CHOICES'] = 100
@@ -424,6 +427,15 @@ class TestMultipleStudentsAllotment:
             else:
                 print(f"✓ Student {i+1} (Rank {ranks[i]}) did not get allotment (seats full)")
 
+        # Only the chosen course's seat ledger was opened, and it balances
+        with app.app_context():
+            from app.models import SeatLedgerEntry
+            from app.services.seat_ledger_service import SeatLedgerService
+
+            opened = {entry.course_id for entry in SeatLedgerEntry.query.filter_by(cause='opening')}
+            assert opened == {course_id}
+            assert SeatLedgerService.reconcile() == []
+
         print("\n✅ MULTIPLE STUDENTS ALLOTMENT TEST PASSED")
 
 
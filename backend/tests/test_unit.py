@@ -2,6 +2,8 @@
 Unit Tests for Admission Automation System
 Tests individual functions and methods in isolation
 """
+import os
+import threading
 import pytest
 from datetime import datetime, timedelta
 from app import create_app, db
@@ -13,6 +15,9 @@ def app():
     app = create_app()
     app.config['TESTING'] = True
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['CHOICE_DRAFT_BACKEND'] = 'memory'
+    app.config['CACHE_BACKEND'] = 'memory'
+    app.config['TASK_DEDUP_BACKEND'] = 'memory'
 
     with app.app_context():
         db.create_all()
@@ -405,5 +410,269 @@ class TestAllotmentModel:
             assert allotment.status == AllotmentStatus.ALLOTTED
 
 
+class TestOTPStore:
+    """Unit tests for the SQL OTP store"""
+
+    def test_issue_and_verify(self, app, sample_user):
+        """Test issued OTP verifies once"""
+        with app.app_context():
+            from app.models import OTPPurpose
+            from app.services.otp_store import get_otp_store
+
+            store = get_otp_store()
+            code = store.issue(OTPPurpose.EMAIL_VERIFICATION, sample_user.id, email='test@example.com')
+            db.session.commit()
+
+            assert store.verify(sample_user.id, OTPPurpose.EMAIL_VERIFICATION, '') == False
+            assert store.verify(sample_user.id, OTPPurpose.EMAIL_VERIFICATION, code) == True
+            db.session.commit()
+            assert store.verify(sample_user.id, OTPPurpose.EMAIL_VERIFICATION, code) is None
+
+    def test_purge_expired(self, app, sample_user):
+        """Test expired OTPs are purged in batches"""
+        with app.app_context():
+            from app.models import OTP, OTPPurpose
+            from app.services.otp_store import get_otp_store
+
+            for _ in range(5):
+                otp = OTP.create_otp(OTPPurpose.PASSWORD_RESET, validity_minutes=-1, user_id=sample_user.id)
+                db.session.add(otp)
+            db.session.add(OTP.create_otp(OTPPurpose.PASSWORD_RESET, user_id=sample_user.id))
+            db.session.commit()
+
+            assert get_otp_store().purge_expired(batch_size=2) == 5
+            assert OTP.query.count() == 1
+
+
+class TestEventBus:
+    """Unit tests for status change events"""
+
+    def test_document_status_change_published(self, app, sample_student):
+        """Test committing a document status change notifies subscribers"""
+        with app.app_context():
+            from app.models import Document, DocumentType, DocumentStatus
+            from app.services.event_bus import event_bus
+
+            document = Document(
+                student_id=sample_student.id,
+                document_type=DocumentType.RANK_CARD,
+                file_name='rank.pdf',
+                file_path='uploads/rank.pdf',
+                file_size=100,
+                file_extension='pdf',
+                mime_type='application/pdf',
+                status=DocumentStatus.PENDING
+            )
+            db.session.add(document)
+            db.session.commit()
+
+            subscriber = event_bus.subscribe(sample_student.id)
+            document.status = DocumentStatus.VERIFIED
+            db.session.commit()
+
+            message = subscriber.get_nowait()
+            assert message['type'] == 'document'
+            assert message['data']['status'] == 'verified'
+            assert subscriber.empty()
+            event_bus.unsubscribe(sample_student.id, subscriber)
+
+    def test_listener_retries_with_backoff(self, app, monkeypatch):
+        """Test the Redis listener backs off while subscribed and exits once nobody is"""
+        from app.services import event_bus as event_bus_module
+
+        def unreachable():
+            raise ConnectionError('Redis unavailable')
+
+        bus = event_bus_module.EventBus()
+        bus.app = app
+        bus._subscribers = {1: {object()}}
+        bus._listener = 'running'
+        delays = []
+
+        def sleep(delay):
+            delays.append(delay)
+            if len(delays) == 3:
+                bus._subscribers.clear()
+
+        monkeypatch.setattr(event_bus_module, 'get_redis', unreachable)
+        monkeypatch.setattr(event_bus_module.time, 'sleep', sleep)
+        bus._listen()
+
+        assert delays == [1, 2, 4]
+        assert bus._listener is None
+
+
+class TestBlobStore:
+    """Unit tests for content-addressed document storage"""
+
+    def test_collect_garbage_removes_unreferenced(self, app, tmp_path):
+        """Test blobs without documents are deleted from disk and table"""
+        with app.app_context():
+            from app.models import DocumentBlob
+            from app.services.blob_store import BlobStore
+
+            app.config['UPLOAD_FOLDER'] = str(tmp_path)
+            content_hash = 'ab' * 32
+            path = BlobStore.blob_path(content_hash)
+            os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as f:
+                f.write(b'orphan')
+            db.session.add(DocumentBlob(content_hash=content_hash, file_path=path, file_size=6, ref_count=0))
+            db.session.commit()
+
+            assert BlobStore.collect_garbage(grace_seconds=0) == 1
+            assert DocumentBlob.query.count() == 0
+            assert not os.path.exists(path)
+
+    def test_collect_garbage_removes_untracked_files(self, app, tmp_path):
+        """Test blob files left without a row by a rolled-back upload are deleted"""
+        with app.app_context():
+            from app.services.blob_store import BlobStore
+
+            app.config['UPLOAD_FOLDER'] = str(tmp_path)
+            path = BlobStore.blob_path('cd' * 32)
+            os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as f:
+                f.write(b'uncommitted')
+
+            assert BlobStore.collect_garbage() == 0
+            assert os.path.exists(path)
+            assert BlobStore.collect_garbage(grace_seconds=0) == 1
+            assert not os.path.exists(path)
+
+
+class TestFileInspection:
+    """Unit tests for uploaded file sniffing and integrity checks"""
+
+    def test_inspect_pdf_structure(self, tmp_path):
+        """Test PDFs need a trailer pointing at a cross-reference table"""
+        from app.services.file_inspection_service import inspect_file
+
+        body = b'%PDF-1.4\n1 0 obj\n<< >>\nendobj\n'
+        valid = body + b'xref\n0 1\ntrailer\n<< >>\nstartxref\n' + str(len(body)).encode() + b'\n%%EOF\n'
+        (tmp_path / 'valid.pdf').write_bytes(valid)
+        (tmp_path / 'truncated.pdf').write_bytes(valid[:len(body) + 10])
+
+        assert inspect_file(str(tmp_path / 'valid.pdf'), 'pdf') == ('application/pdf', None)
+        assert 'truncated' in inspect_file(str(tmp_path / 'truncated.pdf'), 'pdf')[1]
+        assert 'does not match .jpg' in inspect_file(str(tmp_path / 'valid.pdf'), 'jpg')[1]
+
+
+class TestTaskQueue:
+    """Unit tests for task deduplication"""
+
+    def test_dedup_key_held_until_task_done(self, app):
+        """Test a held key blocks duplicates while the task runs and frees after"""
+        from app.services.task_queue import task_queue
+
+        with app.app_context():
+            seen = []
+
+            def task():
+                seen.append(task_queue.claim('letters:test', 60))
+
+            assert task_queue.enqueue_once('letters:test', 60, task, hold_until_done=True)
+            assert seen == [False]
+            assert task_queue.claim('letters:test', 60)
+
+
+class TestAuditSink:
+    """Unit tests for batched audit log writes"""
+
+    def test_entries_written_in_background_batch(self, app, monkeypatch):
+        """Test queued entries reach the table without touching the session"""
+        import time
+        from app.models import AuditLog
+        from app.services.audit_sink import AuditSink
+
+        with app.app_context():
+            sink = AuditSink(app)
+            monkeypatch.setattr(app, 'testing', False)
+            monkeypatch.setitem(app.config, 'TASK_QUEUE_EAGER', False)
+            monkeypatch.setitem(app.config, 'AUDIT_FLUSH_INTERVAL', 0.05)
+
+            try:
+                for index in range(3):
+                    AuditLog.log_action(user_id=None, action='batched_action', entity_id=index)
+                assert not db.session.new
+
+                deadline = time.monotonic() + 5
+                while AuditLog.query.filter_by(action='batched_action').count() < 3 and time.monotonic() < deadline:
+                    time.sleep(0.05)
+
+                assert AuditLog.query.filter_by(action='batched_action').count() == 3
+            finally:
+                sink.shutdown()
+
+            assert not any(thread.name == 'audit-sink' for thread in threading.enumerate())
+
+
+class TestAuditPartitions:
+    """Unit tests for monthly audit partitions and archival"""
+
+    def test_archive_and_query_across_partitions(self, app, tmp_path):
+        """Test old months are rotated, archived and still searchable"""
+        from app.models import AuditLog
+        from app.services.audit_partition_service import AuditPartitionService
+
+        with app.app_context():
+            app.config['AUDIT_ARCHIVE_FOLDER'] = str(tmp_path)
+            now = datetime(2026, 10, 15)
+            for created_at in (datetime(2026, 1, 10), datetime(2026, 8, 20), datetime(2026, 10, 1)):
+                db.session.add(AuditLog(action='user_login', entity_type='User', created_at=created_at))
+            db.session.commit()
+
+            try:
+                assert AuditPartitionService.archive(keep_months=6, now=now) == ['202601']
+                assert AuditPartitionService.partitions(now) == ['202608']
+                assert AuditLog.query.count() == 1
+                assert os.path.exists(tmp_path / 'audit_logs_202601.ndjson.gz')
+
+                logs = AuditPartitionService.query(action='user_login')
+                assert [log['created_at'][:10] for log in logs] == ['2026-10-01', '2026-08-20', '2026-01-10']
+                assert AuditPartitionService.query(action='user_login', limit=1)[0]['created_at'][:10] == '2026-10-01'
+            finally:
+                AuditPartitionService.archive(keep_months=-1, now=now)
+
+    def test_mysql_partition_ddl(self):
+        """Test the RANGE COLUMNS DDL for converting and extending audit_logs"""
+        from app.services.audit_partition_service import native_partition_ddl
+
+        months = [datetime(2026, 11, 1), datetime(2026, 12, 1)]
+        partitions = ("PARTITION p202611 VALUES LESS THAN ('2026-12-01'), "
+                      "PARTITION p202612 VALUES LESS THAN ('2027-01-01'), "
+                      "PARTITION p_future VALUES LESS THAN (MAXVALUE)")
+
+        assert native_partition_ddl(months, True, ['audit_logs_ibfk_1']) == [
+            'ALTER TABLE audit_logs DROP FOREIGN KEY `audit_logs_ibfk_1`',
+            'ALTER TABLE audit_logs DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)',
+            f'ALTER TABLE audit_logs PARTITION BY RANGE COLUMNS(created_at) ({partitions})'
+        ]
+        assert native_partition_ddl(months, False) == [
+            f'ALTER TABLE audit_logs REORGANIZE PARTITION p_future INTO ({partitions})'
+        ]
+
+
+class TestChoiceOrderKeys:
+    """Test sparse choice order keys"""
+
+    def test_move_and_insert_touch_one_key(self):
+        """Test a move or insert changes only the affected key"""
+        from app.services.choice_service import plan_order_keys
+
+        # Last entry moved to the front
+        assert plan_order_keys([4096, 1024, 2048, 3072], 1024) == [512, 1024, 2048, 3072]
+        # New entry inserted in the middle
+        assert plan_order_keys([1024, None, 2048], 1024) == [1024, 1536, 2048]
+        # Appending uses the full gap
+        assert plan_order_keys([1024, None], 1024) == [1024, 2048]
+
+    def test_exhausted_gap_rebalances(self):
+        """Test the list is respaced when no key fits between neighbours"""
+        from app.services.choice_service import plan_order_keys
+
+        assert plan_order_keys([5, None, 6], 1024) == [1024, 2048, 3072]
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -7,6 +7,12 @@ import Layout from '../components/Layout';
 import { choiceAPI } from '../services/api';
 import './styles.css';
 
+const LIKELIHOOD_BADGES = {
+  high: 'success',
+  medium: 'warning',
+  low: 'secondary',
+};
+
 const ChoiceFilling = () => {
   const [choices, setChoices] = useState([]);
   const [colleges, setColleges] = useState([]);
@@ -58,10 +64,10 @@ const ChoiceFilling = () => {
     }
   };
 
-  const handleRemoveChoice = async (choiceId) => {
+  const handleRemoveChoice = async (courseId) => {
     if (window.confirm('Are you sure you want to remove this choice?')) {
       try {
-        await choiceAPI.remove(choiceId);
+        await choiceAPI.remove(courseId);
         toast.success('Choice removed successfully');
         await loadChoices(); // Reload choices to get updated list
       } catch (error) {
@@ -126,9 +132,9 @@ const ChoiceFilling = () => {
                 </tr>
               </thead>
               <tbody>
-                {choices.map((choice) => (
-                  <tr key={choice.id}>
-                    <td>#{choice.preference_order}</td>
+                {choices.map((choice, index) => (
+                  <tr key={choice.course_id}>
+                    <td>#{index + 1}</td>
                     <td>{choice.college?.name}</td>
                     <td>{choice.course?.name}</td>
                     <td>{choice.college?.city}, {choice.college?.state}</td>
@@ -136,7 +142,7 @@ const ChoiceFilling = () => {
                     {!submitted && (
                       <td>
                         <button
-                          onClick={() => handleRemoveChoice(choice.id)}
+                          onClick={() => handleRemoveChoice(choice.course_id)}
                           className="btn btn-sm btn-danger"
                         >
                           Remove
@@ -186,6 +192,14 @@ const ChoiceFilling = () => {
                               <span className="course-rank">
                                 Rank: {course.min_rank} - {course.max_rank}
                               </span>
+                              {course.closing_rank && (
+                                <span className="course-rank">
+                                  Last closing rank: {course.closing_rank}{' '}
+                                  <span className={`badge badge-${LIKELIHOOD_BADGES[course.admission_likelihood]}`}>
+                                    {course.admission_likelihood} chance
+                                  </span>
+                                </span>
+                              )}
                             </div>
                             {alreadyAdded ? (
                               <button className="btn btn-sm btn-success" disabled>
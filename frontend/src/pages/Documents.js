@@ -77,8 +77,10 @@ const Documents = () => {
   const getStatusBadge = (status) => {
     const statusColors = {
       'pending': 'badge-warning',
+      'ready': 'badge-warning',
       'verified': 'badge-success',
-      'rejected': 'badge-danger'
+      'rejected': 'badge-danger',
+      'invalid': 'badge-danger'
     };
     return <span className={`badge ${statusColors[status] || 'badge-secondary'}`}>{status}</span>;
   };
@@ -4,7 +4,7 @@
 import React, { useState, useEffect } from 'react';
 import { toast } from 'react-toastify';
 import Layout from '../components/Layout';
-import { allotmentAPI } from '../services/api';
+import { allotmentAPI, eventsAPI } from '../services/api';
 import './styles.css';
 
 const SeatAllotment = () => {
@@ -13,6 +13,12 @@ const SeatAllotment = () => {
 
   useEffect(() => {
     loadAllotment();
+
+    // Reload when the allotment changes, e.g. when it lapses
+    const source = eventsAPI.subscribe((type) => {
+      if (type === 'allotment') loadAllotment();
+    });
+    return () => source.close();
   }, []);
 
   const loadAllotment = async () => {
@@ -36,7 +42,8 @@ const SeatAllotment = () => {
 
     if (window.confirm(message)) {
       try {
-        await allotmentAPI.accept(allotment.id, freeze);
+        // Same key for the same answer, so a repeated click is a replay
+        await allotmentAPI.accept(allotment.id, freeze, `accept-${allotment.id}-${freeze ? 'freeze' : 'upgrade'}`);
         toast.success('Seat accepted successfully');
         loadAllotment();
       } catch (error) {
@@ -53,7 +60,7 @@ const SeatAllotment = () => {
     if (!reason) return;
 
     try {
-      await allotmentAPI.reject(allotment.id, reason);
+      await allotmentAPI.reject(allotment.id, reason, `reject-${allotment.id}`);
       toast.success('Seat rejected');
       loadAllotment();
     } catch (error) {
@@ -67,7 +74,8 @@ const SeatAllotment = () => {
       'allotted': 'badge-info',
       'accepted_frozen': 'badge-success',
       'accepted_upgrade': 'badge-warning',
-      'rejected': 'badge-danger'
+      'rejected': 'badge-danger',
+      'lapsed': 'badge-danger'
     };
     return <span className={`badge ${statusColors[status] || 'badge-secondary'}`}>{status?.replace(/_/g, ' ')}</span>;
   };
@@ -164,6 +172,12 @@ const SeatAllotment = () => {
                 You have accepted this seat but opted for upgrades. You may get a better seat in next rounds.
               </div>
             )}
+
+            {allotment.status === 'lapsed' && (
+              <div className="status-message warning">
+                This seat was released because it was not accepted before the acceptance deadline.
+              </div>
+            )}
           </div>
 
           <div className="card">
@@ -4,7 +4,7 @@
 import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../utils/AuthContext';
-import { studentAPI } from '../services/api';
+import { studentAPI, eventsAPI } from '../services/api';
 import { toast } from 'react-toastify';
 import './styles.css';
 
@@ -16,6 +16,10 @@ const StudentDashboard = () => {
 
   useEffect(() => {
     loadDashboard();
+
+    // Reload when the server pushes a status change
+    const source = eventsAPI.subscribe(() => loadDashboard());
+    return () => source.close();
   }, []);
 
   const loadDashboard = async () => {
@@ -87,8 +87,12 @@ export const documentAPI = {
   }),
   list: () => api.get('/documents/list'),
   download: (id) => api.get(`/documents/${id}/download`, { responseType: 'blob' }),
+  preview: (id, variant = 'thumbnail') => api.get(`/documents/${id}/preview?variant=${variant}`, { responseType: 'blob' }),
   getPending: (page = 1) => api.get(`/documents/pending?page=${page}`),
+  claim: (limit = 20) => api.post('/documents/claim', { limit }),
+  release: (documentIds) => api.post('/documents/release', { document_ids: documentIds }),
   verify: (id, action, reason = '') => api.put(`/documents/${id}/verify`, { action, reason }),
+  verifyBatch: (documentIds, action, reason = '') => api.put('/documents/verify-batch', { document_ids: documentIds, action, reason }),
 };
 
 // Payment API
@@ -105,29 +109,52 @@ export const choiceAPI = {
   getEligibleColleges: () => api.get('/choices/eligible-colleges'),
   add: (data) => api.post('/choices/add', data),
   list: () => api.get('/choices/list'),
+  replace: (courseIds) => api.put('/choices/list', { course_ids: courseIds }),
   remove: (id) => api.delete(`/choices/${id}/remove`),
   reorder: (data) => api.put('/choices/reorder', data),
+  move: (id, position) => api.put(`/choices/${id}/move`, { position }),
   submit: () => api.post('/choices/submit'),
 };
 
 // Allotment API
 export const allotmentAPI = {
   getMyAllotment: () => api.get('/allotment/my-allotment'),
-  accept: (id, freeze) => api.post(`/allotment/${id}/accept`, { freeze }),
-  reject: (id, reason) => api.post(`/allotment/${id}/reject`, { reason }),
+  accept: (id, freeze, idempotencyKey) => api.post(`/allotment/${id}/accept`, { freeze }, {
+    headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {},
+  }),
+  reject: (id, reason, idempotencyKey) => api.post(`/allotment/${id}/reject`, { reason }, {
+    headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {},
+  }),
   getRounds: () => api.get('/allotment/rounds'),
   getRoundDetails: (id) => api.get(`/allotment/round/${id}`),
+  getRoundCutoffs: (id, params) => api.get(`/allotment/round/${id}/cutoffs`, { params }),
+  downloadLetter: (id) => api.get(`/allotment/${id}/letter`, { responseType: 'blob' }),
   getStatistics: () => api.get('/allotment/statistics'),
 };
 
+// Events API (Server-Sent Events; EventSource cannot send headers)
+export const eventsAPI = {
+  subscribe: (onEvent) => {
+    const token = localStorage.getItem('accessToken');
+    const source = new EventSource(`${API_BASE_URL}/events/stream?jwt=${encodeURIComponent(token)}`);
+    ['allotment', 'document', 'student_status'].forEach((type) => {
+      source.addEventListener(type, (event) => onEvent(type, JSON.parse(event.data)));
+    });
+    return source;
+  },
+};
+
 // Admin API
 export const adminAPI = {
   getDashboard: () => api.get('/admin/dashboard'),
   getStudents: (params) => api.get('/admin/students', { params }),
   generateReport: (params) => api.get('/admin/reports/applications', { params }),
+  lockChoices: (force = false) => api.post('/admin/choices/lock', { force }),
   triggerAllotment: (data) => api.post('/admin/allotment/trigger', data),
+  generateLetters: (roundId, format) => api.post(`/admin/allotment/${roundId}/letters`, { format }),
   getColleges: () => api.get('/admin/colleges'),
   getCourses: () => api.get('/admin/courses'),
+  searchAuditLogs: (params) => api.get('/admin/audit-logs', { params }),
 };
 
 export default api;